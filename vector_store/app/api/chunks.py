@@ -1,44 +1,82 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException
 
-from vector_store.app.db.database import get_db
+from vector_store.app.db.executor import run_in_session
 from vector_store.app.db.services.chunk_store import ChunkStoreService
-from vector_store.app.models.chunk import Chunk, ChunkCreate, ChunkUpdate
+from vector_store.app.models.chunk import (
+    Chunk,
+    ChunkCreate,
+    ChunkUpdate,
+    LibraryChunkCreate,
+)
 
 # Router for operations related to a specific document
 router = APIRouter(prefix="/documents/{document_id}/chunks", tags=["chunks"])
 
 
+def _schema(chunk) -> Chunk | None:
+    """
+    Response model of an ORM chunk. Built on the executor with the chunk, as
+    reading its embedding may wait on the segment's lock.
+    """
+    return None if chunk is None else Chunk.model_validate(chunk)
+
+
 @router.post("/", response_model=Chunk)
-def create_chunk(document_id: UUID, data: ChunkCreate, db: Session = Depends(get_db)):
-    store = ChunkStoreService(db)
-    return store.create_chunk(document_id, data)
+async def create_chunk(document_id: UUID, data: ChunkCreate):
+    await ChunkStoreService.embed_missing([data])
+    return await run_in_session(
+        lambda db: _schema(ChunkStoreService(db).create_chunk(document_id, data))
+    )
+
+
+@router.post(":batch", response_model=list[Chunk])
+async def create_chunks(document_id: UUID, data: list[ChunkCreate]):
+    await ChunkStoreService.embed_missing(data)
+    return await run_in_session(
+        lambda db: [
+            _schema(chunk)
+            for chunk in ChunkStoreService(db).create_chunks(document_id, data)
+        ]
+    )
 
 
 @router.get("/", response_model=list[Chunk])
-def list_chunks(document_id: UUID, db: Session = Depends(get_db)):
-    store = ChunkStoreService(db)
-    return store.list_chunks_by_document(document_id)
+async def list_chunks(document_id: UUID):
+    return await run_in_session(
+        lambda db: [
+            _schema(chunk)
+            for chunk in ChunkStoreService(db).list_chunks_by_document(document_id)
+        ]
+    )
 
 
 @router.get("/{chunk_id}", response_model=Chunk)
-def get_chunk(document_id: UUID, chunk_id: UUID, db: Session = Depends(get_db)):
-    store = ChunkStoreService(db)
-    chunk = store.get_chunk(chunk_id)
-    if not chunk or chunk.document_id != document_id:
-        raise HTTPException(status_code=404, detail="Chunk not found in this document")
-    return chunk
+async def get_chunk(document_id: UUID, chunk_id: UUID):
+    def get(db):
+        chunk = ChunkStoreService(db).get_chunk(chunk_id)
+        if not chunk or chunk.document_id != document_id:
+            raise HTTPException(
+                status_code=404, detail="Chunk not found in this document"
+            )
+        return _schema(chunk)
+
+    return await run_in_session(get)
 
 
 @router.delete("/{chunk_id}", status_code=204)
-def delete_chunk(document_id: UUID, chunk_id: UUID, db: Session = Depends(get_db)):
-    store = ChunkStoreService(db)
-    chunk = store.get_chunk(chunk_id)
-    if not chunk or chunk.document_id != document_id:
-        raise HTTPException(status_code=404, detail="Chunk not found in this document")
-    store.delete_chunk(chunk_id)
+async def delete_chunk(document_id: UUID, chunk_id: UUID):
+    def delete(db):
+        store = ChunkStoreService(db)
+        chunk = store.get_chunk(chunk_id)
+        if not chunk or chunk.document_id != document_id:
+            raise HTTPException(
+                status_code=404, detail="Chunk not found in this document"
+            )
+        store.delete_chunk(chunk_id)
+
+    await run_in_session(delete)
 
 
 # Router to access directly by chunk_id (without document_id in the route)
@@ -46,27 +84,47 @@ router2 = APIRouter(prefix="/chunks", tags=["chunks"])
 
 
 @router2.get("/{chunk_id}", response_model=Chunk)
-def get_chunk(chunk_id: UUID, db: Session = Depends(get_db)):
-    store = ChunkStoreService(db)
-    chunk = store.get_chunk(chunk_id)
+async def get_chunk(chunk_id: UUID):
+    chunk = await run_in_session(
+        lambda db: _schema(ChunkStoreService(db).get_chunk(chunk_id))
+    )
     if not chunk:
         raise HTTPException(status_code=404, detail="Chunk not found")
     return chunk
 
 
 @router2.put("/{chunk_id}", response_model=Chunk)
-def update_chunk(chunk_id: UUID, data: ChunkUpdate, db: Session = Depends(get_db)):
-    store = ChunkStoreService(db)
-    updated = store.update_chunk(chunk_id, data)
+async def update_chunk(chunk_id: UUID, data: ChunkUpdate):
+    updated = await run_in_session(
+        lambda db: _schema(ChunkStoreService(db).update_chunk(chunk_id, data))
+    )
     if not updated:
         raise HTTPException(status_code=404, detail="Chunk not found")
     return updated
 
 
 @router2.delete("/{chunk_id}", status_code=204)
-def delete_chunk(chunk_id: UUID, db: Session = Depends(get_db)):
-    store = ChunkStoreService(db)
-    chunk = store.get_chunk(chunk_id)
-    if not chunk:
-        raise HTTPException(status_code=404, detail="Chunk not found")
-    store.delete_chunk(chunk_id)
+async def delete_chunk(chunk_id: UUID):
+    def delete(db):
+        store = ChunkStoreService(db)
+        chunk = store.get_chunk(chunk_id)
+        if not chunk:
+            raise HTTPException(status_code=404, detail="Chunk not found")
+        store.delete_chunk(chunk_id)
+
+    await run_in_session(delete)
+
+
+# Router for bulk operations across the documents of a library
+router3 = APIRouter(prefix="/libraries/{library_id}/chunks", tags=["chunks"])
+
+
+@router3.post(":batch", response_model=list[Chunk])
+async def create_library_chunks(library_id: UUID, data: list[LibraryChunkCreate]):
+    await ChunkStoreService.embed_missing(data)
+    return await run_in_session(
+        lambda db: [
+            _schema(chunk)
+            for chunk in ChunkStoreService(db).create_library_chunks(library_id, data)
+        ]
+    )
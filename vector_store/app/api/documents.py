@@ -1,9 +1,10 @@
 from uuid import UUID
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from vector_store.app.db.database import get_db
+from vector_store.app.db.database import get_async_db
+from vector_store.app.db.executor import run_in_session
 from vector_store.app.db.services.document_store import DocumentStoreService
 from vector_store.app.models.document import Document, DocumentCreate, DocumentUpdate
 
@@ -11,39 +12,55 @@ router = APIRouter(prefix="/libraries/{library_id}/documents", tags=["documents"
 
 
 @router.post("/", response_model=Document)
-def create_document(
-    library_id: UUID, data: DocumentCreate, db: Session = Depends(get_db)
+async def create_document(
+    library_id: UUID, data: DocumentCreate, db: AsyncSession = Depends(get_async_db)
 ):
-    store = DocumentStoreService(db)
-    return store.create_document(library_id, data)
+    return await db.run_sync(
+        lambda session: DocumentStoreService(session).create_document(library_id, data)
+    )
 
 
 @router.get("/", response_model=list[Document])
-def list_documents(library_id: UUID, db: Session = Depends(get_db)):
-    store = DocumentStoreService(db)
-    return store.list_documents_by_library(library_id)
+async def list_documents(library_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(
+        lambda session: DocumentStoreService(session).list_documents_by_library(
+            library_id
+        )
+    )
 
 
 @router.get("/{document_id}", response_model=Document)
-def get_document(library_id: UUID, document_id: UUID, db: Session = Depends(get_db)):
-    store = DocumentStoreService(db)
-    return store.get_document(document_id, library_id)
+async def get_document(
+    library_id: UUID, document_id: UUID, db: AsyncSession = Depends(get_async_db)
+):
+    return await db.run_sync(
+        lambda session: DocumentStoreService(session).get_document(
+            document_id, library_id
+        )
+    )
 
 
 @router.delete("/{document_id}", status_code=204)
-def delete_document(library_id: UUID, document_id: UUID, db: Session = Depends(get_db)):
-    store = DocumentStoreService(db)
-    store.get_document(document_id, library_id)  # Ensure it exists or raise 404
-    store.delete_document(document_id)
+async def delete_document(library_id: UUID, document_id: UUID):
+    # Deleting a document removes its chunks from the index
+    def delete(db):
+        store = DocumentStoreService(db)
+        store.get_document(document_id, library_id)  # Ensure it exists or raise 404
+        store.delete_document(document_id)
+
+    await run_in_session(delete)
 
 
 @router.put("/{document_id}", response_model=Document)
-def update_document(
+async def update_document(
     library_id: UUID,
     document_id: UUID,
     data: DocumentUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    store = DocumentStoreService(db)
-    store.get_document(document_id, library_id)  # Ensure it exists or raise 404
-    return store.update_document(document_id, data)
+    def update(session):
+        store = DocumentStoreService(session)
+        store.get_document(document_id, library_id)  # Ensure it exists or raise 404
+        return store.update_document(document_id, data)
+
+    return await db.run_sync(update)
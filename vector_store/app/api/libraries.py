@@ -1,9 +1,10 @@
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from vector_store.app.db.database import get_db
+from vector_store.app.db.database import get_async_db
+from vector_store.app.db.executor import run_in_session
 from vector_store.app.db.services.library_store import LibraryStoreService
 from vector_store.app.models.library import Library, LibraryCreate, LibraryUpdate
 
@@ -11,38 +12,37 @@ router = APIRouter(prefix="/libraries", tags=["libraries"])
 
 
 @router.get("/", response_model=list[Library])
-def list_libraries(db: Session = Depends(get_db)):
-    store = LibraryStoreService(db)
-    return store.list_libraries()
+async def list_libraries(db: AsyncSession = Depends(get_async_db)):
+    return await db.run_sync(
+        lambda session: LibraryStoreService(session).list_libraries()
+    )
 
 
 @router.post("/", response_model=Library)
-def create_library(data: LibraryCreate, db: Session = Depends(get_db)):
-    store = LibraryStoreService(db)
-    return store.create_library(data)
+async def create_library(data: LibraryCreate):
+    return await run_in_session(lambda db: LibraryStoreService(db).create_library(data))
 
 
 @router.get("/{library_id}", response_model=Library)
-def get_library(library_id: UUID, db: Session = Depends(get_db)):
-    store = LibraryStoreService(db)
-    library = store.get_library(library_id)
+async def get_library(library_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    library = await db.run_sync(
+        lambda session: LibraryStoreService(session).get_library(library_id)
+    )
     if not library:
         raise HTTPException(status_code=404, detail="Library not found")
     return library
 
 
 @router.delete("/{library_id}", status_code=204)
-def delete_library(library_id: UUID, db: Session = Depends(get_db)):
-    store = LibraryStoreService(db)
-    store.delete_library(library_id)
+async def delete_library(library_id: UUID):
+    await run_in_session(lambda db: LibraryStoreService(db).delete_library(library_id))
 
 
 @router.put("/{library_id}", response_model=Library)
-def update_library(
-    library_id: UUID, data: LibraryUpdate, db: Session = Depends(get_db)
-):
-    store = LibraryStoreService(db)
-    updated = store.update_library(library_id, data)
+async def update_library(library_id: UUID, data: LibraryUpdate):
+    updated = await run_in_session(
+        lambda db: LibraryStoreService(db).update_library(library_id, data)
+    )
     if not updated:
         raise HTTPException(status_code=404, detail="Library not found")
     return updated
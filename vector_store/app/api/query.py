@@ -1,9 +1,9 @@
 from uuid import UUID
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from vector_store.app.db.database import get_db
+from vector_store.app.db.database import get_async_db
 from vector_store.app.db.services.query_store import QueryStoreService
 from vector_store.app.models.query import QueryRequest, QueryResult
 
@@ -11,6 +11,18 @@ router = APIRouter(prefix="/libraries/{library_id}/query", tags=["query"])
 
 
 @router.post("/", response_model=list[QueryResult])
-def query_library(library_id: UUID, query: QueryRequest, db: Session = Depends(get_db)):
+async def query_library(
+    library_id: UUID, query: QueryRequest, db: AsyncSession = Depends(get_async_db)
+):
     store = QueryStoreService(db)
-    return store.query_chunks(library_id, query)
+    return await store.query_chunks(library_id, query)
+
+
+@router.post(":batch", response_model=list[list[QueryResult]])
+async def query_library_batch(
+    library_id: UUID,
+    queries: list[QueryRequest],
+    db: AsyncSession = Depends(get_async_db),
+):
+    store = QueryStoreService(db)
+    return await store.query_chunks_batch(library_id, queries)
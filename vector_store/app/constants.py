@@ -2,7 +2,76 @@ from pathlib import Path
 
 EMBEDDING_DIM = 1024
 CHUNKS_LRU_CACHE_SIZE = 1000
-LSH_LRU_CACHE_SIZE = 10
+
+# LSH defaults, can be overridden per library through index_params
+LSH_NUM_TABLES = 5
+LSH_NUM_HASHES = 10  # Hyperplanes per table, i.e. bits per bucket key
+LSH_PROBES = 16  # Extra buckets a query may visit when its own are too small
+LSH_MIN_CANDIDATES = 32  # Probe until a query has this many candidates (or k)
+LSH_PROJECTION = "gaussian"  # Hyperplane entries: "gaussian", "sign" or "sparse"
+LSH_SCORE_BLOCK_SIZE = 1 << 22  # Query-candidate pairs scored per matrix product
+
+# LSH auto-tuning, enabled per library with index_params {"auto_tune": true}
+LSH_TUNING_TARGET_RECALL = 0.9  # Recall@k the fastest configuration must reach
+LSH_TUNING_K = 10
+LSH_TUNING_SAMPLE_SIZE = 100  # Chunks held out as queries
+LSH_TUNING_MAX_SIZE = 10000  # Benchmarks index at most this many vectors
+LSH_TUNING_MIN_SIZE = 1000  # Vectors needed before the first tuning
+LSH_RETUNE_FACTOR = 2.0  # Tune again once the index doubles past its tuning size
+LSH_TUNING_TABLES = (4, 8, 16)
+LSH_TUNING_HASHES = (8, 12, 16)
+LSH_TUNING_PROBES = (0, 8, 32)
+
+# HNSW defaults, can be overridden per library through index_params
+HNSW_M = 16  # Max links per node on upper layers (2 * M on layer 0)
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# IVF defaults, nlist and nprobe can be overridden per library through index_params
+IVF_NLIST = 100  # Number of k-means centroids / inverted lists
+IVF_NPROBE = 8  # Inverted lists scanned per query
+IVF_MIN_POINTS_PER_LIST = 39  # Vectors per list required before the first training
+IVF_MAX_POINTS_PER_LIST = 256  # k-means trains on at most nlist * this many vectors
+IVF_KMEANS_ITERATIONS = 20
+IVF_RETRAIN_FACTOR = 2.0  # Retrain once the index doubles past its training size
+
+# Product quantization, used by libraries created with a "pq" or "opq" compression
+PQ_M = 64  # Sub-quantizers, i.e. bytes per stored vector with 8 bit codes
+PQ_NBITS = 8  # Bits per sub-quantizer code (2 ** nbits centroids each)
+PQ_RERANK = 4  # Re-rank k * this many candidates with the full vectors, 0 disables
+PQ_MIN_TRAIN_SIZE = 2048  # Vectors kept uncompressed until the codec is trained
+PQ_MAX_TRAIN_SIZE = 8192  # Codebooks are trained on at most this many vectors
+PQ_KMEANS_ITERATIONS = 10
+OPQ_ITERATIONS = 4  # Alternations between codebooks and rotation
+PQ_RETRAIN_FACTOR = 2.0
+
+# Metadata filters matching at most this fraction of a library are answered by
+# scoring the matching chunks exactly, larger ones are applied inside the index
+FILTER_PREFILTER_SELECTIVITY = 0.05
+
+# Embedding pipeline, shared by every request of the process
+EMBEDDING_PROVIDER = "cohere"  # "cohere" or "hashing", overridden by the env var
+COHERE_EMBED_MODEL = "embed-english-v3.0"
+EMBEDDING_BATCH_WINDOW = 0.005  # Seconds a partial batch waits for more texts
+EMBEDDING_MAX_CONCURRENCY = 4  # Provider calls in flight at once
+EMBEDDING_MAX_RETRIES = 3
+EMBEDDING_RETRY_BACKOFF = 0.25  # Seconds before the first retry, then doubled
+EMBEDDING_CACHE_SIZE = 10000  # Embeddings kept in memory, keyed by text hash
+EMBEDDING_CACHE_TTL = 24 * 60 * 60  # Seconds
+EMBEDDING_CACHE_PATH = None  # SQLite file backing the cache, overridden by env var
+
+# Query result cache, invalidated per library by every chunk mutation
+QUERY_CACHE_SIZE = 1000  # Cached query results, all libraries together
+QUERY_CACHE_TTL = 300  # Seconds
+QUERY_CACHE_SIMILARITY = None  # Reuse results of queries this cosine-similar
+QUERY_CACHE_SIMILAR_SIZE = 256  # Recent queries per library compared for that
+
+# Threads running index searches and updates off the event loop
+SEARCH_EXECUTOR_WORKERS = 4
+
+# Batch sizes for bulk operations
+COHERE_EMBED_BATCH_SIZE = 96  # Max texts per Cohere embed call
+SQL_IN_CLAUSE_BATCH_SIZE = 500
 
 # Folder for persistent data
 DATA_DIR = Path("data")
@@ -10,3 +79,27 @@ DATA_DIR.mkdir(exist_ok=True)
 
 # Path to store LSH index data
 LSH_INDEX_FILE = DATA_DIR / "lsh_index.json"
+
+# Folder for the memory-mapped vector segments, one per library
+SEGMENTS_DIR = DATA_DIR / "segments"
+VECTOR_DTYPE = "float32"  # Default vector storage type: float32, float16 or int8
+
+# Write-ahead log of index mutations, folded into the persisted indexes by the
+# background compactor
+WAL_DIR = DATA_DIR / "wal"
+INDEX_COMPACTION_INTERVAL = 5.0  # Seconds between compactions
+
+# Startup warm-up of the most queried libraries' indexes, see IndexWarmup
+WARMUP_LIBRARIES = 10  # Libraries warmed, overridden by the env var
+WARMUP_WORKERS = 4  # Indexes loaded in parallel
+QUERY_STATS_PATH = DATA_DIR / "query_stats.json"  # Decayed query counts per library
+QUERY_STATS_HALF_LIFE = 24 * 60 * 60  # Seconds for a library's count to halve
+QUERY_STATS_FLUSH_INTERVAL = 60.0  # Seconds between writes of the counts
+
+# Resident library indexes are bounded by their estimated memory, see IndexCache.
+# Evicted ones are spilled to a local directory and reloaded from there.
+INDEX_CACHE_MAX_BYTES = 2 * 1024**3  # Overridden by the env var
+# Exact fallback and metadata indexes, each bounded the same way but not spilled
+EXACT_INDEX_CACHE_MAX_BYTES = 512 * 1024**2  # Overridden by the env var
+METADATA_INDEX_CACHE_MAX_BYTES = 256 * 1024**2  # Overridden by the env var
+INDEX_SPILL_DIR = DATA_DIR / "spill"  # Overridden by the env var
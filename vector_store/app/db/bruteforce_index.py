@@ -1,44 +1,321 @@
-import heapq
+import threading
+from typing import Any
 from uuid import UUID
 
 import numpy as np
 
-from vector_store.app.db.index import Index
+from vector_store.app.db.index import ID_BYTES, Index, is_private
+from vector_store.app.db.vector_dtype import check_dtype, decode, encode
+
+INITIAL_CAPACITY = 64
+SCORE_BLOCK_SIZE = 8192  # Rows decoded to float32 at a time when not float32
 
 
 class BruteForceIndex(Index):
-    def __init__(self, metric: str = "euclidean"):
-        self.vectors: list[tuple[UUID, np.ndarray]] = []
+    """
+    Exact k-NN index backed by a contiguous matrix.
+
+    Rows are kept packed (removals move the last row into the freed slot) so a
+    search is a single matrix product over ``matrix[:size]`` (one row per query)
+    followed by an ``argpartition`` for the top-k.
+
+    The matrix holds ``dtype`` values ("float32", "float16" or int8 codes with a
+    per-row scale, see ``vector_dtype``). Other types than float32 are decoded
+    to float32 block by block when scoring, so products accumulate in float32.
+
+    ``attach`` serves an existing matrix in place, typically the rows of a
+    vector segment mapping shared by every worker process. It is copied to
+    private memory on the first mutation.
+
+    Searches and mutations hold the index's lock, so a search never sees the
+    rows of a vector being removed or moved.
+    """
+
+    def __init__(self, metric: str = "euclidean", dtype: str = "float32"):
+        if metric not in ("euclidean", "cosine"):
+            raise ValueError(f"Unsupported metric: {metric}")
         self.metric = metric
+        self.dtype = check_dtype(dtype)
+        self.dim: int | None = None
+        self.size = 0
+        self.ids: list[UUID] = []
+        self.rows: dict[UUID, int] = {}
+        self.matrix = np.empty((0, 0), dtype=self.dtype)
+        self.scales = np.empty(0, dtype=np.float32)  # int8 only
+        self.norms = np.empty(0, dtype=np.float32)
+        self._attached = False
+        self._lock = threading.RLock()
+
+    def attach(
+        self,
+        vector_ids: list[UUID],
+        matrix: np.ndarray,
+        scales: np.ndarray | None = None,
+    ) -> None:
+        """
+        Serve ``matrix`` (``dtype`` values, with their int8 ``scales``) as the
+        stored vectors without copying it. Only the norms are computed.
+        """
+        matrix = np.asarray(matrix)
+        if matrix.dtype != self.dtype:
+            raise ValueError(f"Expected a {self.dtype} matrix, got {matrix.dtype}")
+        if self._quantized and scales is None:
+            raise ValueError("int8 vectors need their scales")
+        with self._lock:
+            self.dim = matrix.shape[1]
+            self.size = len(vector_ids)
+            self.ids = list(vector_ids)
+            self.rows = {vector_id: row for row, vector_id in enumerate(self.ids)}
+            self.matrix = _read_only(matrix)
+            if self._quantized:
+                self.scales = _read_only(np.asarray(scales))
+            self.norms = np.empty(self.size, dtype=np.float32)
+            for start in range(0, self.size, SCORE_BLOCK_SIZE):
+                rows = slice(start, min(start + SCORE_BLOCK_SIZE, self.size))
+                self.norms[rows] = np.linalg.norm(self._decode(rows), axis=-1)
+            self._attached = True
+
+    def _detach(self) -> None:
+        """Copy attached vectors to private memory before modifying them."""
+        if self._attached:
+            self.matrix = self.matrix.copy()
+            self.scales = self.scales.copy()
+            self._attached = False
+
+    @property
+    def nbytes(self) -> int:
+        # ids list and rows dict, plus the norms and any private matrix. An
+        # attached matrix is private too when the segment had freed rows to skip.
+        total = 2 * ID_BYTES * self.size + self.norms.nbytes
+        if is_private(self.matrix):
+            total += self.matrix.nbytes
+        if is_private(self.scales):
+            total += self.scales.nbytes
+        return total
+
+    @property
+    def _quantized(self) -> bool:
+        return self.dtype == np.int8
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Stored vectors as float32."""
+        with self._lock:
+            return self._decode(np.arange(self.size))
+
+    def _decode(self, rows) -> np.ndarray:
+        return decode(self.matrix[rows], self.scales[rows] if self._quantized else None)
+
+    def _store(self, rows, vectors) -> None:
+        codes, scales = encode(vectors, self.dtype)
+        self.matrix[rows] = codes
+        if self._quantized:
+            self.scales[rows] = scales
+        # Norms of the stored values, so distances match what is scored
+        self.norms[rows] = np.linalg.norm(self._decode(rows), axis=-1)
+
+    def _reserve(self, capacity: int) -> None:
+        if capacity <= self.matrix.shape[0]:
+            return
+        new_capacity = max(INITIAL_CAPACITY, self.matrix.shape[0])
+        while new_capacity < capacity:
+            new_capacity *= 2
+        matrix = np.empty((new_capacity, self.dim), dtype=self.dtype)
+        scales = np.empty(new_capacity if self._quantized else 0, dtype=np.float32)
+        norms = np.empty(new_capacity, dtype=np.float32)
+        if self.size:
+            matrix[: self.size] = self.matrix[: self.size]
+            if self._quantized:
+                scales[: self.size] = self.scales[: self.size]
+            norms[: self.size] = self.norms[: self.size]
+        self.matrix, self.scales, self.norms = matrix, scales, norms
 
     def add(self, vector_id: UUID, vector: list[float]) -> None:
-        self.vectors.append((vector_id, np.array(vector)))
+        vec = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vec.shape[0]
+            elif vec.shape[0] != self.dim:
+                raise ValueError(f"Expected vector of dimension {self.dim}")
+
+            self._detach()
+            row = self.rows.get(vector_id)
+            if row is None:
+                self._reserve(self.size + 1)
+                row = self.size
+                self.size += 1
+                self.ids.append(vector_id)
+                self.rows[vector_id] = row
+            self._store(row, vec)
+
+    def add_batch(self, vector_ids: list[UUID], vectors: list[list[float]]) -> None:
+        if len(vector_ids) != len(vectors):
+            raise ValueError("vector_ids and vectors must have the same length")
+        if not vector_ids:
+            return
+        batch = np.asarray(vectors)
+        new_ids = set(vector_ids)
+        with self._lock:
+            if len(new_ids) != len(vector_ids) or not new_ids.isdisjoint(self.rows):
+                # Known ids overwrite their rows in place, so go row by row
+                super().add_batch(vector_ids, batch)
+                return
+
+            if self.dim is None:
+                self.dim = batch.shape[1]
+            elif batch.shape[1] != self.dim:
+                raise ValueError(f"Expected vectors of dimension {self.dim}")
+
+            self._detach()
+            start, end = self.size, self.size + len(vector_ids)
+            self._reserve(end)
+            self._store(slice(start, end), batch)
+            self.ids.extend(vector_ids)
+            self.rows.update(zip(vector_ids, range(start, end), strict=True))
+            self.size = end
 
     def remove(self, vector_id: UUID) -> None:
-        self.vectors = [(i, v) for (i, v) in self.vectors if i != vector_id]
+        with self._lock:
+            row = self.rows.pop(vector_id, None)
+            if row is None:
+                return
+            self._detach()
+            last = self.size - 1
+            if row != last:
+                moved_id = self.ids[last]
+                self.matrix[row] = self.matrix[last]
+                if self._quantized:
+                    self.scales[row] = self.scales[last]
+                self.norms[row] = self.norms[last]
+                self.ids[row] = moved_id
+                self.rows[moved_id] = row
+            self.ids.pop()
+            self.size -= 1
+
+    def remove_batch(self, vector_ids: list[UUID]) -> None:
+        with self._lock:
+            super().remove_batch(vector_ids)
+
+    def _distances(
+        self, queries: np.ndarray, rows: np.ndarray | None = None
+    ) -> np.ndarray:
+        """
+        Distances from each query row to every stored vector, shape (m, size),
+        or only to the given ``rows``, shape (m, len(rows)).
+        """
+        if rows is None:
+            rows = slice(0, self.size)
+        norms = self.norms[rows]
+        if self.dtype == np.float32:
+            dots = queries @ self.matrix[rows].T
+        else:
+            rows = np.arange(self.size)[rows] if isinstance(rows, slice) else rows
+            dots = np.empty((len(queries), len(rows)), dtype=np.float32)
+            for start in range(0, len(rows), SCORE_BLOCK_SIZE):
+                block = rows[start : start + SCORE_BLOCK_SIZE]
+                dots[:, start : start + len(block)] = queries @ self._decode(block).T
+        query_norms = np.linalg.norm(queries, axis=1)[:, None]
 
-    def _distance(self, a: np.ndarray, b: np.ndarray) -> float:
         if self.metric == "euclidean":
-            return np.linalg.norm(a - b)
-        elif self.metric == "cosine":
-            if not np.any(a) or not np.any(b):
-                return 1.0
-            return 1 - np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+            squared = norms * norms - 2.0 * dots + query_norms * query_norms
+            return np.sqrt(np.maximum(squared, 0.0))
+
+        # Cosine distance, zero vectors are treated as maximally distant (1.0)
+        denom = norms * query_norms
+        distances = np.ones_like(dots)
+        np.divide(dots, denom, out=dots, where=denom > 0)
+        np.subtract(1.0, dots, out=distances, where=denom > 0)
+        return distances
+
+    def _top_k(
+        self, distances: np.ndarray, k: int, rows: np.ndarray | None = None
+    ) -> list[list[tuple[UUID, float]]]:
+        """Top-k of each distance row, whose columns are ``rows`` when given."""
+        n = distances.shape[1]
+        k = min(k, n)
+        if k < n:
+            top = np.argpartition(distances, k - 1, axis=1)[:, :k]
         else:
-            raise ValueError(f"Unsupported metric: {self.metric}")
+            top = np.broadcast_to(np.arange(n), distances.shape)
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_distances = np.take_along_axis(top_distances, order, axis=1)
+        if rows is not None:
+            top = rows[top]
+
+        return [
+            [(self.ids[i], float(d)) for i, d in zip(rows, dists, strict=True)]
+            for rows, dists in zip(top, top_distances, strict=True)
+        ]
 
     def search(self, query_vector: list[float], k: int) -> list[tuple[UUID, float]]:
-        query_vector = np.array(query_vector)
-        results = []
-
-        for vector_id, vec in self.vectors:
-            dist = self._distance(query_vector, vec)
-            if len(results) < k:
-                heapq.heappush(results, (-dist, vector_id))
-            else:
-                if dist < -results[0][0]:
-                    heapq.heappushpop(results, (-dist, vector_id))
-
-        return sorted(
-            [(vector_id, -d) for (d, vector_id) in results], key=lambda x: x[1]
+        return self.search_batch([query_vector], k)[0]
+
+    def search_batch(
+        self, query_vectors: list[list[float]], k: int
+    ) -> list[list[tuple[UUID, float]]]:
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(
+            len(query_vectors), -1
         )
+        with self._lock:
+            if self.size == 0 or k <= 0:
+                return [[] for _ in query_vectors]
+            return self._top_k(self._distances(queries), k)
+
+    def search_filtered(
+        self, query_vectors: list[list[float]], k: int, allowed: set[UUID]
+    ) -> list[list[tuple[UUID, float]]]:
+        """Exact top-k among the ``allowed`` ids, scoring only their rows."""
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(
+            len(query_vectors), -1
+        )
+        with self._lock:
+            rows = np.fromiter(
+                (self.rows[i] for i in allowed if i in self.rows), dtype=np.intp
+            )
+            if len(rows) == 0 or k <= 0:
+                return [[] for _ in query_vectors]
+            if len(rows) == self.size:
+                return self._top_k(self._distances(queries), k)
+            rows.sort()  # Sequential reads of the gathered rows
+            return self._top_k(self._distances(queries, rows), k, rows)
+
+    def search_candidates(
+        self, query_vectors: list[list[float]], k: int, candidates: list[list[UUID]]
+    ) -> list[list[tuple[UUID, float]]]:
+        """
+        Exact top-k of each query among its own ``candidates``, all queries
+        scored in one product. Meant for an index holding the union of the
+        candidates, see ``pq_index.rerank``.
+        """
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(
+            len(query_vectors), -1
+        )
+        with self._lock:
+            if self.size == 0 or k <= 0:
+                return [[] for _ in query_vectors]
+            distances = self._distances(queries)
+            excluded = np.ones(distances.shape, dtype=bool)
+            for row, vector_ids in enumerate(candidates):
+                columns = [self.rows[i] for i in vector_ids if i in self.rows]
+                excluded[row, columns] = False
+            distances[excluded] = np.inf
+            hits = self._top_k(distances, k)
+        return [[(vector_id, d) for vector_id, d in row if d < np.inf] for row in hits]
+
+    # Spilling
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    view = array.view(np.ndarray)
+    view.flags.writeable = False
+    return view
@@ -1,6 +1,25 @@
+import os
+
 from cachetools import LRUCache
 
-from vector_store.app.constants import CHUNKS_LRU_CACHE_SIZE, LSH_LRU_CACHE_SIZE
+from vector_store.app.constants import (
+    CHUNKS_LRU_CACHE_SIZE,
+    EXACT_INDEX_CACHE_MAX_BYTES,
+    METADATA_INDEX_CACHE_MAX_BYTES,
+)
+from vector_store.app.db.index_cache import IndexCache
+from vector_store.app.db.index_spill import index_spill
+from vector_store.app.db.query_cache import QueryCache
 
 chunk_cache = LRUCache(maxsize=CHUNKS_LRU_CACHE_SIZE)
-index_cache = LRUCache(maxsize=LSH_LRU_CACHE_SIZE)  # LSH Index
+index_cache = IndexCache(spill=index_spill)  # Library index, any type, by bytes
+# Exact search fallback, and Chunk.meta postings
+exact_index_cache = IndexCache(
+    int(os.environ.get("EXACT_INDEX_CACHE_MAX_BYTES", EXACT_INDEX_CACHE_MAX_BYTES))
+)
+metadata_index_cache = IndexCache(
+    int(
+        os.environ.get("METADATA_INDEX_CACHE_MAX_BYTES", METADATA_INDEX_CACHE_MAX_BYTES)
+    )
+)
+query_cache = QueryCache()  # Query results, versioned per library
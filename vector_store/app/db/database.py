@@ -1,26 +1,39 @@
+import fcntl
 import logging
 import os
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from vector_store.app.db.base import Base
+from vector_store.app.db.migrations import migrate
 
 logger = logging.getLogger(__name__)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "../../../data/database.db")
 DATABASE_URL = f"sqlite:///{os.path.abspath(DB_PATH)}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{os.path.abspath(DB_PATH)}"
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(bind=engine)
 
+# Same database for the request path, queried without blocking the event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
 # Import models to ensure they are registered with SQLAlchemy
 
 
 def init_db():
     logger.info("🛠️ Initializing database (from main.py)...")
-    Base.metadata.create_all(bind=engine)
+    os.makedirs(os.path.dirname(os.path.abspath(DB_PATH)), exist_ok=True)
+    # Worker processes start together, only one of them creates the tables
+    with open(f"{os.path.abspath(DB_PATH)}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        Base.metadata.create_all(bind=engine)
+        migrate(engine)
 
 
 # Generator function to get a database session
@@ -30,3 +43,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Async counterpart of get_db, used by the API routes
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,110 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from cachetools import TTLCache
+
+from vector_store.app.constants import (
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_TTL,
+    SQL_IN_CLAUSE_BATCH_SIZE,
+)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of embeddings, keyed by (model, input_type,
+    sha256(text)) so identical texts are only embedded once per model.
+
+    Entries live in an in-memory LRU with a TTL. With a ``path`` they are also
+    written to a SQLite file, which survives restarts and refills the memory
+    tier on a hit. Embeddings are kept as float32.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = EMBEDDING_CACHE_SIZE,
+        ttl: float = EMBEDDING_CACHE_TTL,
+        path: Path | str | None = None,
+    ):
+        self.ttl = ttl
+        self.memory: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, embedding BLOB NOT NULL, created_at REAL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def key(model: str, input_type: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        return f"{model}:{input_type}:{digest}"
+
+    def get_many(self, keys: list[str]) -> list[list[float] | None]:
+        """Cached embedding of every key, None for the misses."""
+        with self._lock:
+            found = [self.memory.get(key) for key in keys]
+            missing = [
+                key for key, vector in zip(keys, found, strict=True) if vector is None
+            ]
+            if missing and self._db is not None:
+                stored = self._load(missing)
+                self.memory.update(stored)
+                found = [
+                    stored.get(key) if vector is None else vector
+                    for key, vector in zip(keys, found, strict=True)
+                ]
+            hits = sum(vector is not None for vector in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return [None if vector is None else vector.tolist() for vector in found]
+
+    def put_many(self, keys: list[str], embeddings: list[list[float]]) -> None:
+        vectors = [np.asarray(embedding, dtype=np.float32) for embedding in embeddings]
+        with self._lock:
+            self.memory.update(zip(keys, vectors, strict=True))
+            if self._db is not None:
+                now = time.time()
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                    [
+                        (key, vector.tobytes(), now)
+                        for key, vector in zip(keys, vectors, strict=True)
+                    ],
+                )
+                self._db.commit()
+
+    def _load(self, keys: list[str]) -> dict[str, np.ndarray]:
+        """Unexpired entries of the SQLite store."""
+        stored = {}
+        oldest = time.time() - self.ttl
+        for start in range(0, len(keys), SQL_IN_CLAUSE_BATCH_SIZE):
+            batch = keys[start : start + SQL_IN_CLAUSE_BATCH_SIZE]
+            rows = self._db.execute(
+                "SELECT key, embedding FROM embeddings WHERE created_at >= ? "
+                f"AND key IN ({', '.join('?' * len(batch))})",
+                [oldest, *batch],
+            )
+            for key, blob in rows:
+                stored[key] = np.frombuffer(blob, dtype=np.float32)
+        return stored
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.memory),
+            }
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Future
+
+from vector_store.app.constants import (
+    COHERE_EMBED_BATCH_SIZE,
+    EMBEDDING_BATCH_WINDOW,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_PROVIDER,
+    EMBEDDING_RETRY_BACKOFF,
+)
+from vector_store.app.db.embedding_cache import EmbeddingCache
+from vector_store.app.db.embedding_provider import EmbeddingProvider, create_provider
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingPipeline:
+    """
+    Coalesces the embedding requests of concurrent callers into batched
+    provider calls.
+
+    Texts are queued per ``input_type``. A queue is sent as soon as it holds
+    ``batch_size`` texts, or ``batch_window`` seconds after its first text
+    otherwise. At most ``max_concurrency`` batches are in flight, and a failed
+    batch is retried ``max_retries`` times with exponential backoff before its
+    callers get the error.
+
+    The pipeline runs on its own event loop in a daemon thread, so both the
+    blocking ``embed`` and the awaitable ``aembed`` can be used from any thread.
+    Both look texts up in ``cache`` first and only queue the distinct misses.
+    """
+
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        batch_size: int = COHERE_EMBED_BATCH_SIZE,
+        batch_window: float = EMBEDDING_BATCH_WINDOW,
+        max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+        retry_backoff: float = EMBEDDING_RETRY_BACKOFF,
+        cache: EmbeddingCache | None = None,
+    ):
+        self.provider = provider
+        self.cache = cache
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # input_type -> queued (text, future) pairs and the timer flushing them
+        self._pending: dict[str, list[tuple[str, asyncio.Future]]] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(
+            target=self._loop.run_forever, name="embedding-pipeline", daemon=True
+        ).start()
+
+    @property
+    def model(self) -> str:
+        return self.provider.model
+
+    def embed(self, texts: list[str], input_type: str) -> list[list[float]]:
+        """Embeddings of ``texts``, blocking the calling thread until they're ready."""
+        found, missing = self._lookup(texts, input_type)
+        generated = self._submit(missing, input_type).result() if missing else []
+        return self._merge(texts, input_type, found, missing, generated)
+
+    async def aembed(self, texts: list[str], input_type: str) -> list[list[float]]:
+        """Embeddings of ``texts``, awaitable from any event loop."""
+        found, missing = self._lookup(texts, input_type)
+        generated = []
+        if missing:
+            generated = await asyncio.wrap_future(self._submit(missing, input_type))
+        return self._merge(texts, input_type, found, missing, generated)
+
+    def _lookup(
+        self, texts: list[str], input_type: str
+    ) -> tuple[list[list[float] | None], list[str]]:
+        """Cached embedding of every text (None if missing) and the distinct misses."""
+        if self.cache is None:
+            found = [None] * len(texts)
+        else:
+            found = self.cache.get_many(
+                [self.cache.key(self.model, input_type, text) for text in texts]
+            )
+        missing = [
+            text for text, vector in zip(texts, found, strict=True) if vector is None
+        ]
+        return found, list(dict.fromkeys(missing))
+
+    def _merge(
+        self,
+        texts: list[str],
+        input_type: str,
+        found: list[list[float] | None],
+        missing: list[str],
+        generated: list[list[float]],
+    ) -> list[list[float]]:
+        if self.cache is not None and missing:
+            self.cache.put_many(
+                [self.cache.key(self.model, input_type, text) for text in missing],
+                generated,
+            )
+        embeddings = dict(zip(missing, generated, strict=True))
+        return [
+            embeddings[text] if vector is None else vector
+            for text, vector in zip(texts, found, strict=True)
+        ]
+
+    def _submit(self, texts: list[str], input_type: str) -> Future:
+        return asyncio.run_coroutine_threadsafe(
+            self._enqueue(list(texts), input_type), self._loop
+        )
+
+    # Event loop side
+    async def _enqueue(self, texts: list[str], input_type: str) -> list[list[float]]:
+        if not texts:
+            return []
+        futures = [self._loop.create_future() for _ in texts]
+        pending = self._pending.setdefault(input_type, [])
+        pending.extend(zip(texts, futures, strict=True))
+        while len(pending) >= self.batch_size:
+            self._send(input_type)
+        if pending and input_type not in self._timers:
+            self._timers[input_type] = self._loop.call_later(
+                self.batch_window, self._flush, input_type
+            )
+        return await asyncio.gather(*futures)
+
+    def _flush(self, input_type: str) -> None:
+        """Send everything queued for ``input_type`` once its window is over."""
+        self._timers.pop(input_type, None)
+        while self._pending.get(input_type):
+            self._send(input_type)
+
+    def _send(self, input_type: str) -> None:
+        pending = self._pending[input_type]
+        batch = pending[: self.batch_size]
+        del pending[: self.batch_size]
+        if not pending:
+            timer = self._timers.pop(input_type, None)
+            if timer is not None:
+                timer.cancel()
+        task = self._loop.create_task(self._run(batch, input_type))
+        # The loop only keeps weak references to its tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self, batch: list[tuple[str, asyncio.Future]], input_type: str
+    ) -> None:
+        texts = [text for text, _ in batch]
+        try:
+            async with self._semaphore:
+                embeddings = await self._call(texts, input_type)
+        except Exception as err:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(err)
+            return
+        for (_, future), embedding in zip(batch, embeddings, strict=True):
+            if not future.done():
+                future.set_result(embedding)
+
+    async def _call(self, texts: list[str], input_type: str) -> list[list[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                embeddings = await self.provider.embed(texts, input_type)
+                if len(embeddings) != len(texts):
+                    raise ValueError(
+                        f"Expected {len(texts)} embeddings, got {len(embeddings)}"
+                    )
+                return embeddings
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_backoff * 2**attempt
+                logger.warning(
+                    "Embedding %d texts failed, retrying in %.2fs",
+                    len(texts),
+                    delay,
+                    exc_info=True,
+                )
+                await asyncio.sleep(delay)
+
+
+_pipeline: EmbeddingPipeline | None = None
+_pipeline_lock = threading.Lock()
+
+
+def get_embedding_pipeline() -> EmbeddingPipeline:
+    """
+    The process-wide pipeline, created on first use with the provider named by
+    the ``EMBEDDING_PROVIDER`` environment variable ("cohere" by default). Its
+    cache is backed by the SQLite file of ``EMBEDDING_CACHE_PATH`` when set.
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            name = os.environ.get("EMBEDDING_PROVIDER", EMBEDDING_PROVIDER)
+            path = os.environ.get("EMBEDDING_CACHE_PATH", EMBEDDING_CACHE_PATH)
+            _pipeline = EmbeddingPipeline(
+                create_provider(name), cache=EmbeddingCache(path=path)
+            )
+        return _pipeline
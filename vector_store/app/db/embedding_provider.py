@@ -0,0 +1,85 @@
+import hashlib
+import os
+import re
+from abc import ABC, abstractmethod
+
+import numpy as np
+from dotenv import load_dotenv
+
+from vector_store.app.constants import COHERE_EMBED_MODEL, EMBEDDING_DIM
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class EmbeddingProvider(ABC):
+    """
+    Source of embeddings behind the ``EmbeddingPipeline``.
+
+    ``embed`` receives whole batches and is awaited on the pipeline's event
+    loop, so providers with an async client never block it.
+    """
+
+    model: str
+
+    @abstractmethod
+    async def embed(self, texts: list[str], input_type: str) -> list[list[float]]:
+        """
+        One embedding per text. ``input_type`` is "search_document" for chunks
+        and "search_query" for queries.
+        """
+
+
+class CohereProvider(EmbeddingProvider):
+    def __init__(self, model: str = COHERE_EMBED_MODEL):
+        # Imported here so the local provider works without the Cohere package
+        import cohere
+
+        load_dotenv()
+        self.model = model
+        self.client = cohere.AsyncClient(os.environ["COHERE_API_KEY"])
+
+    async def embed(self, texts: list[str], input_type: str) -> list[list[float]]:
+        response = await self.client.embed(
+            texts=texts, input_type=input_type, model=self.model
+        )
+        return response.embeddings
+
+
+class HashingProvider(EmbeddingProvider):
+    """
+    Deterministic local embeddings for tests and offline benchmarks.
+
+    Word unigrams and bigrams are hashed (feature hashing) into ``dim`` signed
+    buckets and the vector is L2 normalized, so texts sharing words are close
+    in cosine similarity. Documents and queries share the same space.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.model = f"hashing-{dim}"
+
+    async def embed(self, texts: list[str], input_type: str) -> list[list[float]]:
+        return [self.embed_text(text) for text in texts]
+
+    def embed_text(self, text: str) -> list[float]:
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        features = tokens + [
+            f"{a} {b}" for a, b in zip(tokens, tokens[1:], strict=False)
+        ]
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in features or [text]:
+            # blake2b rather than hash(), which is salted per process
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dim] += 1.0 if value >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm > 0 else vector).tolist()
+
+
+def create_provider(name: str) -> EmbeddingProvider:
+    if name == "cohere":
+        return CohereProvider()
+    elif name == "hashing":
+        return HashingProvider()
+    else:
+        raise ValueError(f"Unknown embedding provider: {name}")
@@ -0,0 +1,32 @@
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+from sqlalchemy.orm import Session
+
+from vector_store.app.constants import SEARCH_EXECUTOR_WORKERS
+from vector_store.app.db.database import SessionLocal
+
+T = TypeVar("T")
+
+# Bounded pool for NumPy-heavy index work, separate from the event loop and from
+# the threads waiting on embedding providers
+search_executor = ThreadPoolExecutor(
+    max_workers=SEARCH_EXECUTOR_WORKERS, thread_name_prefix="search"
+)
+
+
+async def run_in_session(fn: Callable[[Session], T]) -> T:
+    """
+    Run ``fn`` on the search executor with a sync session of its own.
+
+    The session doesn't expire objects on commit, so the ORM objects returned
+    by ``fn`` stay readable once it is closed.
+    """
+
+    def job() -> T:
+        with SessionLocal(expire_on_commit=False) as db:
+            return fn(db)
+
+    return await asyncio.get_running_loop().run_in_executor(search_executor, job)
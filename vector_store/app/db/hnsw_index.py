@@ -0,0 +1,365 @@
+import heapq
+import math
+import random
+import threading
+from typing import Any
+from uuid import UUID
+
+import numpy as np
+
+from vector_store.app.constants import (
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    HNSW_M,
+)
+from vector_store.app.db.index import ID_BYTES, Index
+from vector_store.app.db.vector_dtype import check_dtype, decode, encode
+
+INITIAL_CAPACITY = 64
+
+
+class HNSWIndex(Index):
+    """
+    Hierarchical navigable small-world graph over cosine distance.
+
+    Every node lives on layer 0 and on a random number of upper layers, each
+    layer being a proximity graph with at most ``M`` links per node (``2 * M``
+    on layer 0). Searches greedily descend from the entry point on the top
+    layer and run a best-first search of width ``ef_search`` on layer 0.
+
+    Removed nodes are tombstoned: their neighbors are relinked immediately,
+    they stay traversable but are never returned, and the graph is rebuilt
+    once tombstones outnumber live nodes.
+
+    Normalized vectors are stored as ``dtype`` ("float32", "float16" or "int8"
+    codes with a scale per node) and decoded to float32 for every product.
+
+    Nodes whose links changed are tracked in ``dirty`` / ``removed`` so the
+    repository only has to persist those (see ``pop_changes``).
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        M: int = HNSW_M,
+        ef_construction: int = HNSW_EF_CONSTRUCTION,
+        ef_search: int = HNSW_EF_SEARCH,
+        seed: int | None = None,
+        dtype: str = "float32",
+    ):
+        if M < 2:
+            raise ValueError("M must be at least 2")
+        if ef_construction < 1 or ef_search < 1:
+            raise ValueError("ef_construction and ef_search must be positive")
+        self.dim = dim
+        self.M = M
+        self.M0 = 2 * M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.level_mult = 1 / math.log(M)
+        self.dtype = check_dtype(dtype)
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.ids: list[UUID] = []  # Node -> vector id
+        self.nodes: dict[UUID, int] = {}  # Live vector id -> node
+        self.links: list[list[list[int]]] = []  # Node -> layer -> neighbor nodes
+        self.deleted: set[int] = set()
+        self.data = np.empty((0, self.dim), dtype=self.dtype)
+        self.scales = np.empty(0, dtype=np.float32)  # Per node, int8 only
+        self.entry_point: int | None = None
+        self.max_level = -1
+        self.dirty: set[UUID] = set()
+        self.removed: set[UUID] = set()
+
+    # Graph primitives
+    def _new_node(self, vector_id: UUID, vector: np.ndarray, level: int) -> int:
+        node = len(self.ids)
+        if node >= self.data.shape[0]:
+            capacity = max(INITIAL_CAPACITY, 2 * node)
+            data = np.empty((capacity, self.dim), self.dtype)
+            data[:node] = self.data[:node]
+            self.data = data
+            scales = np.ones(capacity, np.float32)
+            scales[: len(self.scales)] = self.scales
+            self.scales = scales
+        codes, scale = encode(vector, self.dtype)
+        self.data[node] = codes
+        if scale is not None:
+            self.scales[node] = scale
+        self.ids.append(vector_id)
+        self.links.append([[] for _ in range(level + 1)])
+        self.nodes[vector_id] = node
+        return node
+
+    @staticmethod
+    def _normalize(vector: list[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def _vectors(self, nodes) -> np.ndarray:
+        """float32 vectors of ``nodes`` (an index or a list of them)."""
+        if self.dtype == np.int8:
+            return decode(self.data[nodes], self.scales[nodes])
+        return decode(self.data[nodes])
+
+    def _distances(self, query: np.ndarray, nodes: list[int]) -> np.ndarray:
+        return 1.0 - self._vectors(nodes) @ query
+
+    def _search_layer(
+        self, query: np.ndarray, entry_points: list[int], ef: int, level: int
+    ) -> list[tuple[float, int]]:
+        """Best-first search on one layer, returns (distance, node) ascending."""
+        visited = set(entry_points)
+        distances = self._distances(query, entry_points)
+        candidates = [
+            (float(d), n) for d, n in zip(distances, entry_points, strict=True)
+        ]
+        heapq.heapify(candidates)
+        results = [(-d, n) for d, n in candidates]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            dist, node = heapq.heappop(candidates)
+            if dist > -results[0][0]:
+                break
+            neighbors = [n for n in self.links[node][level] if n not in visited]
+            if not neighbors:
+                continue
+            visited.update(neighbors)
+            distances = self._distances(query, neighbors)
+            if len(results) >= ef:
+                closer = distances < -results[0][0]
+                if not closer.any():
+                    continue
+                neighbors = [
+                    n for n, keep in zip(neighbors, closer, strict=True) if keep
+                ]
+                distances = distances[closer]
+            for d, n in zip(distances.tolist(), neighbors, strict=True):
+                if len(results) < ef or d < -results[0][0]:
+                    heapq.heappush(candidates, (d, n))
+                    heapq.heappush(results, (-d, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+
+        return sorted((-d, n) for d, n in results)
+
+    def _select_neighbors(
+        self, base: np.ndarray, candidates: list[int], m: int
+    ) -> list[int]:
+        """
+        Neighbor selection heuristic: keep a candidate only if it is closer to
+        the base than to any neighbor already kept, then top up with the
+        closest pruned ones.
+        """
+        if not candidates:
+            return []
+        cand = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+        vecs = self._vectors(cand)
+        to_base = 1.0 - vecs @ base
+        order = np.argsort(to_base, kind="stable")
+        cand, to_base = cand[order], to_base[order]
+        if len(cand) <= m:
+            return cand.tolist()
+
+        vecs = vecs[order]
+        pairwise = 1.0 - vecs @ vecs.T
+        # Distance of every candidate to its closest already selected neighbor
+        closest = np.full(len(cand), np.inf, dtype=pairwise.dtype)
+        selected: list[int] = []
+        pruned: list[int] = []
+        for i in range(len(cand)):
+            if len(selected) >= m:
+                break
+            if closest[i] > to_base[i]:
+                selected.append(i)
+                np.minimum(closest, pairwise[i], out=closest)
+            else:
+                pruned.append(i)
+        selected.extend(pruned[: m - len(selected)])
+        return cand[selected].tolist()
+
+    def _descend(self, query: np.ndarray, down_to: int) -> list[int]:
+        entry = [self.entry_point]
+        for level in range(self.max_level, down_to, -1):
+            entry = [self._search_layer(query, entry, 1, level)[0][1]]
+        return entry
+
+    # Index interface
+    def add(self, vector_id: UUID, vector: list[float]) -> None:
+        with self._lock:
+            if vector_id in self.nodes:
+                self.remove(vector_id)
+            vec = self._normalize(vector)
+            level = int(-math.log(1.0 - self._rng.random()) * self.level_mult)
+            node = self._new_node(vector_id, vec, level)
+            self.dirty.add(vector_id)
+            self.removed.discard(vector_id)
+
+            if self.entry_point is None:
+                self.entry_point, self.max_level = node, level
+                return
+
+            entry = self._descend(vec, level)
+            for lc in range(min(level, self.max_level), -1, -1):
+                found = self._search_layer(vec, entry, self.ef_construction, lc)
+                live = [n for _, n in found if n not in self.deleted] or [
+                    n for _, n in found
+                ]
+                neighbors = self._select_neighbors(vec, live, self.M)
+                self.links[node][lc] = neighbors
+
+                m_max = self.M0 if lc == 0 else self.M
+                for n in neighbors:
+                    n_links = self.links[n][lc]
+                    n_links.append(node)
+                    if len(n_links) > m_max:
+                        self.links[n][lc] = self._select_neighbors(
+                            self._vectors(n), n_links, m_max
+                        )
+                    if n not in self.deleted:
+                        self.dirty.add(self.ids[n])
+                entry = [n for _, n in found]
+
+            if level > self.max_level:
+                self.entry_point, self.max_level = node, level
+
+    def remove(self, vector_id: UUID) -> None:
+        with self._lock:
+            node = self.nodes.pop(vector_id, None)
+            if node is None:
+                return
+            self.deleted.add(node)
+            self.dirty.discard(vector_id)
+            self.removed.add(vector_id)
+
+            if not self.nodes:
+                removed = self.removed
+                self._reset()
+                self.removed = removed
+                return
+
+            # Relink the neighbors of the removed node among themselves
+            for lc, neighbors in enumerate(self.links[node]):
+                m_max = self.M0 if lc == 0 else self.M
+                for n in neighbors:
+                    if n in self.deleted:
+                        continue
+                    candidates = {x for x in self.links[n][lc] if x != node}
+                    candidates.update(
+                        x for x in neighbors if x != n and x not in self.deleted
+                    )
+                    self.links[n][lc] = self._select_neighbors(
+                        self._vectors(n), list(candidates), m_max
+                    )
+                    self.dirty.add(self.ids[n])
+
+            if node == self.entry_point:
+                self.entry_point = max(
+                    self.nodes.values(), key=lambda n: len(self.links[n])
+                )
+                self.max_level = len(self.links[self.entry_point]) - 1
+
+            if len(self.deleted) > len(self.nodes):
+                self._rebuild()
+
+    def _rebuild(self) -> None:
+        """Drop tombstones by re-inserting every live vector."""
+        live = [
+            (vector_id, self._vectors(node)) for vector_id, node in self.nodes.items()
+        ]
+        removed = self.removed
+        self._reset()
+        for vector_id, vector in live:
+            self.add(vector_id, vector)
+        self.removed = removed
+
+    def search(self, query_vector: list[float], k: int) -> list[tuple[UUID, float]]:
+        with self._lock:
+            if not self.nodes or k <= 0:
+                return []
+            query = self._normalize(query_vector)
+            entry = self._descend(query, 0)
+            found = self._search_layer(query, entry, max(self.ef_search, k), 0)
+            results = [
+                (self.ids[n], 1.0 - d) for d, n in found if n not in self.deleted
+            ]
+            return results[:k]
+
+    # Persistence helpers
+    def pop_changes(self) -> tuple[set[UUID], set[UUID]]:
+        """Vector ids whose node changed and ids removed since the last call."""
+        with self._lock:
+            dirty, removed = self.dirty, self.removed
+            self.dirty, self.removed = set(), set()
+            return dirty, removed
+
+    def node_links(self, vector_id: UUID) -> list[list[str]]:
+        """Links of a live node per layer, as vector id strings."""
+        node = self.nodes[vector_id]
+        return [
+            [str(self.ids[n]) for n in layer if n not in self.deleted]
+            for layer in self.links[node]
+        ]
+
+    def restore(self, entries: list[tuple[UUID, list[float], list[list[str]]]]) -> None:
+        """Rebuild the graph from persisted (vector_id, vector, links) entries."""
+        with self._lock:
+            for vector_id, vector, links in entries:
+                self._new_node(vector_id, self._normalize(vector), len(links) - 1)
+            for vector_id, _, links in entries:
+                node = self.nodes[vector_id]
+                self.links[node] = [
+                    [self.nodes[UUID(n)] for n in layer if UUID(n) in self.nodes]
+                    for layer in links
+                ]
+            if self.nodes:
+                self.entry_point = max(
+                    self.nodes.values(), key=lambda n: len(self.links[n])
+                )
+                self.max_level = len(self.links[self.entry_point]) - 1
+
+    @property
+    def nbytes(self) -> int:
+        # Vectors are private copies. Each node holds its id in ``ids`` and
+        # ``nodes`` and about M0 links on layer 0, upper layers are rare.
+        return (
+            self.data.nbytes
+            + self.scales.nbytes
+            + len(self.ids) * (2 * ID_BYTES + 8 * self.M0 + 112)
+        )
+
+    # Spilling
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "dim": self.dim,
+            "M": self.M,
+            "ef_construction": self.ef_construction,
+            "ef_search": self.ef_search,
+            "dtype": self.dtype.name,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "HNSWIndex":
+        return cls(
+            dim=data["dim"],
+            M=data["M"],
+            ef_construction=data["ef_construction"],
+            ef_search=data["ef_search"],
+            dtype=data["dtype"],
+        )
@@ -1,16 +1,96 @@
+import mmap
 from abc import ABC, abstractmethod
 from uuid import UUID
 
+import numpy as np
+
+# Rough memory of one vector id held in a Python list, dict or set, used to
+# estimate the size of indexes
+ID_BYTES = 100
+
+
+def is_private(array: np.ndarray) -> bool:
+    """Whether an array is private memory, not a view of a segment mapping."""
+    base = array
+    while isinstance(base, np.ndarray):
+        base = base.base
+    return not isinstance(base, mmap.mmap)
+
 
 class Index(ABC):
     @abstractmethod
     def add(self, vector_id: UUID, vector: list[float]) -> None:
         pass
 
+    def add_batch(self, vector_ids: list[UUID], vectors: list[list[float]]) -> None:
+        """Add many vectors at once. Indexes override this when they can batch."""
+        for vector_id, vector in zip(vector_ids, vectors, strict=True):
+            self.add(vector_id, vector)
+
+    @property
+    @abstractmethod
+    def nbytes(self) -> int:
+        """
+        Estimated private memory of the index. Rows served from a vector segment
+        mapping are shared by the workers and not counted.
+        """
+
+    def bind(self, storage) -> None:
+        """
+        Re-attach what an unpickled index left to its library's vector segment
+        (``storage``), see ``IndexSpill``. Nothing by default.
+        """
+        return
+
+    def needs_training(self) -> bool:
+        """True when ``train`` should be called with the index's full contents."""
+        return False
+
+    def train(self, vector_ids: list[UUID], vectors: list[list[float]]) -> None:
+        """
+        Fit any learned structure (centroids, codebooks) on the given vectors and
+        reload the index with them. Indexes without one have nothing to do.
+        """
+        return
+
     @abstractmethod
     def remove(self, vector_id: UUID) -> None:
         pass
 
+    def remove_batch(self, vector_ids: list[UUID]) -> None:
+        """Remove many vectors at once. Indexes override this when they can batch."""
+        for vector_id in vector_ids:
+            self.remove(vector_id)
+
     @abstractmethod
     def search(self, query_vector: list[float], k: int) -> list[tuple[UUID, float]]:
         pass
+
+    def search_batch(
+        self, query_vectors: list[list[float]], k: int
+    ) -> list[list[tuple[UUID, float]]]:
+        """Search many queries at once. Indexes override this when they can batch."""
+        return [self.search(query_vector, k) for query_vector in query_vectors]
+
+    def search_filtered(
+        self, query_vectors: list[list[float]], k: int, allowed: set[UUID]
+    ) -> list[list[tuple[UUID, float]]]:
+        """
+        Top-k among the ``allowed`` ids only. By default the index is searched
+        for ever more results until k of them pass the filter (post-filtering),
+        indexes override this to apply the filter while scoring.
+        """
+        results: list[list[tuple[UUID, float]]] = [[] for _ in query_vectors]
+        if k <= 0 or not allowed:
+            return results
+        pending, fetch = list(range(len(query_vectors))), 2 * k
+        while pending:
+            hits = self.search_batch([query_vectors[i] for i in pending], fetch)
+            unfilled = []
+            for i, row in zip(pending, hits, strict=True):
+                results[i] = [hit for hit in row if hit[0] in allowed][:k]
+                # A short result list means the index has nothing more to give
+                if len(results[i]) < k and len(row) >= fetch:
+                    unfilled.append(i)
+            pending, fetch = unfilled, 2 * fetch
+        return results
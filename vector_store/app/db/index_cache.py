@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+from vector_store.app.constants import INDEX_CACHE_MAX_BYTES
+from vector_store.app.db.index import Index
+from vector_store.app.db.index_spill import IndexSpill
+
+
+@dataclass
+class _Entry:
+    index: Index
+    nbytes: int
+    load_seconds: float = 0.0  # Time the last load of the index took
+    hits: int = 0
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    def value(self, now: float) -> float:
+        """Load time saved per second and per byte by keeping the index."""
+        hit_rate = (self.hits + 1) / max(now - self.loaded_at, 1.0)
+        return hit_rate * self.load_seconds / max(self.nbytes, 1)
+
+
+class IndexCache:
+    """
+    Resident library indexes, bounded by their estimated memory
+    (``Index.nbytes``) rather than their number.
+
+    When the total goes over ``max_bytes``, the indexes worth the least are
+    evicted first: those with the lowest hit rate × load time / size, so a
+    large index that is rarely queried and quick to reload goes before a small
+    hot one. The index just inserted or resized is never evicted, even when it
+    alone is over the budget. Evicted indexes are handed to ``spill``.
+
+    The exact and metadata indexes have caches of their own, without spill.
+    Anything with an ``nbytes`` estimate can be cached.
+
+    Used like a dict by the repositories; ``put`` also records how long the
+    index took to load, and ``resize`` re-measures an index after mutations.
+    """
+
+    def __init__(self, max_bytes: int | None = None, spill: IndexSpill | None = None):
+        if max_bytes is None:
+            max_bytes = int(
+                os.environ.get("INDEX_CACHE_MAX_BYTES", INDEX_CACHE_MAX_BYTES)
+            )
+        self.max_bytes = max_bytes
+        self.spill = spill
+        self.entries: dict[str, _Entry] = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Index | None = None) -> Index | None:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            entry.hits += 1
+            self.hits += 1
+            return entry.index
+
+    def __getitem__(self, key: str) -> Index:
+        index = self.get(key)
+        if index is None:
+            raise KeyError(key)
+        return index
+
+    def __setitem__(self, key: str, index: Index) -> None:
+        self.put(key, index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def keys(self) -> list[str]:
+        with self._lock:
+            return list(self.entries)
+
+    def put(self, key: str, index: Index, load_seconds: float | None = None) -> None:
+        """Insert or replace the index of a library, then enforce the budget."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.index is not index:
+                self._discard(key)
+                entry = _Entry(index, index.nbytes)
+                self.entries[key] = entry
+                self.nbytes += entry.nbytes
+                self.loads += 1
+            if load_seconds is not None:
+                entry.load_seconds = load_seconds
+            evicted = self._evict(key)
+        self._spill(evicted)
+
+    def resize(self, key: str) -> None:
+        """Re-measure an index whose size changed, then enforce the budget."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            nbytes = entry.index.nbytes
+            self.nbytes += nbytes - entry.nbytes
+            entry.nbytes = nbytes
+            evicted = self._evict(key)
+        self._spill(evicted)
+
+    def pop(self, key: str, default: Index | None = None) -> Index | None:
+        """Forget an index that is stale, without spilling it."""
+        with self._lock:
+            entry = self._discard(key)
+            return default if entry is None else entry.index
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def _discard(self, key: str) -> _Entry | None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry.nbytes
+        return entry
+
+    def _evict(self, keep: str) -> list[tuple[str, Index, int | None]]:
+        """
+        Drop the least valuable indexes until the budget is met. Each comes
+        with the library epoch it reflects, read before a writer can load the
+        library again and change it.
+        """
+        # Local import: library_epoch imports the caches
+        from vector_store.app.db import library_epoch
+
+        evicted = []
+        now = time.monotonic()
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            key = min(
+                (key for key in self.entries if key != keep),
+                key=lambda key: self.entries[key].value(now),
+            )
+            evicted.append((key, self._discard(key).index, library_epoch.seen(key)))
+            self.evictions += 1
+        return evicted
+
+    def _spill(self, evicted: list[tuple[str, Index, int | None]]) -> None:
+        if self.spill is not None:
+            for key, index, epoch in evicted:
+                self.spill.save(key, index, epoch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            stats = {
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "size": len(self.entries),
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "libraries": {
+                    key: {
+                        "type": type(entry.index).__name__,
+                        "bytes": entry.nbytes,
+                        "hits": entry.hits,
+                        "load_seconds": round(entry.load_seconds, 4),
+                        "value": entry.value(now),
+                    }
+                    for key, entry in self.entries.items()
+                },
+            }
+        if self.spill is not None:
+            stats["spill"] = self.spill.stats()
+        return stats
@@ -0,0 +1,68 @@
+import logging
+import threading
+from uuid import UUID
+
+from vector_store.app.constants import INDEX_COMPACTION_INTERVAL
+from vector_store.app.db.database import SessionLocal
+from vector_store.app.db.index_manager import IndexManager
+from vector_store.app.db.index_wal import index_wal
+from vector_store.app.db.repositories.library_repo import LibraryRepository
+
+logger = logging.getLogger(__name__)
+
+
+class IndexCompactor:
+    """
+    Background thread folding the write-ahead log of every library into its
+    persisted index every ``interval`` seconds (see ``IndexManager.compact``).
+
+    Each worker process runs one. They take the segment lock of the library
+    they compact, so a log is folded once whichever worker gets to it first.
+    """
+
+    def __init__(self, interval: float = INDEX_COMPACTION_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="index-compactor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the thread, waiting for a compaction in progress to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def run_once(self) -> int:
+        """Compact every library with pending records, return how many were."""
+        compacted = 0
+        for library_id in index_wal.pending():
+            try:
+                with SessionLocal() as db:
+                    library = LibraryRepository(db).get(UUID(library_id))
+                    if library is None:
+                        # Deleted library, nothing left to fold into
+                        index_wal.clear(library_id)
+                        continue
+                    compacted += IndexManager(db).compact(library)
+            except Exception:
+                # The log stays in place, the next run retries
+                logger.exception(
+                    "Failed to compact the index of library %s", library_id
+                )
+        return compacted
+
+
+index_compactor = IndexCompactor()
@@ -1,17 +1,47 @@
 from vector_store.app.constants import EMBEDDING_DIM
 from vector_store.app.db.bruteforce_index import BruteForceIndex
+from vector_store.app.db.hnsw_index import HNSWIndex
 from vector_store.app.db.index import Index
+from vector_store.app.db.ivf_index import IVFIndex
 from vector_store.app.db.lsh_index import LSHIndex
+from vector_store.app.db.pq_index import PQIndex
+from vector_store.app.db.vector_dtype import check_dtype
 
 
 class IndexFactory:
     @staticmethod
     def create(
-        index_type: str = "lsh", dim: int = EMBEDDING_DIM, metric: str = "euclidean"
+        index_type: str = "lsh",
+        dim: int = EMBEDDING_DIM,
+        metric: str = "euclidean",
+        compression: str | None = None,
+        vector_dtype: str = "float32",
+        **params,
     ) -> Index:
+        check_dtype(vector_dtype)
+        if compression not in (None, "pq", "opq"):
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression and index_type not in ("bruteforce", "ivf"):
+            raise ValueError(f"Compression is not supported by {index_type} indexes")
+
         if index_type == "lsh":
-            return LSHIndex(dim=dim)
+            return LSHIndex(dim=dim, dtype=vector_dtype, **params)
         elif index_type == "bruteforce":
-            return BruteForceIndex(metric=metric)
+            if compression:
+                return PQIndex(
+                    dim=dim,
+                    opq=compression == "opq",
+                    **{"metric": metric, **params},
+                )
+            return BruteForceIndex(metric=metric, dtype=vector_dtype)
+        elif index_type == "hnsw":
+            return HNSWIndex(dim=dim, dtype=vector_dtype, **params)
+        elif index_type == "ivf":
+            return IVFIndex(
+                dim=dim,
+                compression=compression,
+                dtype=vector_dtype,
+                **{"metric": metric, **params},
+            )
         else:
             raise ValueError(f"Unknown index type: {index_type}")
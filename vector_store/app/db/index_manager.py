@@ -0,0 +1,500 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from vector_store.app.constants import EMBEDDING_DIM, FILTER_PREFILTER_SELECTIVITY
+from vector_store.app.db import library_epoch
+from vector_store.app.db.bruteforce_index import BruteForceIndex
+from vector_store.app.db.cache import (
+    exact_index_cache,
+    index_cache,
+    metadata_index_cache,
+)
+from vector_store.app.db.index import Index
+from vector_store.app.db.index_factory import IndexFactory
+from vector_store.app.db.index_spill import index_spill
+from vector_store.app.db.index_wal import index_wal
+from vector_store.app.db.metadata_index import MetadataIndex
+from vector_store.app.db.models.library import Library
+from vector_store.app.db.repositories.chunk_repo import ChunkRepository
+from vector_store.app.db.repositories.hnsw_index_repo import HNSWIndexRepository
+from vector_store.app.db.repositories.ivf_index_repo import IVFIndexRepository
+from vector_store.app.db.repositories.lsh_index_repo import LSHIndexRepository
+from vector_store.app.db.repositories.pq_index_repo import PQIndexRepository
+from vector_store.app.db.vector_segment import (
+    VectorSegment,
+    find_segment,
+    get_segment,
+)
+
+logger = logging.getLogger(__name__)
+
+# One lock per library so concurrent requests don't build the same metadata index
+# twice. Indexes are loaded under the segment lock, which also orders them with
+# the writers.
+_load_locks: defaultdict[str, threading.Lock] = defaultdict(threading.Lock)
+
+
+class IndexManager:
+    """
+    Owns the in-memory index of every library, whatever its type.
+
+    Indexes stay resident in ``index_cache`` across requests, within its memory
+    budget. On a miss they are reloaded from their spill (see ``IndexSpill``)
+    if still current, restored from their repository (LSH, HNSW, IVF,
+    compressed brute force) or built from the library's vector segment, never
+    from a table scan. Chunk
+    mutations are applied to the resident index and appended to the library's
+    write-ahead log (``index_wal``). The ``IndexCompactor`` folds the log into
+    the persisted index in the background, and loading an index replays the
+    records it has not folded yet.
+
+    It also keeps a ``MetadataIndex`` of every library's chunk metadata, used
+    to restrict searches to the chunks matching a filter.
+
+    Each worker process has its own caches. Before using them the manager
+    checks the library's epoch (see ``library_epoch``) and drops them if
+    another worker changed the library. Mutations hold the segment lock, so
+    workers apply and persist them one at a time on an up to date index.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.chunk_repo = ChunkRepository(db)
+        self.repos = {
+            "lsh": LSHIndexRepository(db),
+            "hnsw": HNSWIndexRepository(db),
+            "ivf": IVFIndexRepository(db),
+            "pq": PQIndexRepository(db),
+        }
+
+    @staticmethod
+    def _kind(index_type: str, compression: str | None) -> str:
+        """Repository key of an index, compressed brute force indexes are "pq"."""
+        if index_type == "bruteforce" and compression:
+            return "pq"
+        return index_type
+
+    # Lifecycle
+    def get(self, library: Library) -> Index:
+        """The library's resident index, loaded or built on first use."""
+        return self._load(library)[0]
+
+    def _load(self, library: Library) -> tuple[Index, bool]:
+        """
+        The library's resident index and whether it was just built from the
+        vector segment, in which case it already reflects every stored chunk.
+        """
+        key = str(library.id)
+        library_epoch.sync(key)
+        index = index_cache.get(key)
+        if index is not None:
+            return index, False
+        segment = get_segment(library.id)
+        with segment.locked():
+            index = index_cache.get(key)
+            if index is not None:
+                return index, False
+            start = time.perf_counter()
+            kind = self._kind(library.index_type, library.compression)
+            repo = self.repos.get(kind)
+            # A spill of the current epoch already reflects every logged mutation
+            index = index_spill.load(library.id, segment.epoch) if repo else None
+            touched = []
+            if index is None:
+                if kind in ("lsh", "hnsw"):
+                    # The snapshot may list chunks the log has deleted since
+                    touched = _touched(index_wal.read(library.id))
+                    index = repo.get(library.id, pending=set(touched))
+                else:
+                    index = repo.get(library.id) if repo else None
+                if index is None:
+                    index = self._build(library)
+                    # The full snapshot supersedes the log
+                    index_wal.clear(library.id)
+                    index_cache.put(key, index, time.perf_counter() - start)
+                    return index, True
+                if touched:
+                    self._replay(library, index, touched)
+                # IVF assignments and PQ codes are derived from the segment on load
+            index_cache.put(key, index, time.perf_counter() - start)
+            return index, False
+
+    def _replay(self, library: Library, index: Index, touched: list[UUID]) -> None:
+        """
+        Apply the logged mutations missing from a loaded snapshot. The segment
+        holds the final vectors, so every touched chunk is removed and the ones
+        still stored are added back.
+        """
+        logger.info(
+            "Replaying %d logged chunks into library %s", len(touched), library.id
+        )
+        self._apply(library, index, touched)
+
+    @staticmethod
+    def _apply(library: Library, index: Index, touched: list[UUID]) -> None:
+        """Bring the touched chunks of ``index`` up to date with the segment."""
+        segment = get_segment(library.id)
+        index.remove_batch(touched)
+        present = [chunk_id for chunk_id in touched if chunk_id in segment]
+        if present:
+            index.add_batch(present, [segment.get(chunk_id) for chunk_id in present])
+
+    @staticmethod
+    def _new(library: Library) -> Index:
+        """Empty index of the library's type and parameters."""
+        return IndexFactory.create(
+            library.index_type,
+            dim=EMBEDDING_DIM,
+            compression=library.compression,
+            vector_dtype=library.vector_dtype,
+            **(library.index_params or {}),
+        )
+
+    def _build(self, library: Library) -> Index:
+        logger.info("Building %s index for library %s", library.index_type, library.id)
+        index = self._new(library)
+        if type(index) is BruteForceIndex:
+            # Served in place from the segment mapping shared by the workers
+            index.attach(*get_segment(library.id).codes())
+            return index
+        chunk_ids, embeddings = self.chunk_repo.embeddings_by_library(library.id)
+        index.add_batch(chunk_ids, embeddings)
+        if index.needs_training():
+            index.train(chunk_ids, embeddings)
+        self._save(library.id, library.index_type, library.compression, index)
+        return index
+
+    def create(
+        self,
+        library_id: UUID,
+        index_type: str,
+        index_params: dict | None = None,
+        compression: str | None = None,
+        vector_dtype: str = "float32",
+    ) -> Index:
+        """Create, persist and cache the empty index of a new library."""
+        index = IndexFactory.create(
+            index_type,
+            dim=EMBEDDING_DIM,
+            compression=compression,
+            vector_dtype=vector_dtype,
+            **(index_params or {}),
+        )
+        self._save(library_id, index_type, compression, index)
+        index_cache[str(library_id)] = index
+        return index
+
+    def drop(self, library_id: UUID, index_type: str, compression: str | None = None):
+        """Forget the library's index, in memory and in its repository."""
+        repo = self.repos.get(self._kind(index_type, compression))
+        if repo:
+            repo.delete(library_id)
+        index_wal.clear(library_id)
+        index_spill.delete(library_id)
+        index_cache.pop(str(library_id), None)
+        exact_index_cache.pop(str(library_id), None)
+        metadata_index_cache.pop(str(library_id), None)
+
+    def _save(
+        self, library_id: UUID, index_type: str, compression: str | None, index: Index
+    ):
+        repo = self.repos.get(self._kind(index_type, compression))
+        if repo:
+            repo.save(library_id, index)
+
+    # Incremental updates
+    @contextmanager
+    def _writing(self, library: Library):
+        """
+        Exclusive write access to the library across threads and worker
+        processes. Caches made stale by other workers are dropped on entry, and
+        the change is published to them on exit.
+        """
+        with get_segment(library.id).locked():
+            library_epoch.sync(library.id)
+            yield
+            library_epoch.publish(library.id)
+
+    def invalidate(self, library_id: UUID) -> None:
+        """
+        Publish a change of the library to every worker, which drops its cached
+        query results, chunks and (in other workers) indexes.
+        """
+        library_epoch.publish(library_id)
+
+    def add(self, library: Library, chunk_ids: list[UUID], embeddings) -> None:
+        """Add new chunks to the library's index and log them."""
+        if not chunk_ids:
+            return
+        with self._writing(library):
+            if self._served_from_segment(library):
+                return
+            # The segment is written first, so a freshly built index has them already
+            index, built = self._load(library)
+            if built:
+                return
+            index.add_batch(chunk_ids, embeddings)
+            index_wal.append(library.id, "add", chunk_ids)
+            index_cache.resize(str(library.id))
+
+    def replace(self, library: Library, chunk_id: UUID, embedding) -> None:
+        """Re-index a chunk whose embedding changed."""
+        with self._writing(library):
+            if self._served_from_segment(library):
+                return
+            index, built = self._load(library)
+            if built:
+                return
+            index.remove(chunk_id)
+            index.add(chunk_id, embedding)
+            index_wal.append(library.id, "replace", [chunk_id])
+            index_cache.resize(str(library.id))
+
+    def _served_from_segment(self, library: Library) -> bool:
+        """
+        Forget the library's exact indexes after a change of its segment. They
+        serve the segment mapping in place, and updating them would copy it
+        whole to private memory in every worker; they are attached again on
+        next use instead. Returns whether the library's index is one of them
+        (plain brute force), leaving nothing else to update.
+        """
+        key = str(library.id)
+        exact_index_cache.pop(key, None)
+        if self._kind(library.index_type, library.compression) != "bruteforce":
+            return False
+        index_cache.pop(key, None)
+        return True
+
+    def remove(self, library: Library, chunk_ids: list[UUID]) -> None:
+        """Remove chunks from the library's index and log them."""
+        if not chunk_ids:
+            return
+        with self._writing(library):
+            metadata = metadata_index_cache.get(str(library.id))
+            if metadata is not None:
+                for chunk_id in chunk_ids:
+                    metadata.remove(chunk_id)
+                metadata_index_cache.resize(str(library.id))
+            if self._served_from_segment(library):
+                return
+            index, built = self._load(library)
+            if built:
+                return
+            index.remove_batch(chunk_ids)
+            index_wal.append(library.id, "remove", chunk_ids)
+            index_cache.resize(str(library.id))
+
+    # Compaction
+    def compact(self, library: Library) -> bool:
+        """
+        Fold the library's logged mutations into its persisted index and clear
+        the log. Returns whether there was anything to fold.
+
+        Retraining (IVF centroids, PQ codebooks, tuned LSH tables) is deferred
+        to here from the write path, and rewrites the index whole. It runs on a
+        snapshot of the segment without holding its lock, see ``_retrain``.
+        """
+        segment = find_segment(library.id)
+        if segment is None:
+            index_wal.clear(library.id)
+            return False
+        with segment.locked():
+            library_epoch.sync(library.id)
+            touched = _touched(index_wal.read(library.id))
+            if not touched:
+                return False
+            # Loading replays the log if this worker had no resident index
+            index, built = self._load(library)
+            if not built and index.needs_training():
+                token = index_wal.mark(library.id)
+                chunk_ids, embeddings = self.chunk_repo.embeddings_by_library(
+                    library.id
+                )
+                # A copy, writers may reuse freed rows while training
+                embeddings = np.array(embeddings)
+            else:
+                if not built:
+                    self._fold(library, index, touched)
+                    index_cache.resize(str(library.id))
+                self._folded(library)
+                return True
+        return self._retrain(library, segment, token, chunk_ids, embeddings)
+
+    def _retrain(
+        self,
+        library: Library,
+        segment: VectorSegment,
+        token: str,
+        chunk_ids: list[UUID],
+        embeddings: np.ndarray,
+    ) -> bool:
+        """
+        Train a new index on a snapshot of the segment while writers keep going
+        with the resident one, then swap it in. The mutations logged after the
+        snapshot's ``token`` are applied to it first, under the segment lock.
+        """
+        logger.info("Retraining the index of library %s", library.id)
+        index = self._new(library)
+        index.train(chunk_ids, embeddings)
+        with segment.locked():
+            library_epoch.sync(library.id)
+            records = index_wal.read_since(library.id, token)
+            if records is None:
+                # Another worker folded the log meanwhile, its index is current
+                return False
+            self._apply(library, index, _touched(records))
+            # Persisting puts the new index in the cache
+            self._save(library.id, library.index_type, library.compression, index)
+            self._folded(library)
+            return True
+
+    def _folded(self, library: Library) -> None:
+        index_wal.clear(library.id)
+        # Other workers reload the snapshot rather than persist their own
+        # pending graph changes on top of it
+        library_epoch.publish(library.id)
+
+    def _fold(self, library: Library, index: Index, touched: list[UUID]) -> None:
+        kind = self._kind(library.index_type, library.compression)
+        if kind == "lsh":
+            self.repos["lsh"].delete_vectors(library.id, touched)
+            self.repos["lsh"].save_vectors(
+                library.id,
+                index,
+                [chunk_id for chunk_id in touched if chunk_id in index.vectors],
+            )
+        elif kind == "hnsw":
+            self.repos["hnsw"].delete_nodes(
+                library.id,
+                [chunk_id for chunk_id in touched if chunk_id not in index.nodes],
+            )
+            self.repos["hnsw"].save_changes(library.id, index)
+        # IVF and PQ only persist what training produces
+
+    # Exact search
+    def exact(self, library: Library) -> BruteForceIndex:
+        """
+        Resident exact index of the library, with the metric of its index. Used
+        as a fallback when an approximate index finds no candidates, see
+        ``search_exact``.
+        """
+        key = str(library.id)
+        library_epoch.sync(key)
+        index = exact_index_cache.get(key)
+        if index is not None:
+            return index
+        segment = get_segment(library.id)
+        with segment.locked():
+            index = exact_index_cache.get(key)
+            if index is None:
+                start = time.perf_counter()
+                index = BruteForceIndex(self._metric(library), library.vector_dtype)
+                index.attach(*segment.codes())
+                exact_index_cache.put(key, index, time.perf_counter() - start)
+            return index
+
+    def search_exact(
+        self,
+        library: Library,
+        embeddings: list[list[float]],
+        k: int,
+        allowed: set[UUID] | None = None,
+    ) -> list[list[tuple[UUID, float]]]:
+        """
+        Exact top-k of the library (among the ``allowed`` chunks if given),
+        scored like its index.
+        """
+        exact = self.exact(library)
+        if allowed is None:
+            results = exact.search_batch(embeddings, k)
+        else:
+            results = exact.search_filtered(embeddings, k, allowed)
+        return self._scores(library, results)
+
+    @staticmethod
+    def _metric(library: Library) -> str:
+        """Metric of the library's index, which exact searches must use too."""
+        if library.index_type in ("lsh", "hnsw"):
+            return "cosine"
+        return (library.index_params or {}).get("metric", "euclidean")
+
+    @staticmethod
+    def _scores(
+        library: Library, results: list[list[tuple[UUID, float]]]
+    ) -> list[list[tuple[UUID, float]]]:
+        """
+        Exact distances on the scale of the library's index. LSH and HNSW score
+        by cosine similarity (higher is better), the others by distance.
+        """
+        if library.index_type in ("lsh", "hnsw"):
+            return [[(i, 1.0 - d) for i, d in result] for result in results]
+        return results
+
+    # Metadata filtering
+    def metadata(self, library: Library) -> MetadataIndex:
+        """Resident metadata index of the library, built from its chunk rows."""
+        key = str(library.id)
+        library_epoch.sync(key)
+        metadata = metadata_index_cache.get(key)
+        if metadata is not None:
+            return metadata
+        with _load_locks[key]:
+            metadata = metadata_index_cache.get(key)
+            if metadata is None:
+                start = time.perf_counter()
+                metadata = MetadataIndex()
+                metadata.add_many(self.chunk_repo.meta_by_library(library.id))
+                metadata_index_cache.put(key, metadata, time.perf_counter() - start)
+            return metadata
+
+    def index_metadata(
+        self, library: Library, entries: list[tuple[UUID, dict[str, str] | None]]
+    ) -> None:
+        """
+        Index the metadata of new or updated chunks. A metadata index that is not
+        resident is left alone, it is built from the chunk rows when needed.
+        """
+        metadata = metadata_index_cache.get(str(library.id))
+        if metadata is not None:
+            for chunk_id, meta in entries:
+                metadata.add(chunk_id, meta)
+            metadata_index_cache.resize(str(library.id))
+
+    def search_filtered(
+        self, library: Library, embeddings: list[list[float]], k: int, filters: dict
+    ) -> list[list[tuple[UUID, float]]]:
+        """
+        Top-k among the chunks whose metadata matches every key/value of
+        ``filters``.
+
+        Selective filters are pre-filtered: the few matching chunks are scored
+        exactly and the index is skipped. Otherwise the candidate set is handed
+        to the index, which applies it while scoring or post-filters a deeper
+        search.
+        """
+        metadata = self.metadata(library)
+        allowed = metadata.match(filters)
+        if not allowed:
+            return [[] for _ in embeddings]
+        index = self.get(library)
+        if len(allowed) > FILTER_PREFILTER_SELECTIVITY * metadata.size:
+            return index.search_filtered(embeddings, k, allowed)
+
+        chunk_ids, vectors = self.chunk_repo.embeddings_by_ids(
+            library.id, list(allowed)
+        )
+        exact = BruteForceIndex(self._metric(library))
+        exact.add_batch(chunk_ids, vectors)
+        return self._scores(library, exact.search_batch(embeddings, k))
+
+
+def _touched(records: list[tuple[str, list[UUID]]]) -> list[UUID]:
+    """Distinct chunk ids of the log records, in order of first mutation."""
+    return list(dict.fromkeys(chunk_id for _, ids in records for chunk_id in ids))
@@ -0,0 +1,115 @@
+import logging
+import os
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from uuid import UUID
+
+from vector_store.app.constants import INDEX_SPILL_DIR
+from vector_store.app.db.bruteforce_index import BruteForceIndex
+from vector_store.app.db.index import Index
+from vector_store.app.db.vector_segment import find_segment, get_segment
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSpill:
+    """
+    Local copies of the indexes evicted from ``index_cache``, reloaded without
+    parsing their SQLite rows or re-encoding their vectors.
+
+    An index is pickled (protocol 5, arrays as raw bytes) to
+    ``<directory>/<library_id>.<epoch>.idx``, where ``epoch`` is the library
+    epoch it reflects (see ``library_epoch``). Any later change of the library
+    bumps the epoch, so a spill is only loaded while it is still current, by
+    any worker process. Data left to the segment (LSH vectors, re-ranking
+    storage) is not written and re-attached on load (see ``Index.bind``).
+
+    Spills are written by a background thread holding the library's segment
+    lock, so they never see an index in the middle of a mutation.
+    """
+
+    def __init__(self, directory: Path | str | None = None):
+        self.directory = Path(
+            directory or os.environ.get("INDEX_SPILL_DIR", INDEX_SPILL_DIR)
+        )
+        self.written = 0
+        self.skipped = 0
+        self.loaded = 0
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spill")
+
+    def _path(self, library_id: UUID | str, epoch: int) -> Path:
+        return self.directory / f"{library_id}.{epoch}.idx"
+
+    def save(self, library_id: UUID | str, index: Index, epoch: int | None) -> None:
+        """Spill an evicted index in the background, if worth it."""
+        # Plain brute force indexes serve the segment mapping in place
+        if epoch is None or type(index) is BruteForceIndex:
+            return
+        self._writer.submit(self._write, str(library_id), index, epoch)
+
+    def _write(self, library_id: str, index: Index, epoch: int) -> None:
+        # Local import: library_epoch imports the caches, which own this spill
+        from vector_store.app.db import library_epoch
+
+        segment = find_segment(library_id)
+        if segment is None:
+            return
+        try:
+            with segment.locked():
+                if library_epoch.seen(library_id) != epoch:
+                    # Changed since the eviction, the index may not reflect it
+                    with self._lock:
+                        self.skipped += 1
+                    return
+                self.directory.mkdir(parents=True, exist_ok=True)
+                path = self._path(library_id, epoch)
+                tmp = path.with_suffix(".tmp")
+                with open(tmp, "wb") as f:
+                    pickle.dump(index, f, protocol=5)
+                os.replace(tmp, path)
+                self._remove(library_id, keep=path)
+            with self._lock:
+                self.written += 1
+        except Exception:
+            logger.exception("Failed to spill the index of library %s", library_id)
+
+    def load(self, library_id: UUID | str, epoch: int) -> Index | None:
+        """The library's spilled index at ``epoch``, if there is one."""
+        path = self._path(library_id, epoch)
+        try:
+            with open(path, "rb") as f:
+                index = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.exception("Ignoring unreadable spill %s", path)
+            path.unlink(missing_ok=True)
+            return None
+        index.bind(get_segment(library_id))
+        with self._lock:
+            self.loaded += 1
+        return index
+
+    def delete(self, library_id: UUID | str) -> None:
+        self._remove(str(library_id))
+
+    def _remove(self, library_id: str, keep: Path | None = None) -> None:
+        if not self.directory.exists():
+            return
+        for path in self.directory.glob(f"{library_id}.*"):
+            if path != keep:
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "written": self.written,
+                "skipped": self.skipped,
+                "loaded": self.loaded,
+            }
+
+
+index_spill = IndexSpill()
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+from pathlib import Path
+from uuid import UUID, uuid4
+
+from vector_store.app.constants import WAL_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class IndexWAL:
+    """
+    Write-ahead log of the index mutations not yet folded into the persisted
+    indexes, one file per library (``<directory>/<library_id>.wal``).
+
+    A record is a JSON line ``{"op": "add" | "replace" | "remove", "ids": [...]}``,
+    or a ``"mark"`` with a ``token`` and no ids.
+    Vectors are not logged: they are already in the library's segment, which
+    is written before the record. Every append is fsync'd, so a mutation is
+    durable once ``append`` returns.
+
+    Callers hold the library's segment lock while appending, reading or
+    clearing, which orders them across worker processes. A compaction that
+    releases the lock meanwhile appends a marker first (see ``mark``).
+    """
+
+    def __init__(self, directory: Path | str = WAL_DIR):
+        self.directory = Path(directory)
+
+    def _path(self, library_id: UUID | str) -> Path:
+        return self.directory / f"{library_id}.wal"
+
+    def append(self, library_id: UUID | str, op: str, vector_ids: list[UUID]) -> None:
+        self._write(library_id, {"op": op, "ids": [str(i) for i in vector_ids]})
+
+    def mark(self, library_id: UUID | str) -> str:
+        """Append a marker record and return its token, see ``read_since``."""
+        token = str(uuid4())
+        self._write(library_id, {"op": "mark", "ids": [], "token": token})
+        return token
+
+    def _write(self, library_id: UUID | str, record: dict) -> None:
+        line = json.dumps(record) + "\n"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self._path(library_id), os.O_RDWR | os.O_CREAT | os.O_APPEND)
+        try:
+            # Terminate a line torn by a crash, or this record would be lost with it
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                line = "\n" + line
+            os.write(fd, line.encode())
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def read(self, library_id: UUID | str) -> list[tuple[str, list[UUID]]]:
+        """The library's records in order. A torn last line is skipped."""
+        return _mutations(self._records(library_id))
+
+    def read_since(
+        self, library_id: UUID | str, token: str
+    ) -> list[tuple[str, list[UUID]]] | None:
+        """
+        The records appended after the marker ``token``, or None if the log
+        was cleared since, i.e. folded by another compaction.
+        """
+        records = self._records(library_id)
+        for i, record in enumerate(records):
+            if record.get("token") == token:
+                return _mutations(records[i + 1 :])
+        return None
+
+    def _records(self, library_id: UUID | str) -> list[dict]:
+        try:
+            lines = self._path(library_id).read_text().splitlines()
+        except FileNotFoundError:
+            return []
+        records = []
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(
+                    "Skipping truncated WAL record of library %s", library_id
+                )
+                continue
+            records.append(record)
+        return records
+
+    def clear(self, library_id: UUID | str) -> None:
+        self._path(library_id).unlink(missing_ok=True)
+
+    def pending(self) -> list[str]:
+        """Ids of the libraries with records to fold."""
+        if not self.directory.exists():
+            return []
+        return [path.stem for path in self.directory.glob("*.wal")]
+
+
+def _mutations(records: list[dict]) -> list[tuple[str, list[UUID]]]:
+    return [
+        (record["op"], [UUID(i) for i in record["ids"]])
+        for record in records
+        if record["op"] != "mark"
+    ]
+
+
+index_wal = IndexWAL()
@@ -0,0 +1,301 @@
+import heapq
+import threading
+from typing import Any
+from uuid import UUID
+
+import numpy as np
+
+from vector_store.app.constants import (
+    IVF_KMEANS_ITERATIONS,
+    IVF_MAX_POINTS_PER_LIST,
+    IVF_MIN_POINTS_PER_LIST,
+    IVF_NLIST,
+    IVF_NPROBE,
+    IVF_RETRAIN_FACTOR,
+    PQ_M,
+    PQ_MIN_TRAIN_SIZE,
+    PQ_NBITS,
+    PQ_RERANK,
+)
+from vector_store.app.db.bruteforce_index import BruteForceIndex
+from vector_store.app.db.index import ID_BYTES, Index
+from vector_store.app.db.kmeans import kmeans, nearest_centroids
+from vector_store.app.db.pq_index import PQIndex, rerank
+from vector_store.app.db.product_quantizer import ProductQuantizer
+from vector_store.app.db.vector_dtype import check_dtype
+
+
+class IVFIndex(Index):
+    """
+    Inverted file index: k-means centroids partition the vectors into
+    ``nlist`` inverted lists and a search only scores the ``nprobe`` lists
+    whose centroids are closest to the query.
+
+    Each inverted list is a ``BruteForceIndex``, so scoring inside a list is a
+    single matrix product. Until the index has been trained every vector lives
+    in one list and searches are exact.
+
+    With a ``compression`` ("pq" or "opq") the lists hold product-quantized
+    codes instead (``PQIndex``) sharing one codec, and the probed candidates
+    are re-ranked from ``storage`` when it is set. Uncompressed lists store
+    their vectors as ``dtype`` ("float32", "float16" or "int8").
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        nlist: int = IVF_NLIST,
+        nprobe: int = IVF_NPROBE,
+        metric: str = "euclidean",
+        retrain_factor: float = IVF_RETRAIN_FACTOR,
+        compression: str | None = None,
+        pq_m: int = PQ_M,
+        pq_nbits: int = PQ_NBITS,
+        rerank: int = PQ_RERANK,
+        seed: int | None = None,
+        dtype: str = "float32",
+    ):
+        if metric not in ("euclidean", "cosine"):
+            raise ValueError(f"Unsupported metric: {metric}")
+        if compression not in (None, "pq", "opq"):
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.metric = metric
+        self.retrain_factor = retrain_factor
+        self.compression = compression
+        self.rerank = rerank
+        self.seed = seed
+        self.dtype = check_dtype(dtype)
+        self.quantizer: ProductQuantizer | None = None
+        if compression:
+            self.quantizer = ProductQuantizer(
+                dim, pq_m, pq_nbits, opq=compression == "opq", seed=seed
+            )
+        self.storage = None  # Full vectors for re-ranking, e.g. a VectorSegment
+        self.centroids: np.ndarray | None = None
+        self.trained_size = 0
+        self.lists: list[Index] = [BruteForceIndex(metric, dtype)]
+        self.assignments: dict[UUID, int] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def _compressed(self) -> bool:
+        return self.quantizer is not None and self.quantizer.is_trained
+
+    def _new_list(self) -> Index:
+        if self._compressed:
+            return PQIndex(self.dim, self.metric, quantizer=self.quantizer, rerank=0)
+        return BruteForceIndex(self.metric, self.dtype.name)
+
+    # Training
+    def needs_training(self) -> bool:
+        """
+        True before the first training once there are enough vectors (for the
+        centroids or the codec), or when the index has grown ``retrain_factor``
+        times past its training size.
+        """
+        size = len(self.assignments)
+        if self.centroids is None:
+            if size >= self.nlist * IVF_MIN_POINTS_PER_LIST:
+                return True
+        elif size > self.retrain_factor * self.trained_size:
+            return True
+        if self.quantizer is not None and not self.quantizer.is_trained:
+            return size >= PQ_MIN_TRAIN_SIZE
+        return False
+
+    def train(self, vector_ids: list[UUID], vectors: list[list[float]]) -> None:
+        """Fit the centroids (and codec) with k-means and reload the vectors."""
+        data = self._prepare(vectors)
+        if len(data) == 0:
+            return
+        rng = np.random.default_rng(self.seed)
+        k = min(self.nlist, len(data))
+        sample, max_points = data, k * IVF_MAX_POINTS_PER_LIST
+        if len(data) > max_points:
+            sample = data[rng.choice(len(data), max_points, replace=False)]
+        centroids = kmeans(
+            sample, k, IVF_KMEANS_ITERATIONS, rng, spherical=self.metric == "cosine"
+        )
+        quantizer = self.quantizer
+        if quantizer is not None and len(data) >= PQ_MIN_TRAIN_SIZE:
+            quantizer = ProductQuantizer(**quantizer.to_dict(), seed=self.seed)
+            quantizer.train(data)
+
+        with self._lock:
+            self.centroids = centroids
+            self.quantizer = quantizer
+            self.trained_size = len(data)
+            self.lists = [self._new_list() for _ in range(len(centroids))]
+            self.assignments = {}
+            self.add_batch(vector_ids, vectors)
+
+    def _prepare(self, vectors) -> np.ndarray:
+        data = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if self.metric == "cosine":
+            norms = np.linalg.norm(data, axis=1, keepdims=True)
+            data = data / np.where(norms > 0, norms, 1.0)
+        return data
+
+    def _nearest_lists(self, data: np.ndarray, n: int = 1) -> np.ndarray:
+        return nearest_centroids(
+            data, self.centroids, n, spherical=self.metric == "cosine"
+        )
+
+    # Index interface
+    def _add_many(self, vector_ids: list[UUID], vectors: np.ndarray) -> None:
+        if self.centroids is None:
+            labels = np.zeros(len(vector_ids), dtype=np.intp)
+        else:
+            labels = self._nearest_lists(self._prepare(vectors))[:, 0]
+        for list_no in np.unique(labels):
+            rows = np.flatnonzero(labels == list_no)
+            list_ids = [vector_ids[i] for i in rows]
+            self.lists[list_no].add_batch(list_ids, vectors[rows])
+            self.assignments.update(dict.fromkeys(list_ids, int(list_no)))
+
+    def add(self, vector_id: UUID, vector: list[float]) -> None:
+        self.add_batch([vector_id], [vector])
+
+    def add_batch(self, vector_ids: list[UUID], vectors: list[list[float]]) -> None:
+        if not len(vector_ids):
+            return
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vector_ids), -1)
+        if len(set(vector_ids)) != len(vector_ids):
+            # Keep the last vector of every repeated id
+            last = {vector_id: i for i, vector_id in enumerate(vector_ids)}
+            vector_ids, vectors = list(last), vectors[list(last.values())]
+        with self._lock:
+            for vector_id in vector_ids:
+                self.remove(vector_id)
+            self._add_many(list(vector_ids), vectors)
+
+    def remove(self, vector_id: UUID) -> None:
+        with self._lock:
+            list_no = self.assignments.pop(vector_id, None)
+            if list_no is not None:
+                self.lists[list_no].remove(vector_id)
+
+    def search(self, query_vector: list[float], k: int) -> list[tuple[UUID, float]]:
+        return self.search_batch([query_vector], k)[0]
+
+    def search_batch(
+        self, query_vectors: list[list[float]], k: int
+    ) -> list[list[tuple[UUID, float]]]:
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(
+            len(query_vectors), -1
+        )
+        with self._lock:
+            if self.centroids is None:
+                return self.lists[0].search_batch(queries, k)
+
+            prepared = self._prepare(queries)
+            probes = self._nearest_lists(prepared, self.nprobe)
+            fetch = k
+            if self._compressed:
+                # One set of lookup tables per query, shared by every list
+                tables = self.quantizer.distance_tables(
+                    prepared, inner_product=self.metric == "cosine"
+                )
+                if self.rerank and self.storage is not None:
+                    fetch = k * self.rerank
+
+            partial: list[list[tuple[UUID, float]]] = [[] for _ in range(len(queries))]
+            # Score every probed list once against all the queries probing it
+            for list_no in np.unique(probes):
+                rows = np.flatnonzero((probes == list_no).any(axis=1))
+                if self._compressed:
+                    hits = self.lists[list_no].search_tables(tables[rows], fetch)
+                else:
+                    hits = self.lists[list_no].search_batch(queries[rows], fetch)
+                for row, row_hits in zip(rows, hits, strict=True):
+                    partial[row].extend(row_hits)
+
+        results = [
+            heapq.nsmallest(fetch, hits, key=lambda hit: hit[1]) for hits in partial
+        ]
+        if fetch > k:
+            results = rerank(self.storage, queries, results, k, self.metric)
+        return results
+
+    @property
+    def nbytes(self) -> int:
+        total = ID_BYTES * len(self.assignments)
+        if self.centroids is not None:
+            total += self.centroids.nbytes
+        if self.quantizer is not None:
+            total += self.quantizer.nbytes
+        # Compressed lists share the quantizer, counted once above
+        return total + sum(
+            inverted.codes_nbytes if isinstance(inverted, PQIndex) else inverted.nbytes
+            for inverted in self.lists
+        )
+
+    # Spilling
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["storage"] = None  # Re-attached by ``bind``
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def bind(self, storage) -> None:
+        self.storage = storage
+
+    # Persistence helpers
+    def to_dict(self) -> dict[str, Any]:
+        data = {
+            "dim": self.dim,
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "metric": self.metric,
+            "trained_size": self.trained_size,
+            "compression": self.compression,
+            "pq_m": None,
+            "pq_nbits": None,
+            "rerank": self.rerank,
+            "dtype": self.dtype.name,
+        }
+        if self.quantizer is not None:
+            data["pq_m"] = self.quantizer.m
+            data["pq_nbits"] = self.quantizer.nbits
+        return data
+
+    @classmethod
+    def from_dict(
+        cls,
+        data: dict[str, Any],
+        centroids: np.ndarray | None = None,
+        codebooks: np.ndarray | None = None,
+        rotation: np.ndarray | None = None,
+    ) -> "IVFIndex":
+        params = {}
+        if data.get("compression"):
+            params = {
+                "compression": data["compression"],
+                "pq_m": data["pq_m"],
+                "pq_nbits": data["pq_nbits"],
+                "rerank": data["rerank"],
+            }
+        index = cls(
+            dim=data["dim"],
+            nlist=data["nlist"],
+            nprobe=data["nprobe"],
+            metric=data["metric"],
+            dtype=data["dtype"],
+            **params,
+        )
+        if codebooks is not None:
+            index.quantizer = ProductQuantizer.from_dict(
+                index.quantizer.to_dict(), codebooks, rotation
+            )
+        if centroids is not None:
+            index.centroids = centroids
+            index.trained_size = data["trained_size"]
+            index.lists = [index._new_list() for _ in range(len(centroids))]
+        return index
@@ -0,0 +1,58 @@
+import numpy as np
+
+
+def nearest_centroids(
+    data: np.ndarray, centroids: np.ndarray, n: int = 1, spherical: bool = False
+) -> np.ndarray:
+    """
+    Indices of the ``n`` closest centroids of every row, closest first.
+
+    Distances are euclidean, or inner products when ``spherical`` is set (rows
+    and centroids are then expected to be unit length).
+    """
+    scores = data @ centroids.T
+    if spherical:
+        scores = -scores
+    else:
+        # argmin |x - c|^2 == argmin |c|^2 - 2 x.c
+        scores = (centroids * centroids).sum(axis=1) - 2.0 * scores
+    if n >= centroids.shape[0]:
+        return np.argsort(scores, axis=1)
+    if n == 1:
+        return scores.argmin(axis=1)[:, None]
+    nearest = np.argpartition(scores, n - 1, axis=1)[:, :n]
+    order = np.argsort(np.take_along_axis(scores, nearest, axis=1), axis=1)
+    return np.take_along_axis(nearest, order, axis=1)
+
+
+def kmeans(
+    data: np.ndarray,
+    k: int,
+    iterations: int,
+    rng: np.random.Generator,
+    spherical: bool = False,
+) -> np.ndarray:
+    """
+    Lloyd's k-means over the rows of ``data``, returns a (k, dim) float32 matrix.
+
+    Centroids start from ``k`` random rows and empty clusters are re-seeded
+    with random rows. With ``spherical`` centroids are kept unit length.
+    """
+    data = np.asarray(data, dtype=np.float32)
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = nearest_centroids(data, centroids, spherical=spherical)[:, 0]
+        counts = np.bincount(labels, minlength=k)
+        order = np.argsort(labels, kind="stable")
+        filled = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        centroids[filled] = sums / counts[filled, None]
+        if not filled.all():
+            empty = np.flatnonzero(~filled)
+            centroids[empty] = data[rng.choice(len(data), len(empty))]
+        if spherical:
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.where(norms > 0, norms, 1.0)
+    return centroids
@@ -0,0 +1,97 @@
+import threading
+from uuid import UUID
+
+from vector_store.app.db.cache import (
+    chunk_cache,
+    exact_index_cache,
+    index_cache,
+    metadata_index_cache,
+    query_cache,
+)
+from vector_store.app.db.vector_segment import (
+    find_segment,
+    open_segment,
+    release_segment,
+)
+
+# Library -> epoch of its segment that the caches of this process reflect
+_seen: dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def sync(library_id: UUID | str) -> bool:
+    """
+    Drop what this process caches about the library if another worker process
+    changed it since, and return whether it did.
+
+    Every change of a library bumps the ``epoch`` in its segment header (see
+    ``publish``). The header is mapped by every worker, so checking it is a
+    single memory read.
+    """
+    key = str(library_id)
+    segment = find_segment(key)
+    if not _check(key, segment):
+        return False
+    if segment is not None and not segment.vec_path.exists():
+        release_segment(key)  # Library deleted by another worker
+    return True
+
+
+def check(library_id: UUID | str) -> bool:
+    """
+    ``sync`` for the event loop, which must not wait on the disk: only a
+    segment this process already has open is checked. Without one, nothing is
+    cached here about the library yet. Releasing the segment of a library
+    deleted by another worker is left to the next ``sync``.
+    """
+    key = str(library_id)
+    segment = open_segment(key)
+    return segment is not None and _check(key, segment)
+
+
+def _check(key: str, segment) -> bool:
+    epoch = None if segment is None else segment.epoch
+    with _lock:
+        seen = _seen.get(key)
+        if epoch is not None:
+            _seen[key] = epoch
+        else:
+            _seen.pop(key, None)
+        if seen is None or seen == epoch:
+            return False
+    _drop(key)
+    return True
+
+
+def seen(library_id: UUID | str) -> int | None:
+    """Epoch of the library that the caches of this process reflect."""
+    with _lock:
+        return _seen.get(str(library_id))
+
+
+def publish(library_id: UUID | str) -> None:
+    """Make a change of the library visible to every worker process."""
+    key = str(library_id)
+    segment = find_segment(key)
+    if segment is not None:
+        with segment.locked():
+            # Changes of other workers published meanwhile must not be skipped
+            sync(key)
+            epoch = segment.bump_epoch()
+            with _lock:
+                _seen[key] = epoch
+    query_cache.bump(key)
+
+
+def _drop(key: str) -> None:
+    index_cache.pop(key, None)
+    exact_index_cache.pop(key, None)
+    metadata_index_cache.pop(key, None)
+    query_cache.bump(key)
+    stale = [
+        chunk_id
+        for chunk_id, chunk in list(chunk_cache.items())
+        if chunk.library_id == key
+    ]
+    for chunk_id in stale:
+        chunk_cache.pop(chunk_id, None)
@@ -1,83 +1,431 @@
+import heapq
 import logging
+import threading
 from typing import Any
 from uuid import UUID
 
 import numpy as np
 
-from vector_store.app.db.index import Index
+from vector_store.app.constants import (
+    LSH_MIN_CANDIDATES,
+    LSH_NUM_HASHES,
+    LSH_NUM_TABLES,
+    LSH_PROBES,
+    LSH_PROJECTION,
+    LSH_RETUNE_FACTOR,
+    LSH_SCORE_BLOCK_SIZE,
+    LSH_TUNING_MIN_SIZE,
+    LSH_TUNING_TARGET_RECALL,
+)
+from vector_store.app.db.index import ID_BYTES, Index, is_private
+from vector_store.app.db.vector_dtype import check_dtype, decode, encode
 
 logger = logging.getLogger(__name__)
 
 
 class LSHIndex(Index):
-    def __init__(self, dim: int, num_tables: int = 5, num_hashes: int = 10):
+    """
+    Random hyperplane LSH for cosine similarity.
+
+    The ``num_tables * num_hashes`` hyperplanes are stacked in one matrix, so
+    the bucket codes of a batch of vectors for every table come from a single
+    matrix product. The sign bits of each table are packed into an int key
+    (bit ``j`` is hyperplane ``j``), and each table maps keys to a set of
+    vector ids.
+
+    The keys of every stored vector are kept as well, so removing or replacing
+    a vector only touches its own ``num_tables`` buckets.
+
+    Searches are multi-probe: while a query has fewer than ``min_candidates``
+    candidates (or ``k``), up to ``probes`` neighboring buckets are visited,
+    flipping first the bits whose hyperplanes the query is closest to.
+
+    Hyperplanes are drawn from ``seed``, so they are regenerated on load
+    instead of being stored, and indexes built with the same seed and
+    parameters (e.g. by separate workers) have compatible buckets. The
+    ``projection`` is "gaussian", "sign" (random +-1 entries) or "sparse" (very
+    sparse +-1 entries, a fraction 1 / sqrt(dim) of them non-zero).
+
+    Vectors are kept as ``dtype`` ("float32", "float16" or "int8" codes) and
+    decoded to float32 for scoring. Cosine similarity ignores the int8 scale,
+    so the codes alone are enough.
+
+    With ``auto_tune`` the index asks to be trained (see ``needs_training``)
+    once it holds enough vectors, and training picks ``num_tables``,
+    ``num_hashes`` and ``probes`` with the benchmark of ``lsh_tuner``.
+
+    Searches and mutations hold the index's lock, so a search never scores a
+    candidate whose vector is being removed.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        num_tables: int = LSH_NUM_TABLES,
+        num_hashes: int = LSH_NUM_HASHES,
+        probes: int = LSH_PROBES,
+        min_candidates: int = LSH_MIN_CANDIDATES,
+        auto_tune: bool = False,
+        target_recall: float = LSH_TUNING_TARGET_RECALL,
+        seed: int | None = None,
+        projection: str = LSH_PROJECTION,
+        dtype: str = "float32",
+    ):
+        if projection not in ("gaussian", "sign", "sparse"):
+            raise ValueError(f"Unsupported projection: {projection}")
+        if not 1 <= num_hashes <= 63:
+            raise ValueError("num_hashes must be between 1 and 63")
+        if probes < 0:
+            raise ValueError("probes must be positive or zero")
         self.dim = dim
         self.num_tables = num_tables
         self.num_hashes = num_hashes
-        self.tables: list[dict[str, list[UUID]]] = [{} for _ in range(num_tables)]
-        self.hyperplanes: list[np.ndarray] = [
-            np.random.randn(num_hashes, dim) for _ in range(num_tables)
-        ]
+        self.probes = probes
+        self.min_candidates = min_candidates
+        self.auto_tune = auto_tune
+        self.target_recall = target_recall
+        self.seed = seed
+        self.projection = projection
+        self.dtype = check_dtype(dtype)
+        self.tuned_size = 0
+        self.recall: float | None = None  # Recall measured by the last tuning
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.tables: list[dict[int, set[UUID]]] = [{} for _ in range(self.num_tables)]
+        self.keys: dict[UUID, list[int]] = {}  # Vector id -> bucket key per table
+        if self.seed is None:
+            self.seed = int(np.random.default_rng().integers(2**31))
+        self.planes = self._generate_planes()
+        self._powers = np.left_shift(1, np.arange(self.num_hashes, dtype=np.int64))
+        # Stored vectors (possibly views into a vector segment) and their norms
         self.vectors: dict[UUID, np.ndarray] = {}
+        self.norms: dict[UUID, float] = {}
+        self.owned_bytes = 0  # Stored vectors that are private copies, see nbytes
+
+    def _generate_planes(self) -> np.ndarray:
+        rng = np.random.default_rng(self.seed)
+        shape = (self.num_tables * self.num_hashes, self.dim)
+        if self.projection == "gaussian":
+            return rng.standard_normal(shape, dtype=np.float32)
+        signs = rng.integers(0, 2, shape, dtype=np.int8) * 2 - 1
+        if self.projection == "sparse":
+            signs *= rng.random(shape, dtype=np.float32) < 1.0 / np.sqrt(self.dim)
+        return signs.astype(np.float32)
 
-    def _hash(self, vector: np.ndarray, planes: np.ndarray) -> str:
-        bits = vector.dot(planes.T) > 0
-        return "".join(["1" if b else "0" for b in bits])
+    @property
+    def hyperplanes(self) -> np.ndarray:
+        """The hyperplanes per table, shape (num_tables, num_hashes, dim)."""
+        return self.planes.reshape(self.num_tables, self.num_hashes, self.dim)
 
+    def _project(self, vectors) -> np.ndarray:
+        """Projections on every hyperplane, shape (n, num_tables, num_hashes)."""
+        data = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        return (data @ self.planes.T).reshape(-1, self.num_tables, self.num_hashes)
+
+    def _hash(self, vectors) -> np.ndarray:
+        """Bucket keys of every vector in every table, shape (n, num_tables)."""
+        return self._keys(self._project(vectors))
+
+    def _keys(self, projections: np.ndarray) -> np.ndarray:
+        return (projections > 0) @ self._powers
+
+    # Auto-tuning
+    def needs_training(self) -> bool:
+        if not self.auto_tune:
+            return False
+        size = len(self.vectors)
+        return (
+            size >= LSH_TUNING_MIN_SIZE and size > LSH_RETUNE_FACTOR * self.tuned_size
+        )
+
+    def train(self, vector_ids: list[UUID], vectors: list[list[float]]) -> None:
+        """Tune the parameters on the given vectors, then re-hash them."""
+        # The tuner builds LSH indexes itself, hence the local import
+        from vector_store.app.db.lsh_tuner import tune
+
+        best = tune(vectors, self.target_recall, projection=self.projection)
+        with self._lock:
+            self.num_tables = best["num_tables"]
+            self.num_hashes = best["num_hashes"]
+            self.probes = best["probes"]
+            self.recall = best["recall"]
+            self.tuned_size = len(vector_ids)
+            self._reset()
+            self.add_batch(vector_ids, vectors)
+
+    # Index interface
     def add(self, vector_id: UUID, vector: list[float]) -> None:
-        vec_np = np.array(vector)
-        vec_np = vec_np / np.linalg.norm(vec_np)  # Normalize the vector
-        self.vectors[vector_id] = vec_np
-        for i, table in enumerate(self.tables):
-            planes = self.hyperplanes[i]
-            key = self._hash(vec_np, planes)
-            table.setdefault(key, []).append(vector_id)
+        self.add_batch([vector_id], [vector])
+
+    def add_batch(self, vector_ids: list[UUID], vectors: list[list[float]]) -> None:
+        if not len(vector_ids):
+            return
+        vectors = np.asarray(vectors).reshape(len(vector_ids), -1)
+        with self._lock:
+            self.remove_batch([i for i in vector_ids if i in self.keys])
+            keys = self._hash(vectors).tolist()
+            vectors, _ = encode(vectors, self.dtype)
+            norms = np.linalg.norm(decode(vectors), axis=1).tolist()
+            for vector_id, vector, norm, vector_keys in zip(
+                vector_ids, vectors, norms, keys, strict=True
+            ):
+                self._insert(vector_id, vector, norm, vector_keys)
+
+    def _insert(
+        self, vector_id: UUID, vector: np.ndarray, norm: float, keys: list[int]
+    ) -> None:
+        self._store(vector_id, vector)
+        self.norms[vector_id] = norm
+        self.keys[vector_id] = keys
+        for table, key in zip(self.tables, keys, strict=True):
+            bucket = table.get(key)
+            if bucket is None:
+                table[key] = {vector_id}
+            else:
+                bucket.add(vector_id)
 
     def remove(self, vector_id: UUID) -> None:
-        self.vectors.pop(vector_id, None)
-        for table in self.tables:
-            keys_to_remove = [k for k, ids in table.items() if vector_id in ids]
-            for k in keys_to_remove:
-                table[k].remove(vector_id)
-                if not table[k]:
-                    del table[k]
+        with self._lock:
+            keys = self.keys.pop(vector_id, None)
+            if keys is None:
+                return
+            self._unstore(vector_id)
+            self.norms.pop(vector_id, None)
+            for table, key in zip(self.tables, keys, strict=True):
+                bucket = table[key]
+                bucket.discard(vector_id)
+                if not bucket:
+                    del table[key]
 
-    def search(self, query_vector: list[float], k: int = 3) -> list[tuple[UUID, float]]:
-        query_np = np.array(query_vector)
-        query_np = query_np / np.linalg.norm(query_np)  # Normalize the query vector
+    def remove_batch(self, vector_ids: list[UUID]) -> None:
+        with self._lock:
+            super().remove_batch(vector_ids)
+
+    def _store(self, vector_id: UUID, vector: np.ndarray) -> None:
+        self._unstore(vector_id)
+        self.vectors[vector_id] = vector
+        if is_private(vector):
+            self.owned_bytes += vector.nbytes
+
+    def _unstore(self, vector_id: UUID) -> None:
+        vector = self.vectors.pop(vector_id, None)
+        if vector is not None and is_private(vector):
+            self.owned_bytes -= vector.nbytes
+
+    def _candidates(self, keys: list[int]) -> set[UUID]:
         candidates = set()
-        for i, table in enumerate(self.tables):
-            planes = self.hyperplanes[i]
-            key = self._hash(query_np, planes)
-            candidates.update(table.get(key, []))
+        for table, key in zip(self.tables, keys, strict=True):
+            bucket = table.get(key)
+            if bucket:
+                candidates |= bucket
+        return candidates
+
+    def _probe(
+        self, candidates: set[UUID], keys: list[int], margins: np.ndarray, needed: int
+    ) -> None:
+        """
+        Add the vectors of neighboring buckets to ``candidates`` until there are
+        ``needed`` of them or ``probes`` buckets have been visited.
+
+        A probe flips a set of bits of one table's key, scored by the sum of the
+        squared projections of the flipped bits. Probes are generated in score
+        order across all tables with the shift/expand scheme over each table's
+        margins sorted in increasing order.
+        """
+        order = np.argsort(margins, axis=1)
+        scores = np.take_along_axis(margins, order, axis=1) ** 2
+        order, scores = order.tolist(), scores.tolist()
+        heap = [(scores[t][0], t, (0,)) for t in range(self.num_tables)]
+        heapq.heapify(heap)
+        for _ in range(self.probes):
+            if not heap or len(candidates) >= needed:
+                return
+            score, t, flipped = heapq.heappop(heap)
+            last = flipped[-1]
+            if last + 1 < self.num_hashes:
+                # Shift: replace the largest flipped bit by the next one
+                shifted = flipped[:-1] + (last + 1,)
+                heapq.heappush(
+                    heap, (score - scores[t][last] + scores[t][last + 1], t, shifted)
+                )
+                # Expand: also flip the next bit
+                expanded = flipped + (last + 1,)
+                heapq.heappush(heap, (score + scores[t][last + 1], t, expanded))
+            key = keys[t]
+            for bit in flipped:
+                key ^= 1 << order[t][bit]
+            bucket = self.tables[t].get(key)
+            if bucket:
+                candidates |= bucket
 
-        # If no candidates, return empty
-        if not candidates:
+    def search(self, query_vector: list[float], k: int = 3) -> list[tuple[UUID, float]]:
+        return self.search_batch([query_vector], k)[0]
+
+    def search_batch(
+        self, query_vectors: list[list[float]], k: int = 3
+    ) -> list[list[tuple[UUID, float]]]:
+        return self._search_batch(query_vectors, k)
+
+    def search_filtered(
+        self, query_vectors: list[list[float]], k: int, allowed: set[UUID]
+    ) -> list[list[tuple[UUID, float]]]:
+        """Top-k among the ``allowed`` ids, dropped from the buckets before scoring."""
+        return self._search_batch(query_vectors, k, allowed)
+
+    def _search_batch(
+        self,
+        query_vectors: list[list[float]],
+        k: int,
+        allowed: set[UUID] | None = None,
+    ) -> list[list[tuple[UUID, float]]]:
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(
+            len(query_vectors), -1
+        )
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms > 0, norms, 1.0)  # Normalize the queries
+        with self._lock:
+            return self._search_locked(queries, k, allowed)
+
+    def _search_locked(
+        self, queries: np.ndarray, k: int, allowed: set[UUID] | None
+    ) -> list[list[tuple[UUID, float]]]:
+        """Top-k of the normalized ``queries``, under the lock."""
+        projections = self._project(queries)
+        needed = max(k, self.min_candidates)
+        candidate_sets = []
+        for keys, margins in zip(
+            self._keys(projections).tolist(), np.abs(projections), strict=True
+        ):
+            candidates = self._candidates(keys)
+            if len(candidates) < needed:
+                self._probe(candidates, keys, margins, needed)
+            if allowed is not None:
+                candidates &= allowed
+            candidate_sets.append(candidates)
+
+        # Queries are scored against the union of their candidates in blocks of
+        # at most LSH_SCORE_BLOCK_SIZE query-candidate pairs, so a large batch
+        # doesn't score every query against every other query's candidates
+        results = []
+        start = 0
+        while start < len(candidate_sets):
+            union = set(candidate_sets[start])
+            end = start + 1
+            while end < len(candidate_sets):
+                new = candidate_sets[end] - union
+                if (end + 1 - start) * (len(union) + len(new)) > LSH_SCORE_BLOCK_SIZE:
+                    break
+                union |= new
+                end += 1
+            results += self._score(
+                queries[start:end], candidate_sets[start:end], list(union), k
+            )
+            start = end
+        return results
+
+    def _score(
+        self,
+        queries: np.ndarray,
+        candidate_sets: list[set[UUID]],
+        candidate_ids: list[UUID],
+        k: int,
+    ) -> list[list[tuple[UUID, float]]]:
+        """Top-k of each query among its candidates, all from one product."""
+        if not candidate_ids:
             logger.info("No candidates in lsh, using brute force search instead")
-            return []
+            return [[] for _ in candidate_sets]
+        columns = {vector_id: j for j, vector_id in enumerate(candidate_ids)}
+        matrix = decode(np.stack([self.vectors[i] for i in candidate_ids]))
+        norms = np.array([self.norms[i] for i in candidate_ids], dtype=np.float32)
+        similarities = (queries @ matrix.T) / np.where(norms > 0, norms, 1.0)
+
+        results = []
+        for row, candidates in zip(similarities, candidate_sets, strict=True):
+            # If no candidates, return empty
+            if not candidates:
+                logger.info("No candidates in lsh, using brute force search instead")
+                results.append([])
+                continue
+            cols = np.fromiter(
+                (columns[vector_id] for vector_id in candidates),
+                dtype=np.intp,
+                count=len(candidates),
+            )
+            scores = row[cols]
+            top = np.argsort(-scores, kind="stable")[:k]
+            results.append([(candidate_ids[cols[i]], float(scores[i])) for i in top])
+        return results
+
+    def bucket_keys(self, vector_id: UUID) -> list[int]:
+        """Bucket key of a stored vector in each table."""
+        return self.keys[vector_id]
 
-        def cosine_sim(a, b):
-            return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+    def bucket_keys_many(self, vector_ids: list[UUID]) -> list[list[int]]:
+        return [self.keys[vector_id] for vector_id in vector_ids]
 
-        scored = [
-            (vector_id, cosine_sim(query_np, self.vectors[vector_id]))
-            for vector_id in candidates
-        ]
-        scored.sort(key=lambda x: -x[1])
+    def restore(self, vector_id: UUID, vector: list[float], keys: list[int]) -> None:
+        """Re-insert a persisted vector under its known bucket keys."""
+        vector, _ = encode(vector, self.dtype)
+        norm = float(np.linalg.norm(decode(vector)))
+        with self._lock:
+            self.remove(vector_id)
+            self._insert(vector_id, vector, norm, keys)
 
-        return scored[:k]
+    @property
+    def nbytes(self) -> int:
+        # Per vector: its bucket keys and its id in the vectors, norms and keys
+        # dicts and in one bucket per table. Vectors restored or bound from the
+        # segment are views of its mapping, the others (added in batches, int8
+        # codes) are private copies counted in ``owned_bytes``.
+        size = len(self.keys)
+        total = self.planes.nbytes + self.owned_bytes
+        total += size * (ID_BYTES * (3 + self.num_tables) + 8 * self.num_tables)
+        return total
+
+    # Spilling
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["vectors"] = {}  # Read back from the segment by ``bind``
+        state["owned_bytes"] = 0
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def bind(self, storage) -> None:
+        with self._lock:
+            missing = []
+            for vector_id in self.keys:
+                vector = storage.get(vector_id)
+                if vector is None:
+                    missing.append(vector_id)
+                else:
+                    self._store(vector_id, encode(vector, self.dtype)[0])
+            for vector_id in missing:
+                self.remove(vector_id)
 
     def to_dict(self) -> dict[str, Any]:
+        """
+        Serialize the index configuration. Bucket keys are persisted per entry
+        (see ``bucket_keys`` and ``restore``), vectors live in vector segments.
+        """
         return {
             "dim": self.dim,
             "num_tables": self.num_tables,
             "num_hashes": self.num_hashes,
-            "tables": [
-                {k: [str(uid) for uid in v] for k, v in table.items()}
-                for table in self.tables
-            ],
-            "hyperplanes": [plane.tolist() for plane in self.hyperplanes],
-            "vectors": {str(uid): vec.tolist() for uid, vec in self.vectors.items()},
+            "probes": self.probes,
+            "min_candidates": self.min_candidates,
+            "auto_tune": self.auto_tune,
+            "target_recall": self.target_recall,
+            "tuned_size": self.tuned_size,
+            "recall": self.recall,
+            "seed": self.seed,
+            "projection": self.projection,
+            "dtype": self.dtype.name,
         }
 
     @classmethod
@@ -86,13 +434,14 @@ class LSHIndex(Index):
             dim=data["dim"],
             num_tables=data["num_tables"],
             num_hashes=data["num_hashes"],
+            probes=data["probes"],
+            min_candidates=data["min_candidates"],
+            auto_tune=data["auto_tune"],
+            target_recall=data["target_recall"],
+            seed=data["seed"],
+            projection=data["projection"],
+            dtype=data["dtype"],
         )
-        index.tables = [
-            {k: [UUID(uid) for uid in v] for k, v in table.items()}
-            for table in data["tables"]
-        ]
-        index.hyperplanes = [np.array(plane) for plane in data["hyperplanes"]]
-        index.vectors = {
-            UUID(uid): np.array(vec) for uid, vec in data["vectors"].items()
-        }
+        index.tuned_size = data["tuned_size"]
+        index.recall = data["recall"]
         return index
@@ -0,0 +1,110 @@
+import time
+from itertools import product
+from typing import Any
+
+import numpy as np
+
+from vector_store.app.constants import (
+    LSH_PROJECTION,
+    LSH_TUNING_HASHES,
+    LSH_TUNING_K,
+    LSH_TUNING_MAX_SIZE,
+    LSH_TUNING_PROBES,
+    LSH_TUNING_SAMPLE_SIZE,
+    LSH_TUNING_TABLES,
+    LSH_TUNING_TARGET_RECALL,
+)
+from vector_store.app.db.bruteforce_index import BruteForceIndex
+from vector_store.app.db.lsh_index import LSHIndex
+
+
+def benchmark(
+    vectors,
+    k: int = LSH_TUNING_K,
+    sample_size: int = LSH_TUNING_SAMPLE_SIZE,
+    tables: tuple[int, ...] = LSH_TUNING_TABLES,
+    hashes: tuple[int, ...] = LSH_TUNING_HASHES,
+    probes: tuple[int, ...] = LSH_TUNING_PROBES,
+    projection: str = LSH_PROJECTION,
+    seed: int | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Recall@k and latency of every (num_tables, num_hashes, probes) of the grid.
+
+    ``sample_size`` vectors are held out as queries and the others are indexed.
+    Recall is measured against exact cosine search over the indexed vectors,
+    latency is the mean time of a single query search.
+    """
+    rng = np.random.default_rng(seed)
+    data = np.asarray(vectors, dtype=np.float32)
+    if len(data) > LSH_TUNING_MAX_SIZE:
+        data = data[rng.choice(len(data), LSH_TUNING_MAX_SIZE, replace=False)]
+    sample_size = min(sample_size, len(data) // 2)
+    if sample_size == 0:
+        raise ValueError("Not enough vectors to benchmark")
+    held_out = rng.choice(len(data), sample_size, replace=False)
+    queries = data[held_out]
+    base = np.delete(data, held_out, axis=0)
+    ids = list(range(len(base)))
+
+    exact = BruteForceIndex("cosine")
+    exact.add_batch(ids, base)
+    truth = [{i for i, _ in hits} for hits in exact.search_batch(queries, k)]
+
+    results = []
+    for num_tables, num_hashes in product(tables, hashes):
+        index = LSHIndex(
+            base.shape[1],
+            num_tables=num_tables,
+            num_hashes=num_hashes,
+            probes=0,
+            seed=seed,
+            projection=projection,
+        )
+        index.add_batch(ids, base)
+        # Probing only changes the search, so one index serves the whole column
+        for num_probes in probes:
+            index.probes = num_probes
+            found, start = [], time.perf_counter()
+            for query in queries:
+                found.append(index.search(query, k))
+            latency = (time.perf_counter() - start) / len(queries)
+            recall = np.mean(
+                [
+                    len(expected & {i for i, _ in hits}) / len(expected)
+                    for expected, hits in zip(truth, found, strict=True)
+                ]
+            )
+            results.append(
+                {
+                    "num_tables": num_tables,
+                    "num_hashes": num_hashes,
+                    "probes": num_probes,
+                    "recall": float(recall),
+                    "latency_ms": latency * 1000.0,
+                }
+            )
+    return results
+
+
+def select(
+    results: list[dict[str, Any]], target_recall: float = LSH_TUNING_TARGET_RECALL
+) -> dict[str, Any]:
+    """Fastest configuration reaching ``target_recall``, else the most accurate."""
+    reaching = [result for result in results if result["recall"] >= target_recall]
+    if reaching:
+        return min(reaching, key=lambda result: result["latency_ms"])
+    return max(results, key=lambda result: (result["recall"], -result["latency_ms"]))
+
+
+def tune(
+    vectors,
+    target_recall: float = LSH_TUNING_TARGET_RECALL,
+    k: int = LSH_TUNING_K,
+    projection: str = LSH_PROJECTION,
+    seed: int | None = None,
+) -> dict[str, Any]:
+    """Benchmark the default grid on ``vectors`` and return the chosen entry."""
+    return select(
+        benchmark(vectors, k=k, projection=projection, seed=seed), target_recall
+    )
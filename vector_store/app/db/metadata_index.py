@@ -0,0 +1,128 @@
+import heapq
+import threading
+from uuid import UUID
+
+import numpy as np
+
+from vector_store.app.db.index import ID_BYTES
+
+
+class MetadataIndex:
+    """
+    Inverted index over the ``meta`` of a library's chunks.
+
+    Every chunk gets a slot number and every (key, value) pair a posting
+    bitmap, a Python int whose bit ``slot`` is set for the chunks carrying that
+    pair. A filter is answered by AND-ing the bitmaps of its pairs, smallest
+    first. Freed slots are reused so the bitmaps stay dense.
+    """
+
+    def __init__(self):
+        self.ids: list[UUID | None] = []  # Slot -> chunk id
+        self.slots: dict[UUID, int] = {}
+        self.meta: dict[UUID, dict[str, str]] = {}
+        self.postings: dict[tuple[str, str], int] = {}
+        self.pairs = 0  # Metadata entries over all chunks
+        self._free: list[int] = []
+        self._lock = threading.RLock()
+
+    @property
+    def size(self) -> int:
+        return len(self.slots)
+
+    @property
+    def nbytes(self) -> int:
+        """Estimated memory, for the byte budget of ``metadata_index_cache``."""
+        with self._lock:
+            # Per chunk its slot, id and metadata dict entries, plus the bitmaps
+            bitmaps = sum(bitmap.bit_length() for bitmap in self.postings.values())
+            return ID_BYTES * (2 * len(self.ids) + self.pairs) + bitmaps // 8
+
+    def add(self, chunk_id: UUID, meta: dict[str, str] | None) -> None:
+        """Index the metadata of a chunk, replacing what it had before."""
+        with self._lock:
+            self.remove(chunk_id)
+            slot = heapq.heappop(self._free) if self._free else len(self.ids)
+            if slot == len(self.ids):
+                self.ids.append(chunk_id)
+            else:
+                self.ids[slot] = chunk_id
+            self.slots[chunk_id] = slot
+            self.meta[chunk_id] = dict(meta or {})
+            self.pairs += len(self.meta[chunk_id])
+            bit = 1 << slot
+            for pair in self.meta[chunk_id].items():
+                self.postings[pair] = self.postings.get(pair, 0) | bit
+
+    def add_many(self, entries: list[tuple[UUID, dict[str, str] | None]]) -> None:
+        """Index many new chunks, building each posting bitmap only once."""
+        with self._lock:
+            pending: dict[tuple[str, str], list[int]] = {}
+            for chunk_id, meta in entries:
+                if chunk_id in self.slots or self._free:
+                    self.add(chunk_id, meta)
+                    continue
+                slot = len(self.ids)
+                self.ids.append(chunk_id)
+                self.slots[chunk_id] = slot
+                self.meta[chunk_id] = dict(meta or {})
+                self.pairs += len(self.meta[chunk_id])
+                for pair in self.meta[chunk_id].items():
+                    pending.setdefault(pair, []).append(slot)
+            for pair, slots in pending.items():
+                self.postings[pair] = self.postings.get(pair, 0) | _bitmap(slots)
+
+    def remove(self, chunk_id: UUID) -> None:
+        with self._lock:
+            slot = self.slots.pop(chunk_id, None)
+            if slot is None:
+                return
+            mask = ~(1 << slot)
+            meta = self.meta.pop(chunk_id)
+            self.pairs -= len(meta)
+            for pair in meta.items():
+                bitmap = self.postings[pair] & mask
+                if bitmap:
+                    self.postings[pair] = bitmap
+                else:
+                    del self.postings[pair]
+            self.ids[slot] = None
+            heapq.heappush(self._free, slot)
+
+    def bitmap(self, filters: dict[str, str]) -> int:
+        """Bitmap of the slots whose chunk matches every key/value of ``filters``."""
+        with self._lock:
+            bitmaps = []
+            for pair in filters.items():
+                bitmap = self.postings.get(pair, 0)
+                if not bitmap:
+                    return 0
+                bitmaps.append(bitmap)
+            if not bitmaps:
+                return _bitmap(list(self.slots.values()))
+            bitmaps.sort(key=int.bit_count)
+            result = bitmaps[0]
+            for bitmap in bitmaps[1:]:
+                result &= bitmap
+                if not result:
+                    break
+            return result
+
+    def match(self, filters: dict[str, str]) -> set[UUID]:
+        """Ids of the chunks matching every key/value of ``filters``."""
+        with self._lock:
+            bitmap = self.bitmap(filters)
+            if not bitmap:
+                return set()
+            raw = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+            bits = np.unpackbits(np.frombuffer(raw, dtype=np.uint8), bitorder="little")
+            return {self.ids[slot] for slot in np.flatnonzero(bits)}
+
+
+def _bitmap(slots: list[int]) -> int:
+    """Python int with the bits of ``slots`` set."""
+    if not slots:
+        return 0
+    bits = np.zeros(max(slots) + 1, dtype=np.uint8)
+    bits[slots] = 1
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
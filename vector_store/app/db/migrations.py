@@ -0,0 +1,140 @@
+import json
+import logging
+from uuid import UUID
+
+from sqlalchemy import Connection, Engine, inspect, text
+
+from vector_store.app.db.base import Base
+from vector_store.app.db.models.lsh_index import LSHIndexEntryModel, LSHIndexModel
+from vector_store.app.db.vector_segment import get_segment
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_IMPORT_BATCH_SIZE = 1000
+
+
+def migrate(engine: Engine) -> None:
+    """
+    Upgrade a database created by an earlier version to the current models.
+    ``create_all`` only creates missing tables, so changes to existing ones are
+    applied here. Every step checks the schema first and is a no-op on an
+    up-to-date database.
+    """
+    with engine.begin() as conn:
+        for step in MIGRATIONS:
+            step(conn)
+
+
+def _columns(conn: Connection, table: str) -> set[str]:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def _move_embeddings_to_segments(conn: Connection) -> None:
+    """
+    Chunks used to store their embedding as JSON in ``chunks.embedding``, now
+    they live in the vector segment of their library. Copy them over, then
+    rebuild the table without the column and with ``library_id``.
+    """
+    if "embedding" not in _columns(conn, "chunks"):
+        return
+    logger.info("Moving chunk embeddings to vector segments...")
+    conn.execute(text("ALTER TABLE chunks RENAME TO chunks_old"))
+    for index in inspect(conn).get_indexes("chunks_old"):
+        conn.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+    Base.metadata.tables["chunks"].create(conn)
+
+    rows = conn.execute(
+        text(
+            "SELECT c.id, d.library_id, c.embedding FROM chunks_old c "
+            "JOIN documents d ON d.id = c.document_id ORDER BY d.library_id"
+        )
+    )
+    moved = 0
+    while batch := rows.fetchmany(EMBEDDING_IMPORT_BATCH_SIZE):
+        by_library: dict[str, tuple[list[UUID], list[list[float]]]] = {}
+        for chunk_id, library_id, embedding in batch:
+            ids, vectors = by_library.setdefault(library_id, ([], []))
+            ids.append(UUID(chunk_id))
+            vectors.append(json.loads(embedding))
+        for library_id, (ids, vectors) in by_library.items():
+            get_segment(library_id).put_many(ids, vectors)
+        moved += len(batch)
+
+    copied = conn.execute(
+        text(
+            "INSERT INTO chunks (id, document_id, library_id, text, meta, created_at) "
+            "SELECT c.id, c.document_id, d.library_id, c.text, c.meta, c.created_at "
+            "FROM chunks_old c JOIN documents d ON d.id = c.document_id"
+        )
+    ).rowcount
+    orphans = conn.execute(text("SELECT COUNT(*) FROM chunks_old")).scalar() - copied
+    if orphans:
+        logger.warning("Dropped %d chunks of deleted documents", orphans)
+    conn.execute(text("DROP TABLE chunks_old"))
+    logger.info("Moved %d embeddings to vector segments", moved)
+
+
+def _drop_legacy_lsh_indexes(conn: Connection) -> None:
+    """
+    LSH indexes persisted before their hyperplanes were derived from a seed
+    (as one JSON blob per library, or with the hyperplanes and '0'/'1' string
+    bucket keys of each entry) are dropped. Their libraries' indexes are
+    rebuilt from the vector segments on first use.
+    """
+    if "lsh_indices" not in inspect(conn).get_table_names():
+        return
+    legacy = "seed" not in _columns(conn, "lsh_indices") or bool(
+        conn.execute(text("SELECT 1 FROM lsh_indices WHERE seed IS NULL")).first()
+    )
+    if not legacy:
+        return
+    logger.info("Dropping legacy LSH indexes, they are rebuilt on first use")
+    conn.execute(text("DROP TABLE IF EXISTS lsh_index_entries"))
+    conn.execute(text("DROP TABLE lsh_indices"))
+    LSHIndexModel.__table__.create(conn)
+    LSHIndexEntryModel.__table__.create(conn)
+
+
+def _add_missing_columns(conn: Connection) -> None:
+    """
+    Add the columns of the current models missing from existing tables, e.g.
+    ``libraries.vector_dtype``. NOT NULL columns need a scalar default, which
+    the existing rows take.
+    """
+    tables = inspect(conn).get_table_names()
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = _columns(conn, table.name)
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            default = column.default.arg if column.default is not None else None
+            if not column.nullable and not isinstance(default, str | int | float):
+                raise RuntimeError(
+                    f"Can't add {table.name}.{column.name}: NOT NULL, no default"
+                )
+            ddl = (
+                f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+                f"{column.type.compile(conn.dialect)}"
+            )
+            if isinstance(default, str | int | float):
+                ddl += f" DEFAULT {_literal(default)}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            logger.info("Adding column %s.%s", table.name, column.name)
+            conn.execute(text(ddl))
+
+
+def _literal(value: str | int | float) -> str:
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(int(value) if isinstance(value, bool) else value)
+
+
+# Applied in order
+MIGRATIONS = [
+    _move_embeddings_to_segments,
+    _drop_legacy_lsh_indexes,
+    _add_missing_columns,
+]
@@ -1,9 +1,11 @@
 from datetime import datetime, timezone
-from uuid import uuid4
+from uuid import UUID, uuid4
 
+import numpy as np
 from sqlalchemy import JSON, Column, DateTime, ForeignKey, String
 
 from vector_store.app.db.database import Base
+from vector_store.app.db.vector_segment import get_segment
 
 
 class Chunk(Base):
@@ -11,7 +13,12 @@ class Chunk(Base):
 
     id = Column(String, primary_key=True, default=lambda: str(uuid4()))
     document_id = Column(String, ForeignKey("documents.id"), nullable=False)
+    library_id = Column(String, ForeignKey("libraries.id"), nullable=False, index=True)
     text = Column(String, nullable=False)
-    embedding = Column(JSON, nullable=False)  # Save floats list as JSON
     meta = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    @property
+    def embedding(self) -> np.ndarray | None:
+        """Zero-copy view of the embedding in the library's vector segment."""
+        return get_segment(self.library_id).get(UUID(self.id))
@@ -0,0 +1,24 @@
+from sqlalchemy import JSON, Column, ForeignKey, Integer, String
+
+from vector_store.app.db.base import Base
+
+
+class HNSWIndexModel(Base):
+    __tablename__ = "hnsw_indices"
+
+    library_id = Column(String, primary_key=True)
+    dim = Column(Integer, nullable=False)
+    M = Column(Integer, nullable=False)
+    ef_construction = Column(Integer, nullable=False)
+    ef_search = Column(Integer, nullable=False)
+    dtype = Column(String, nullable=False, default="float32")  # Storage type of vectors
+
+
+class HNSWNodeModel(Base):
+    """One row per graph node, so mutations only touch the nodes they relink."""
+
+    __tablename__ = "hnsw_nodes"
+
+    library_id = Column(String, ForeignKey("hnsw_indices.library_id"), primary_key=True)
+    vector_id = Column(String, primary_key=True)
+    links = Column(JSON, nullable=False)  # Neighbor vector ids for each layer
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, LargeBinary, String
+
+from vector_store.app.db.base import Base
+
+
+class IVFIndexModel(Base):
+    """
+    IVF header, centroids and optional PQ codec. List assignments and codes are
+    not stored: they are recomputed from the library's vector segment on load.
+    """
+
+    __tablename__ = "ivf_indices"
+
+    library_id = Column(String, primary_key=True)
+    dim = Column(Integer, nullable=False)
+    nlist = Column(Integer, nullable=False)
+    nprobe = Column(Integer, nullable=False)
+    metric = Column(String, nullable=False)
+    trained_size = Column(Integer, nullable=False, default=0)
+    centroids = Column(LargeBinary, nullable=True)  # float32, null until trained
+    compression = Column(String, nullable=True)  # "pq" or "opq"
+    pq_m = Column(Integer, nullable=True)
+    pq_nbits = Column(Integer, nullable=True)
+    rerank = Column(Integer, nullable=True)
+    codebooks = Column(LargeBinary, nullable=True)
+    rotation = Column(LargeBinary, nullable=True)
+    # Storage type of uncompressed lists
+    dtype = Column(String, nullable=False, default="float32")
@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 from uuid import uuid4
 
-from sqlalchemy import Column, DateTime, String
+from sqlalchemy import JSON, Column, DateTime, String
 
 from vector_store.app.db.database import Base
 
@@ -14,3 +14,7 @@ class Library(Base):
     description = Column(String)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     index_type = Column(String, default="lsh")
+    index_params = Column(JSON, nullable=True)  # Index specific tuning knobs
+    compression = Column(String, nullable=True)  # Vector codec: "pq" or "opq"
+    # float32, float16 or int8
+    vector_dtype = Column(String, nullable=False, default="float32")
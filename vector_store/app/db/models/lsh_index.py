@@ -1,4 +1,4 @@
-from sqlalchemy import JSON, Column, Integer, String
+from sqlalchemy import JSON, Boolean, Column, Float, ForeignKey, Integer, String
 
 from vector_store.app.db.base import Base
 
@@ -10,6 +10,24 @@ class LSHIndexModel(Base):
     dim = Column(Integer, nullable=False)
     num_tables = Column(Integer, nullable=False)
     num_hashes = Column(Integer, nullable=False)
-    tables = Column(JSON, nullable=False)
-    hyperplanes = Column(JSON, nullable=False)
-    vectors = Column(JSON, nullable=False)
+    probes = Column(Integer, nullable=False)  # Multi-probe budget per query
+    min_candidates = Column(Integer, nullable=False)
+    # Auto-tuning: the parameters above were chosen for tuned_size vectors
+    auto_tune = Column(Boolean, nullable=False)
+    target_recall = Column(Float, nullable=False)
+    tuned_size = Column(Integer, nullable=False)
+    recall = Column(Float, nullable=True)  # Recall@k measured by the tuning
+    # Hyperplanes are regenerated from seed and projection
+    seed = Column(Integer, nullable=False)
+    projection = Column(String, nullable=False)
+    dtype = Column(String, nullable=False, default="float32")  # Storage type of vectors
+
+
+class LSHIndexEntryModel(Base):
+    """One row per indexed vector, so mutations only touch their own row."""
+
+    __tablename__ = "lsh_index_entries"
+
+    library_id = Column(String, ForeignKey("lsh_indices.library_id"), primary_key=True)
+    vector_id = Column(String, primary_key=True)
+    keys = Column(JSON, nullable=False)  # Bucket key for each table
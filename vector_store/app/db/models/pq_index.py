@@ -0,0 +1,23 @@
+from sqlalchemy import Boolean, Column, Integer, LargeBinary, String
+
+from vector_store.app.db.base import Base
+
+
+class PQIndexModel(Base):
+    """
+    Codec of a product-quantized brute force index. Codes are not stored: they
+    are re-encoded from the library's vector segment on load.
+    """
+
+    __tablename__ = "pq_indices"
+
+    library_id = Column(String, primary_key=True)
+    dim = Column(Integer, nullable=False)
+    metric = Column(String, nullable=False)
+    pq_m = Column(Integer, nullable=False)
+    pq_nbits = Column(Integer, nullable=False)
+    opq = Column(Boolean, nullable=False, default=False)
+    rerank = Column(Integer, nullable=False)
+    trained_size = Column(Integer, nullable=False, default=0)
+    codebooks = Column(LargeBinary, nullable=True)  # float32, null until trained
+    rotation = Column(LargeBinary, nullable=True)  # float32, OPQ only
@@ -0,0 +1,275 @@
+import threading
+from typing import Any
+from uuid import UUID
+
+import numpy as np
+
+from vector_store.app.constants import (
+    PQ_M,
+    PQ_MIN_TRAIN_SIZE,
+    PQ_NBITS,
+    PQ_RERANK,
+    PQ_RETRAIN_FACTOR,
+)
+from vector_store.app.db.bruteforce_index import BruteForceIndex
+from vector_store.app.db.index import ID_BYTES, Index
+from vector_store.app.db.product_quantizer import ProductQuantizer
+
+INITIAL_CAPACITY = 64
+RERANK_BLOCK_SIZE = 64  # Queries re-ranked together, see ``rerank``
+
+
+def rerank(
+    storage,
+    queries: np.ndarray,
+    candidates: list[list[tuple[UUID, float]]],
+    k: int,
+    metric: str,
+) -> list[list[tuple[UUID, float]]]:
+    """
+    Exact top-k among each query's candidates, with the full vectors of
+    ``storage`` (anything with a ``get_many(vector_ids)`` such as a
+    VectorSegment).
+
+    The candidates of ``RERANK_BLOCK_SIZE`` queries at a time are read in one
+    pass and scored against those queries in one product.
+    """
+    results = []
+    for start in range(0, len(queries), RERANK_BLOCK_SIZE):
+        block = [
+            [vector_id for vector_id, _ in hits]
+            for hits in candidates[start : start + RERANK_BLOCK_SIZE]
+        ]
+        ids, vectors = storage.get_many(
+            list(dict.fromkeys(vector_id for hits in block for vector_id in hits))
+        )
+        exact = BruteForceIndex(metric)
+        if ids:
+            exact.attach(ids, vectors)
+        results += exact.search_candidates(
+            queries[start : start + RERANK_BLOCK_SIZE], k, block
+        )
+    return results
+
+
+class PQIndex(Index):
+    """
+    Exhaustive search over product-quantized codes.
+
+    Every vector is stored as ``pq_m`` one byte codes (see ``ProductQuantizer``)
+    and scored with asymmetric distance computation: one lookup table per
+    query, then a gather-and-sum per stored code. When ``storage`` is set, the
+    ``k * rerank`` best candidates are re-ranked exactly with their full
+    vectors.
+
+    Until the codec is trained vectors are kept in full in a BruteForceIndex
+    and searches are exact.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        metric: str = "euclidean",
+        pq_m: int = PQ_M,
+        pq_nbits: int = PQ_NBITS,
+        opq: bool = False,
+        rerank: int = PQ_RERANK,
+        quantizer: ProductQuantizer | None = None,
+        seed: int | None = None,
+    ):
+        if metric not in ("euclidean", "cosine"):
+            raise ValueError(f"Unsupported metric: {metric}")
+        self.dim = dim
+        self.metric = metric
+        self.rerank = rerank
+        self.seed = seed
+        self.quantizer = quantizer or ProductQuantizer(dim, pq_m, pq_nbits, opq, seed)
+        self.trained_size = 0
+        self.storage = None  # Full vectors for re-ranking, e.g. a VectorSegment
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.buffer = BruteForceIndex(self.metric)  # Full vectors until trained
+        self.size = 0
+        self.ids: list[UUID] = []
+        self.rows: dict[UUID, int] = {}
+        self.codes = np.empty((0, self.quantizer.m), dtype=np.uint8)
+
+    def _prepare(self, vectors) -> np.ndarray:
+        data = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if self.metric == "cosine":
+            norms = np.linalg.norm(data, axis=1, keepdims=True)
+            data = data / np.where(norms > 0, norms, 1.0)
+        return data
+
+    # Training
+    def needs_training(self) -> bool:
+        size = self.size + self.buffer.size
+        if not self.quantizer.is_trained:
+            return size >= PQ_MIN_TRAIN_SIZE
+        return size > PQ_RETRAIN_FACTOR * self.trained_size
+
+    def train(self, vector_ids: list[UUID], vectors: list[list[float]]) -> None:
+        quantizer = ProductQuantizer(**self.quantizer.to_dict(), seed=self.seed)
+        quantizer.train(self._prepare(vectors))
+        with self._lock:
+            self.quantizer = quantizer
+            self.trained_size = len(vector_ids)
+            self._reset()
+            self.add_batch(vector_ids, vectors)
+
+    # Index interface
+    def add(self, vector_id: UUID, vector: list[float]) -> None:
+        self.add_batch([vector_id], [vector])
+
+    def add_batch(self, vector_ids: list[UUID], vectors: list[list[float]]) -> None:
+        if not len(vector_ids):
+            return
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vector_ids), -1)
+        with self._lock:
+            if not self.quantizer.is_trained:
+                self.buffer.add_batch(vector_ids, vectors)
+                return
+            if len(set(vector_ids)) != len(vector_ids):
+                # Keep the last vector of every repeated id
+                last = {vector_id: i for i, vector_id in enumerate(vector_ids)}
+                vector_ids, vectors = list(last), vectors[list(last.values())]
+            for vector_id in vector_ids:
+                self.remove(vector_id)
+
+            codes = self.quantizer.encode(self._prepare(vectors))
+            start, end = self.size, self.size + len(vector_ids)
+            if end > self.codes.shape[0]:
+                capacity = max(INITIAL_CAPACITY, self.codes.shape[0])
+                while capacity < end:
+                    capacity *= 2
+                grown = np.empty((capacity, self.quantizer.m), dtype=np.uint8)
+                grown[:start] = self.codes[:start]
+                self.codes = grown
+            self.codes[start:end] = codes
+            self.ids.extend(vector_ids)
+            self.rows.update(zip(vector_ids, range(start, end), strict=True))
+            self.size = end
+
+    def remove(self, vector_id: UUID) -> None:
+        with self._lock:
+            self.buffer.remove(vector_id)
+            row = self.rows.pop(vector_id, None)
+            if row is None:
+                return
+            last = self.size - 1
+            if row != last:
+                moved_id = self.ids[last]
+                self.codes[row] = self.codes[last]
+                self.ids[row] = moved_id
+                self.rows[moved_id] = row
+            self.ids.pop()
+            self.size -= 1
+
+    def search_tables(
+        self, tables: np.ndarray, k: int
+    ) -> list[list[tuple[UUID, float]]]:
+        """Top-k by approximate distance for queries given as lookup tables."""
+        with self._lock:
+            if self.size == 0 or k <= 0:
+                return [[] for _ in tables]
+            codes = self.codes[: self.size]
+            k = min(k, self.size)
+            results = []
+            for table in tables:
+                scores = self.quantizer.adc(table, codes)
+                if k < self.size:
+                    top = np.argpartition(scores, k - 1)[:k]
+                else:
+                    top = np.arange(self.size)
+                top = top[np.argsort(scores[top], kind="stable")]
+                if self.metric == "euclidean":
+                    distances = np.sqrt(np.maximum(scores[top], 0.0))
+                else:
+                    distances = 1.0 + scores[top]
+                results.append(
+                    [
+                        (self.ids[i], float(d))
+                        for i, d in zip(top, distances, strict=True)
+                    ]
+                )
+            return results
+
+    def search(self, query_vector: list[float], k: int) -> list[tuple[UUID, float]]:
+        return self.search_batch([query_vector], k)[0]
+
+    def search_batch(
+        self, query_vectors: list[list[float]], k: int
+    ) -> list[list[tuple[UUID, float]]]:
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(
+            len(query_vectors), -1
+        )
+        with self._lock:
+            if not self.quantizer.is_trained:
+                return self.buffer.search_batch(queries, k)
+            tables = self.quantizer.distance_tables(
+                self._prepare(queries), inner_product=self.metric == "cosine"
+            )
+            if not self.rerank or self.storage is None:
+                return self.search_tables(tables, k)
+            candidates = self.search_tables(tables, k * self.rerank)
+        return rerank(self.storage, queries, candidates, k, self.metric)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes_nbytes + self.quantizer.nbytes
+
+    @property
+    def codes_nbytes(self) -> int:
+        """Memory of the codes and buffered vectors, without the codec."""
+        return self.codes.nbytes + 2 * ID_BYTES * self.size + self.buffer.nbytes
+
+    # Spilling
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["storage"] = None  # Re-attached by ``bind``
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def bind(self, storage) -> None:
+        self.storage = storage
+
+    # Persistence helpers
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "dim": self.dim,
+            "metric": self.metric,
+            "pq_m": self.quantizer.m,
+            "pq_nbits": self.quantizer.nbits,
+            "opq": self.quantizer.opq,
+            "rerank": self.rerank,
+            "trained_size": self.trained_size,
+        }
+
+    @classmethod
+    def from_dict(
+        cls,
+        data: dict[str, Any],
+        codebooks: np.ndarray | None = None,
+        rotation: np.ndarray | None = None,
+    ) -> "PQIndex":
+        index = cls(
+            dim=data["dim"],
+            metric=data["metric"],
+            pq_m=data["pq_m"],
+            pq_nbits=data["pq_nbits"],
+            opq=data["opq"],
+            rerank=data["rerank"],
+        )
+        if codebooks is not None:
+            index.quantizer = ProductQuantizer.from_dict(
+                index.quantizer.to_dict(), codebooks, rotation
+            )
+            index.trained_size = data["trained_size"]
+            index._reset()
+        return index
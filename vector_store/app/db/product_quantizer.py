@@ -0,0 +1,175 @@
+from typing import Any
+
+import numpy as np
+
+from vector_store.app.constants import (
+    OPQ_ITERATIONS,
+    PQ_KMEANS_ITERATIONS,
+    PQ_M,
+    PQ_MAX_TRAIN_SIZE,
+    PQ_NBITS,
+)
+from vector_store.app.db.kmeans import kmeans, nearest_centroids
+
+ENCODE_BLOCK_SIZE = 4096
+
+
+class ProductQuantizer:
+    """
+    Product quantization codec.
+
+    Vectors are split into ``m`` sub-vectors of ``dim / m`` values and every
+    sub-vector is replaced by the index of its nearest centroid in a per
+    subspace codebook of ``2 ** nbits`` entries, so a vector is stored in ``m``
+    bytes.
+
+    With ``opq`` an orthogonal rotation is learned first (alternating between
+    codebooks and the rotation that best maps the data onto its
+    reconstruction), which balances the variance between subspaces.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        m: int = PQ_M,
+        nbits: int = PQ_NBITS,
+        opq: bool = False,
+        seed: int | None = None,
+    ):
+        if m <= 0 or dim % m:
+            raise ValueError(f"Dimension {dim} is not divisible by pq_m={m}")
+        if not 1 <= nbits <= 8:
+            raise ValueError("pq_nbits must be between 1 and 8")
+        self.dim = dim
+        self.m = m
+        self.nbits = nbits
+        self.opq = opq
+        self.seed = seed
+        self.ksub = 1 << nbits
+        self.dsub = dim // m
+        self.codebooks: np.ndarray | None = None  # (m, ksub, dsub)
+        self.rotation: np.ndarray | None = None  # (dim, dim), OPQ only
+
+    @property
+    def is_trained(self) -> bool:
+        return self.codebooks is not None
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            array.nbytes
+            for array in (self.codebooks, self.rotation)
+            if array is not None
+        )
+
+    # Training
+    def train(self, vectors) -> None:
+        rng = np.random.default_rng(self.seed)
+        data = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(data) < self.ksub:
+            raise ValueError(f"Need at least {self.ksub} vectors to train the codec")
+        if len(data) > PQ_MAX_TRAIN_SIZE:
+            data = data[rng.choice(len(data), PQ_MAX_TRAIN_SIZE, replace=False)]
+
+        rotation = None
+        if self.opq:
+            rotation = np.eye(self.dim, dtype=np.float32)
+            for _ in range(OPQ_ITERATIONS):
+                rotated = data @ rotation
+                # A few k-means iterations are enough between rotation updates
+                codebooks = self._train_codebooks(rotated, rng, OPQ_ITERATIONS)
+                reconstructed = self._decode(
+                    self._encode(rotated, codebooks), codebooks
+                )
+                # Orthogonal Procrustes: rotation minimizing |data R - reconstructed|
+                u, _, vt = np.linalg.svd(data.T @ reconstructed)
+                rotation = (u @ vt).astype(np.float32)
+            data = data @ rotation
+
+        self.codebooks = self._train_codebooks(data, rng, PQ_KMEANS_ITERATIONS)
+        self.rotation = rotation
+
+    def _train_codebooks(
+        self, data: np.ndarray, rng: np.random.Generator, iterations: int
+    ) -> np.ndarray:
+        return np.stack(
+            [
+                kmeans(self._subspace(data, j), self.ksub, iterations, rng)
+                for j in range(self.m)
+            ]
+        )
+
+    def _subspace(self, data: np.ndarray, j: int) -> np.ndarray:
+        return data[:, j * self.dsub : (j + 1) * self.dsub]
+
+    # Encoding
+    def _rotate(self, vectors) -> np.ndarray:
+        data = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        return data @ self.rotation if self.rotation is not None else data
+
+    def _encode(self, data: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(data), self.m), dtype=np.uint8)
+        for start in range(0, len(data), ENCODE_BLOCK_SIZE):
+            block = data[start : start + ENCODE_BLOCK_SIZE]
+            for j in range(self.m):
+                codes[start : start + len(block), j] = nearest_centroids(
+                    self._subspace(block, j), codebooks[j]
+                )[:, 0]
+        return codes
+
+    def _decode(self, codes: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+        return codebooks[np.arange(self.m), codes].reshape(len(codes), self.dim)
+
+    def encode(self, vectors) -> np.ndarray:
+        """Codes of the given vectors, shape (n, m) uint8."""
+        return self._encode(self._rotate(vectors), self.codebooks)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate reconstruction of encoded vectors."""
+        data = self._decode(codes, self.codebooks)
+        return data @ self.rotation.T if self.rotation is not None else data
+
+    # Asymmetric distance computation
+    def distance_tables(self, queries, inner_product: bool = False) -> np.ndarray:
+        """
+        Lookup tables of shape (q, m, ksub): the distance contribution of every
+        centroid of every subspace to each query. Summing the entries selected
+        by a code gives the squared euclidean distance to the encoded vector,
+        or its negated inner product when ``inner_product`` is set.
+        """
+        sub = self._rotate(queries).reshape(-1, self.m, self.dsub).transpose(1, 0, 2)
+        dots = np.matmul(sub, self.codebooks.transpose(0, 2, 1))  # (m, q, ksub)
+        if inner_product:
+            tables = -dots
+        else:
+            tables = (
+                (sub * sub).sum(axis=2)[:, :, None]
+                - 2.0 * dots
+                + (self.codebooks * self.codebooks).sum(axis=2)[:, None, :]
+            )
+        return np.ascontiguousarray(tables.transpose(1, 0, 2))
+
+    def adc(self, table: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Approximate distances from one query's table to every code row."""
+        offsets = np.arange(self.m) * self.ksub
+        return table.ravel()[codes.astype(np.intp) + offsets].sum(axis=1)
+
+    # Persistence helpers
+    def to_dict(self) -> dict[str, Any]:
+        return {"dim": self.dim, "m": self.m, "nbits": self.nbits, "opq": self.opq}
+
+    @classmethod
+    def from_dict(
+        cls,
+        data: dict[str, Any],
+        codebooks: np.ndarray | None = None,
+        rotation: np.ndarray | None = None,
+    ) -> "ProductQuantizer":
+        quantizer = cls(**data)
+        if codebooks is not None:
+            quantizer.codebooks = codebooks.reshape(
+                quantizer.m, quantizer.ksub, quantizer.dsub
+            )
+            if rotation is not None:
+                quantizer.rotation = rotation.reshape(quantizer.dim, quantizer.dim)
+        return quantizer
@@ -0,0 +1,133 @@
+import hashlib
+import threading
+from collections import defaultdict, deque
+from typing import Any
+
+import numpy as np
+from cachetools import TTLCache
+
+from vector_store.app.constants import (
+    QUERY_CACHE_SIMILAR_SIZE,
+    QUERY_CACHE_SIMILARITY,
+    QUERY_CACHE_SIZE,
+    QUERY_CACHE_TTL,
+)
+
+
+class QueryCache:
+    """
+    Results of recent queries per library.
+
+    Every library has a version counter, bumped by each chunk mutation. Entries
+    are keyed by (library, version, query key) so a bump makes all the cached
+    results of the library unreachable at once; they then age out of the LRU.
+
+    With a ``similarity`` threshold the cache is also approximate: a query
+    whose embedding has at least that cosine similarity with a recent query of
+    the library (same ``k`` and filters) reuses its results.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = QUERY_CACHE_SIZE,
+        ttl: float = QUERY_CACHE_TTL,
+        similarity: float | None = QUERY_CACHE_SIMILARITY,
+        similar_size: int = QUERY_CACHE_SIMILAR_SIZE,
+    ):
+        self.similarity = similarity
+        self.entries: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.versions: defaultdict[str, int] = defaultdict(int)
+        # Library -> recent (version, unit embedding, k, filters, results)
+        self.recent: defaultdict[str, deque] = defaultdict(
+            lambda: deque(maxlen=similar_size)
+        )
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(
+        text: str | None, embedding: list[float] | None, k: int, filters: dict | None
+    ) -> tuple:
+        """Query key: the embedding's hash when given, the text otherwise."""
+        if embedding is not None:
+            raw = np.asarray(embedding, dtype=np.float32).tobytes()
+            source = hashlib.sha256(raw).hexdigest()
+        else:
+            source = f"text:{text}"
+        return source, k, tuple(sorted((filters or {}).items()))
+
+    def version(self, library_id) -> int:
+        with self._lock:
+            return self.versions[str(library_id)]
+
+    def bump(self, library_id) -> None:
+        """Invalidate every cached result of the library."""
+        with self._lock:
+            self.versions[str(library_id)] += 1
+            self.recent.pop(str(library_id), None)
+
+    def get(self, library_id, version: int, key: tuple) -> Any | None:
+        with self._lock:
+            results = self.entries.get((str(library_id), version, key))
+            if results is not None:
+                self.hits += 1
+            return results
+
+    def get_similar(
+        self, library_id, version: int, key: tuple, embedding: list[float]
+    ) -> Any | None:
+        """Results of the most similar recent query, in approximate mode."""
+        if self.similarity is None:
+            return None
+        _, k, filters = key
+        with self._lock:
+            entries = [
+                entry
+                for entry in self.recent.get(str(library_id), ())
+                if entry[0] == version and entry[2] == k and entry[3] == filters
+            ]
+            if not entries:
+                return None
+            similarities = np.stack([entry[1] for entry in entries]) @ _unit(embedding)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity:
+                return None
+            self.hits += 1
+            return entries[best][4]
+
+    def put(
+        self,
+        library_id,
+        version: int,
+        key: tuple,
+        embedding: list[float],
+        results: Any,
+    ) -> None:
+        with self._lock:
+            # Every put follows a search that missed the cache
+            self.misses += 1
+            if version != self.versions[str(library_id)]:
+                return  # The library changed during the search
+            self.entries[(str(library_id), version, key)] = results
+            if self.similarity is not None:
+                _, k, filters = key
+                self.recent[str(library_id)].append(
+                    (version, _unit(embedding), k, filters, results)
+                )
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.entries),
+            }
+
+
+def _unit(embedding: list[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
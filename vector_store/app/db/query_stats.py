@@ -0,0 +1,111 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from uuid import UUID
+
+from vector_store.app.constants import (
+    QUERY_STATS_FLUSH_INTERVAL,
+    QUERY_STATS_HALF_LIFE,
+    QUERY_STATS_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+MIN_SCORE = 0.01  # Libraries decayed below this are forgotten
+
+
+class QueryStats:
+    """
+    Recent query frequency of every library, used to pick the libraries whose
+    indexes are warmed up at startup.
+
+    Each library has a score, incremented by every query and halved every
+    ``half_life`` seconds. Queries are counted in memory and merged into a JSON
+    file (``{library_id: [score, updated_at]}``) at most every
+    ``flush_interval`` seconds, under an ``flock`` so the counts of every
+    worker process add up. ``record`` is called on the event loop, so those
+    periodic flushes run on a thread of their own.
+    """
+
+    def __init__(
+        self,
+        path: Path | str = QUERY_STATS_PATH,
+        half_life: float = QUERY_STATS_HALF_LIFE,
+        flush_interval: float = QUERY_STATS_FLUSH_INTERVAL,
+    ):
+        self.path = Path(path)
+        self.half_life = half_life
+        self.flush_interval = flush_interval
+        self.pending: Counter[str] = Counter()
+        self._flushed_at = time.time()
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="query-stats"
+        )
+
+    def record(self, library_id: UUID | str, queries: int = 1) -> None:
+        with self._lock:
+            self.pending[str(library_id)] += queries
+            due = time.time() - self._flushed_at >= self.flush_interval
+            if due:
+                # Queries recorded until the flush runs are part of it
+                self._flushed_at = time.time()
+        if due:
+            self._writer.submit(self.flush)
+
+    def flush(self) -> None:
+        """Merge the queries counted since the last flush into the file."""
+        with self._lock:
+            pending, self.pending = self.pending, Counter()
+            self._flushed_at = time.time()
+        if not pending:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(f"{self.path}.lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                now = time.time()
+                scores = self._scores(now)
+                for library_id, queries in pending.items():
+                    scores[library_id] = scores.get(library_id, 0.0) + queries
+                data = {
+                    library_id: [score, now]
+                    for library_id, score in scores.items()
+                    if score >= MIN_SCORE
+                }
+                tmp = self.path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(data))
+                os.replace(tmp, self.path)
+        except OSError:
+            logger.exception("Failed to write query stats to %s", self.path)
+
+    def hottest(self, n: int) -> list[str]:
+        """Ids of the ``n`` libraries with the highest decayed score."""
+        scores = self._scores(time.time())
+        with self._lock:
+            for library_id, queries in self.pending.items():
+                scores[library_id] = scores.get(library_id, 0.0) + queries
+        return sorted(scores, key=scores.get, reverse=True)[:n]
+
+    def _scores(self, now: float) -> dict[str, float]:
+        """Scores stored in the file, decayed to ``now``."""
+        try:
+            data = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable query stats in %s", self.path)
+            return {}
+        return {
+            library_id: score * 0.5 ** ((now - updated_at) / self.half_life)
+            for library_id, (score, updated_at) in data.items()
+        }
+
+
+query_stats = QueryStats()
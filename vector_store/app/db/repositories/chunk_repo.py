@@ -1,10 +1,15 @@
-from uuid import UUID
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
 
+import numpy as np
 from sqlalchemy.orm import Session
 
+from vector_store.app.constants import SQL_IN_CLAUSE_BATCH_SIZE
+from vector_store.app.db import library_epoch
 from vector_store.app.db.cache import chunk_cache
 from vector_store.app.db.models.chunk import Chunk
 from vector_store.app.db.models.document import Document
+from vector_store.app.db.vector_segment import drop_segment, get_segment
 from vector_store.app.models.chunk import ChunkCreate, ChunkUpdate
 
 
@@ -14,63 +19,221 @@ class ChunkRepository:
 
     def create(self, document_id: UUID, data: ChunkCreate) -> Chunk:
         chunk = Chunk(
+            id=str(uuid4()),
             document_id=str(document_id),
+            library_id=self._library_id(document_id),
             text=data.text,
-            embedding=data.embedding,
             meta=data.meta or {},
         )
+        # The embedding lives in the library's vector segment, not in SQLite
+        segment = get_segment(chunk.library_id)
+        segment.put(UUID(chunk.id), data.embedding)
         self.db.add(chunk)
-        self.db.commit()
+        try:
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            segment.delete(UUID(chunk.id))
+            raise
         self.db.refresh(chunk)
         # Cache the chunk in memory
-        chunk_cache[chunk.id] = chunk
+        _cache(chunk)
         return chunk
 
+    def create_many(self, items: list[tuple[UUID, ChunkCreate]]) -> list[Chunk]:
+        """Insert many chunks, given as (document_id, data) pairs, in one commit."""
+        created_at = datetime.now(timezone.utc)
+        chunks = [
+            Chunk(
+                id=str(uuid4()),
+                document_id=str(document_id),
+                library_id=self._library_id(document_id),
+                text=data.text,
+                meta=data.meta or {},
+                created_at=created_at,
+            )
+            for document_id, data in items
+        ]
+        ids = [chunk.id for chunk in chunks]
+
+        by_library: dict[str, list[int]] = {}
+        for i, chunk in enumerate(chunks):
+            by_library.setdefault(chunk.library_id, []).append(i)
+        for library_id, positions in by_library.items():
+            get_segment(library_id).put_many(
+                [UUID(ids[i]) for i in positions],
+                [items[i][1].embedding for i in positions],
+            )
+
+        self.db.add_all(chunks)
+        try:
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            for library_id, positions in by_library.items():
+                get_segment(library_id).delete_many([UUID(ids[i]) for i in positions])
+            raise
+
+        # Reload the expired rows with a few IN queries instead of one per chunk
+        self.list_by_ids(ids)
+        for chunk in chunks:
+            _cache(chunk)
+        return chunks
+
+    def list_by_ids(self, chunk_ids: list[UUID]) -> list[Chunk]:
+        ids = [str(chunk_id) for chunk_id in chunk_ids]
+        chunks = []
+        for start in range(0, len(ids), SQL_IN_CLAUSE_BATCH_SIZE):
+            batch = ids[start : start + SQL_IN_CLAUSE_BATCH_SIZE]
+            chunks.extend(self.db.query(Chunk).filter(Chunk.id.in_(batch)).all())
+        return chunks
+
     def get(self, chunk_id: UUID) -> Chunk | None:
-        if chunk_id in chunk_cache:
-            return chunk_cache[chunk_id]
-        chunk = self.db.query(Chunk).filter_by(id=str(chunk_id)).first()
+        """The chunk, possibly a cached read-only copy. Use ``_row`` to modify it."""
+        chunk = chunk_cache.get(str(chunk_id))
+        # The copy is dropped if another worker changed its library since
+        if chunk is not None and not library_epoch.sync(chunk.library_id):
+            return chunk
+        chunk = self._row(chunk_id)
         if chunk:
-            chunk_cache[chunk.id] = chunk
+            _cache(chunk)
         return chunk
 
+    def get_many(self, chunk_ids: list[UUID]) -> dict[str, Chunk]:
+        """
+        Chunks by id string in the order of ``chunk_ids``, the cache misses
+        fetched with a few IN queries. Unknown ids are skipped.
+        """
+        found = {}
+        missing = []
+        for chunk_id in chunk_ids:
+            chunk = chunk_cache.get(str(chunk_id))
+            if chunk is None:
+                missing.append(chunk_id)
+            else:
+                found[chunk.id] = chunk
+        for chunk in self.list_by_ids(missing):
+            found[chunk.id] = chunk
+            _cache(chunk)
+        return {
+            str(chunk_id): found[str(chunk_id)]
+            for chunk_id in chunk_ids
+            if str(chunk_id) in found
+        }
+
+    def _row(self, chunk_id: UUID) -> Chunk | None:
+        return self.db.query(Chunk).filter_by(id=str(chunk_id)).first()
+
     def list_by_document(self, document_id: UUID) -> list[Chunk]:
         return self.db.query(Chunk).filter_by(document_id=str(document_id)).all()
 
     def list_by_library(self, library_id: UUID) -> list[Chunk]:
-        return (
-            self.db.query(Chunk)
-            .join(Document, Chunk.document_id == Document.id)
-            .filter(Document.library_id == str(library_id))
+        return self.db.query(Chunk).filter_by(library_id=str(library_id)).all()
+
+    def embeddings_by_library(self, library_id: UUID) -> tuple[list[UUID], np.ndarray]:
+        """Chunk ids and embedding matrix of a library, read from its segment."""
+        return get_segment(library_id).items()
+
+    def embeddings_by_ids(
+        self, library_id: UUID, chunk_ids: list[UUID]
+    ) -> tuple[list[UUID], np.ndarray]:
+        """Ids and embeddings of the given chunks found in the library's segment."""
+        return get_segment(library_id).get_many(chunk_ids)
+
+    def meta_by_library(self, library_id: UUID) -> list[tuple[UUID, dict | None]]:
+        """(chunk id, meta) of every chunk of a library, without loading the text."""
+        rows = (
+            self.db.query(Chunk.id, Chunk.meta)
+            .filter_by(library_id=str(library_id))
             .all()
         )
+        return [(UUID(chunk_id), meta) for chunk_id, meta in rows]
+
+    def drop_embeddings(self, library_id: UUID) -> None:
+        drop_segment(library_id)
 
     def update(self, chunk_id: UUID, data: ChunkUpdate) -> Chunk | None:
-        chunk = self.get(chunk_id)
+        chunk = self._row(chunk_id)
         if not chunk:
             return None
 
         if data.text is not None:
             chunk.text = data.text
         if data.embedding is not None:
-            chunk.embedding = data.embedding
+            get_segment(chunk.library_id).put(UUID(chunk.id), data.embedding)
         if data.meta is not None:
             chunk.meta = data.meta
 
         try:
             self.db.commit()
             self.db.refresh(chunk)
-            chunk_cache[chunk_id] = chunk  # Update cache after success
+            _cache(chunk)  # Update cache after success
             return chunk
         except Exception as e:
             self.db.rollback()
             raise e
 
     def delete(self, chunk_id: UUID) -> bool:
-        chunk = self.get(chunk_id)
+        chunk = self._row(chunk_id)
         if not chunk:
             return False
+        library_id = chunk.library_id
         self.db.delete(chunk)
         self.db.commit()
-        chunk_cache.pop(chunk_id, None)
+        get_segment(library_id).delete(UUID(str(chunk_id)))
+        chunk_cache.pop(str(chunk_id), None)
         return True
+
+    def delete_many(self, library_id: UUID, chunk_ids: list[UUID]) -> int:
+        """Delete chunks of one library, rows and embeddings, in one commit."""
+        ids = [str(chunk_id) for chunk_id in chunk_ids]
+        deleted = 0
+        for start in range(0, len(ids), SQL_IN_CLAUSE_BATCH_SIZE):
+            batch = ids[start : start + SQL_IN_CLAUSE_BATCH_SIZE]
+            deleted += (
+                self.db.query(Chunk)
+                .filter(Chunk.id.in_(batch))
+                .delete(synchronize_session=False)
+            )
+        self.db.commit()
+        get_segment(library_id).delete_many([UUID(chunk_id) for chunk_id in ids])
+        for chunk_id in ids:
+            chunk_cache.pop(chunk_id, None)
+        return deleted
+
+    def delete_by_library(self, library_id: UUID) -> int:
+        """Delete the chunk rows of a library, its segment is dropped separately."""
+        ids = [
+            chunk_id
+            for (chunk_id,) in self.db.query(Chunk.id).filter_by(
+                library_id=str(library_id)
+            )
+        ]
+        deleted = (
+            self.db.query(Chunk)
+            .filter_by(library_id=str(library_id))
+            .delete(synchronize_session=False)
+        )
+        self.db.commit()
+        for chunk_id in ids:
+            chunk_cache.pop(chunk_id, None)
+        return deleted
+
+    def _library_id(self, document_id: UUID) -> str:
+        document = self.db.get(Document, str(document_id))
+        return document.library_id
+
+
+def _cache(chunk: Chunk) -> None:
+    """
+    Cache a detached copy of the row under its id string. Session objects get
+    expired by later commits and can't be read once their session is closed.
+    """
+    chunk_cache[chunk.id] = Chunk(
+        id=chunk.id,
+        document_id=chunk.document_id,
+        library_id=chunk.library_id,
+        text=chunk.text,
+        meta=dict(chunk.meta) if chunk.meta is not None else None,
+        created_at=chunk.created_at,
+    )
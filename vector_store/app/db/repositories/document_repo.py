@@ -62,3 +62,12 @@ class DocumentRepository:
         self.db.delete(document)
         self.db.commit()
         return True
+
+    def delete_by_library(self, library_id: UUID) -> int:
+        deleted = (
+            self.db.query(Document)
+            .filter_by(library_id=str(library_id))
+            .delete(synchronize_session=False)
+        )
+        self.db.commit()
+        return deleted
@@ -0,0 +1,130 @@
+import logging
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from vector_store.app.constants import SQL_IN_CLAUSE_BATCH_SIZE
+from vector_store.app.db.cache import index_cache
+from vector_store.app.db.hnsw_index import HNSWIndex
+from vector_store.app.db.models.hnsw_index import HNSWIndexModel, HNSWNodeModel
+from vector_store.app.db.vector_segment import get_segment
+
+logger = logging.getLogger(__name__)
+
+
+class HNSWIndexRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(
+        self, library_id: UUID, pending: set[UUID] | None = None
+    ) -> HNSWIndex | None:
+        """
+        The library's index, cached or restored from its rows. ``pending`` are
+        the ids of the write-ahead log the caller replays next, whose vectors
+        may already be gone from the segment.
+        """
+        index = index_cache.get(str(library_id))
+        if index:
+            return index
+        row = (
+            self.db.query(HNSWIndexModel).filter_by(library_id=str(library_id)).first()
+        )
+        if row:
+            index = HNSWIndex.from_dict(
+                {
+                    "dim": row.dim,
+                    "M": row.M,
+                    "ef_construction": row.ef_construction,
+                    "ef_search": row.ef_search,
+                    "dtype": row.dtype,
+                }
+            )
+            # Vectors are read straight from the library's segment mapping
+            segment = get_segment(library_id)
+            entries = []
+            nodes = self.db.query(HNSWNodeModel).filter_by(library_id=str(library_id))
+            for node in nodes:
+                vector_id = UUID(node.vector_id)
+                vector = segment.get(vector_id)
+                if vector is None:
+                    if not pending or vector_id not in pending:
+                        logger.warning(
+                            "Vector %s missing from segment, skipping", vector_id
+                        )
+                    continue
+                entries.append((vector_id, vector, node.links))
+            index.restore(entries)
+            index_cache[str(library_id)] = index
+            return index
+        return None
+
+    def save(self, library_id: UUID, index: HNSWIndex):
+        """Write the whole index. Prefer ``save_changes`` after mutations."""
+        existing = (
+            self.db.query(HNSWIndexModel).filter_by(library_id=str(library_id)).first()
+        )
+        data = index.to_dict()
+
+        if existing:
+            existing.dim = data["dim"]
+            existing.M = data["M"]
+            existing.ef_construction = data["ef_construction"]
+            existing.ef_search = data["ef_search"]
+            existing.dtype = data["dtype"]
+        else:
+            self.db.add(HNSWIndexModel(library_id=str(library_id), **data))
+
+        index.pop_changes()
+        self.db.query(HNSWNodeModel).filter_by(library_id=str(library_id)).delete()
+        self.db.add_all(
+            self._node(library_id, index, vector_id) for vector_id in index.nodes
+        )
+        self.db.commit()
+        index_cache[str(library_id)] = index
+
+    def save_changes(self, library_id: UUID, index: HNSWIndex):
+        """
+        Persist only the nodes added, relinked or removed since the last save.
+        Changed nodes are upserted as a batched delete and one bulk insert.
+        """
+        dirty, removed = index.pop_changes()
+        self._delete_rows(library_id, list(removed | dirty))
+        self.db.add_all(
+            self._node(library_id, index, vector_id)
+            for vector_id in dirty
+            if vector_id in index.nodes
+        )
+        self.db.commit()
+        index_cache[str(library_id)] = index
+
+    def delete_nodes(self, library_id: UUID, vector_ids: list[UUID]):
+        """Drop the persisted nodes of vectors no longer in the index."""
+        self._delete_rows(library_id, vector_ids)
+        self.db.commit()
+
+    def _delete_rows(self, library_id: UUID, vector_ids: list[UUID]) -> None:
+        # Rows loaded in this session are expunged too, so new ones can replace them
+        ids = [str(vector_id) for vector_id in vector_ids]
+        for start in range(0, len(ids), SQL_IN_CLAUSE_BATCH_SIZE):
+            self.db.query(HNSWNodeModel).filter(
+                HNSWNodeModel.library_id == str(library_id),
+                HNSWNodeModel.vector_id.in_(
+                    ids[start : start + SQL_IN_CLAUSE_BATCH_SIZE]
+                ),
+            ).delete(synchronize_session="evaluate")
+
+    def delete(self, library_id: UUID):
+        # Remove from the cache
+        index_cache.pop(str(library_id), None)
+        self.db.query(HNSWNodeModel).filter_by(library_id=str(library_id)).delete()
+        self.db.query(HNSWIndexModel).filter_by(library_id=str(library_id)).delete()
+        self.db.commit()
+
+    @staticmethod
+    def _node(library_id: UUID, index: HNSWIndex, vector_id: UUID) -> HNSWNodeModel:
+        return HNSWNodeModel(
+            library_id=str(library_id),
+            vector_id=str(vector_id),
+            links=index.node_links(vector_id),
+        )
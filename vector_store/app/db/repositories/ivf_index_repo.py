@@ -0,0 +1,82 @@
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from vector_store.app.db.cache import index_cache
+from vector_store.app.db.ivf_index import IVFIndex
+from vector_store.app.db.models.ivf_index import IVFIndexModel
+from vector_store.app.db.vector_segment import get_segment
+
+
+def _array(blob: bytes | None) -> np.ndarray | None:
+    return np.frombuffer(blob, dtype=np.float32) if blob is not None else None
+
+
+def _blob(array: np.ndarray | None) -> bytes | None:
+    return array.astype(np.float32).tobytes() if array is not None else None
+
+
+class IVFIndexRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, library_id: UUID) -> IVFIndex | None:
+        index = index_cache.get(str(library_id))
+        if index:
+            return index
+        row = self.db.query(IVFIndexModel).filter_by(library_id=str(library_id)).first()
+        if row:
+            centroids = _array(row.centroids)
+            index = IVFIndex.from_dict(
+                {
+                    "dim": row.dim,
+                    "nlist": row.nlist,
+                    "nprobe": row.nprobe,
+                    "metric": row.metric,
+                    "trained_size": row.trained_size,
+                    "compression": row.compression,
+                    "pq_m": row.pq_m,
+                    "pq_nbits": row.pq_nbits,
+                    "rerank": row.rerank,
+                    "dtype": row.dtype,
+                },
+                centroids.reshape(-1, row.dim) if centroids is not None else None,
+                _array(row.codebooks),
+                _array(row.rotation),
+            )
+            # Vectors are read from the library's segment and assigned in one pass
+            segment = get_segment(library_id)
+            index.storage = segment
+            vector_ids, vectors = segment.items()
+            index.add_batch(vector_ids, vectors)
+            index_cache[str(library_id)] = index
+            return index
+        return None
+
+    def save(self, library_id: UUID, index: IVFIndex):
+        """Write the header, centroids and codec, only needed after (re)training."""
+        existing = (
+            self.db.query(IVFIndexModel).filter_by(library_id=str(library_id)).first()
+        )
+        data = index.to_dict()
+        data["centroids"] = _blob(index.centroids)
+        data["codebooks"] = data["rotation"] = None
+        if index.quantizer is not None:
+            data["codebooks"] = _blob(index.quantizer.codebooks)
+            data["rotation"] = _blob(index.quantizer.rotation)
+
+        if existing:
+            for key, value in data.items():
+                setattr(existing, key, value)
+        else:
+            self.db.add(IVFIndexModel(library_id=str(library_id), **data))
+        self.db.commit()
+        index.storage = get_segment(library_id)
+        index_cache[str(library_id)] = index
+
+    def delete(self, library_id: UUID):
+        # Remove from the cache
+        index_cache.pop(str(library_id), None)
+        self.db.query(IVFIndexModel).filter_by(library_id=str(library_id)).delete()
+        self.db.commit()
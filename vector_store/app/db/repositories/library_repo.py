@@ -2,9 +2,6 @@ from uuid import UUID
 
 from sqlalchemy.orm import Session
 
-from vector_store.app.constants import EMBEDDING_DIM
-from vector_store.app.db.cache import index_cache
-from vector_store.app.db.index_factory import LSHIndex
 from vector_store.app.db.models.library import Library
 from vector_store.app.models.library import LibraryCreate, LibraryUpdate
 
@@ -18,12 +15,10 @@ class LibraryRepository:
             name=data.name,
             description=data.description,
             index_type=data.index_type,
+            index_params=data.index_params,
+            compression=data.compression,
+            vector_dtype=data.vector_dtype,
         )
-        # Cache Management
-        if data.index_type == "lsh":
-            index = LSHIndex(dim=EMBEDDING_DIM)
-            index_cache[library.id] = index
-
         self.db.add(library)
         self.db.commit()
         self.db.refresh(library)
@@ -44,6 +39,8 @@ class LibraryRepository:
             library.name = data.name
         if data.description is not None:
             library.description = data.description
+        if data.index_type is not None:
+            library.index_type = data.index_type
 
         self.db.commit()
         self.db.refresh(library)
@@ -1,23 +1,30 @@
+import logging
 from uuid import UUID
 
-from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
-import vector_store.app.db.index_factory as IndexFactory
-from vector_store.app.constants import EMBEDDING_DIM
+from vector_store.app.constants import SQL_IN_CLAUSE_BATCH_SIZE
 from vector_store.app.db.cache import index_cache
 from vector_store.app.db.lsh_index import LSHIndex
-from vector_store.app.db.models.chunk import Chunk
-from vector_store.app.db.models.library import Library
-from vector_store.app.db.models.lsh_index import LSHIndexModel
+from vector_store.app.db.models.lsh_index import LSHIndexEntryModel, LSHIndexModel
+from vector_store.app.db.vector_segment import get_segment
+
+logger = logging.getLogger(__name__)
 
 
 class LSHIndexRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def get(self, library_id: UUID) -> LSHIndex | None:
-        index = index_cache.get(library_id)
+    def get(
+        self, library_id: UUID, pending: set[UUID] | None = None
+    ) -> LSHIndex | None:
+        """
+        The library's index, cached or restored from its rows. ``pending`` are
+        the ids of the write-ahead log the caller replays next, whose vectors
+        may already be gone from the segment.
+        """
+        index = index_cache.get(str(library_id))
         if index:
             return index
         row = self.db.query(LSHIndexModel).filter_by(library_id=str(library_id)).first()
@@ -27,16 +34,41 @@ class LSHIndexRepository:
                     "dim": row.dim,
                     "num_tables": row.num_tables,
                     "num_hashes": row.num_hashes,
-                    "tables": row.tables,
-                    "hyperplanes": row.hyperplanes,
-                    "vectors": row.vectors,
+                    "probes": row.probes,
+                    "min_candidates": row.min_candidates,
+                    "auto_tune": row.auto_tune,
+                    "target_recall": row.target_recall,
+                    "tuned_size": row.tuned_size,
+                    "recall": row.recall,
+                    "seed": row.seed,
+                    "projection": row.projection,
+                    "dtype": row.dtype,
                 }
             )
-            index_cache[library_id] = index
+            entries = self.db.query(LSHIndexEntryModel).filter_by(
+                library_id=str(library_id)
+            )
+            # Vectors are read straight from the library's segment mapping
+            segment = get_segment(library_id)
+            for entry in entries:
+                vector_id = UUID(entry.vector_id)
+                vector = segment.get(vector_id)
+                if vector is None:
+                    if not pending or vector_id not in pending:
+                        logger.warning(
+                            "Vector %s missing from segment, skipping", vector_id
+                        )
+                    continue
+                index.restore(vector_id, vector, entry.keys)
+            index_cache[str(library_id)] = index
             return index
         return None
 
     def save(self, library_id: UUID, index: LSHIndex):
+        """
+        Write the whole index. Prefer ``save_vectors`` and ``delete_vectors``
+        for mutations, which only touch the rows of the vectors involved.
+        """
         existing = (
             self.db.query(LSHIndexModel).filter_by(library_id=str(library_id)).first()
         )
@@ -46,70 +78,72 @@ class LSHIndexRepository:
             existing.dim = data["dim"]
             existing.num_tables = data["num_tables"]
             existing.num_hashes = data["num_hashes"]
-            existing.tables = data["tables"]
-            existing.hyperplanes = data["hyperplanes"]
-            existing.vectors = data["vectors"]
+            existing.probes = data["probes"]
+            existing.min_candidates = data["min_candidates"]
+            existing.auto_tune = data["auto_tune"]
+            existing.target_recall = data["target_recall"]
+            existing.tuned_size = data["tuned_size"]
+            existing.recall = data["recall"]
+            existing.seed = data["seed"]
+            existing.projection = data["projection"]
+            existing.dtype = data["dtype"]
         else:
             new = LSHIndexModel(
                 library_id=str(library_id),
                 dim=data["dim"],
                 num_tables=data["num_tables"],
                 num_hashes=data["num_hashes"],
-                tables=data["tables"],
-                hyperplanes=data["hyperplanes"],
-                vectors=data["vectors"],
+                probes=data["probes"],
+                min_candidates=data["min_candidates"],
+                auto_tune=data["auto_tune"],
+                target_recall=data["target_recall"],
+                tuned_size=data["tuned_size"],
+                recall=data["recall"],
+                seed=data["seed"],
+                projection=data["projection"],
+                dtype=data["dtype"],
             )
             self.db.add(new)
+
+        self.db.query(LSHIndexEntryModel).filter_by(library_id=str(library_id)).delete()
+        self.db.add_all(self._entries(library_id, index, list(index.vectors)))
+        self.db.commit()
+        index_cache[str(library_id)] = index
+
+    def save_vectors(self, library_id: UUID, index: LSHIndex, vector_ids: list[UUID]):
+        """Persist the entries of newly added vectors in a single commit."""
+        self.db.add_all(self._entries(library_id, index, vector_ids))
+        self.db.commit()
+        index_cache[str(library_id)] = index
+
+    def delete_vectors(self, library_id: UUID, vector_ids: list[UUID]):
+        """Drop the persisted entries of many removed vectors in one commit."""
+        ids = [str(vector_id) for vector_id in vector_ids]
+        for start in range(0, len(ids), SQL_IN_CLAUSE_BATCH_SIZE):
+            self.db.query(LSHIndexEntryModel).filter(
+                LSHIndexEntryModel.library_id == str(library_id),
+                LSHIndexEntryModel.vector_id.in_(
+                    ids[start : start + SQL_IN_CLAUSE_BATCH_SIZE]
+                ),
+            ).delete(synchronize_session=False)
         self.db.commit()
-        index_cache[library_id] = index
 
     def delete(self, library_id: UUID):
         # Remove from the cache
-        index_cache.pop(library_id, None)
+        index_cache.pop(str(library_id), None)
+        self.db.query(LSHIndexEntryModel).filter_by(library_id=str(library_id)).delete()
         self.db.query(LSHIndexModel).filter_by(library_id=str(library_id)).delete()
         self.db.commit()
 
-    def insert(self, library_id: UUID, chunk_id: UUID, embedding: list[float]):
-        index = index_cache.get(library_id)
-        if not index:
-            library = self.library_repo.get(library_id)
-            if not library:
-                raise HTTPException(status_code=404, detail="Library not found")
-            index = self.get(library_id)
-            if not index:
-                index = IndexFactory.create(library.index_type, dim=EMBEDDING_DIM)
-                chunks = self.chunk_repo.list_by_library(library_id)
-                for ch in chunks:
-                    index.add(ch.id, ch.embedding)
-        index.add(chunk_id, embedding)
-        index_cache[library_id] = index
-
-        if isinstance(index, LSHIndex):
-            self.save(library_id, index)
-
-    def remove(self, library_id: UUID, chunk_id: UUID):
-        index = index_cache.get(library_id)
-        if index:
-            index.remove(chunk_id)
-            if isinstance(index, LSHIndex):
-                self.save(library_id, index)
-
-    def get_or_create(self, library: Library, chunks: list[Chunk]) -> LSHIndex:
-        index = index_cache.get(library.id)
-        if index:
-            return index
-
-        if library.index_type == "lsh":
-            index = self.get(library.id)
-            if not index:
-                index = IndexFactory.create(index_type="lsh", dim=EMBEDDING_DIM)
-                for ch in chunks:
-                    index.add(ch.id, ch.embedding)
-                self.save(library.id, index)
-        else:
-            index = IndexFactory.create(index_type=library.index_type)
-            for ch in chunks:
-                index.add(ch.id, ch.embedding)
-
-        index_cache[library.id] = index
-        return index
+    @staticmethod
+    def _entries(
+        library_id: UUID, index: LSHIndex, vector_ids: list[UUID]
+    ) -> list[LSHIndexEntryModel]:
+        return [
+            LSHIndexEntryModel(
+                library_id=str(library_id), vector_id=str(vector_id), keys=keys
+            )
+            for vector_id, keys in zip(
+                vector_ids, index.bucket_keys_many(vector_ids), strict=True
+            )
+        ]
@@ -1,21 +1,21 @@
 import logging
-import os
 from uuid import UUID
 
-import cohere
-from dotenv import load_dotenv
+import numpy as np
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
 from vector_store.app.constants import EMBEDDING_DIM
+from vector_store.app.db.embedding_pipeline import get_embedding_pipeline
+from vector_store.app.db.index_manager import IndexManager
 from vector_store.app.db.repositories.chunk_repo import ChunkRepository
 from vector_store.app.db.repositories.document_repo import DocumentRepository
 from vector_store.app.db.repositories.library_repo import LibraryRepository
-from vector_store.app.db.repositories.lsh_index_repo import LSHIndexRepository
-from vector_store.app.models.chunk import ChunkCreate, ChunkUpdate
-
-load_dotenv()
-cohere_client = cohere.Client(os.environ["COHERE_API_KEY"])
+from vector_store.app.models.chunk import (
+    ChunkCreate,
+    ChunkUpdate,
+    LibraryChunkCreate,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +31,7 @@ class ChunkStoreService:
         self.library_repo = LibraryRepository(db)
         self.document_repo = DocumentRepository(db)
         self.chunk_repo = ChunkRepository(db)
-        self.lsh_repo = LSHIndexRepository(db)
+        self.index_manager = IndexManager(db)
 
     # Chunk Methods
     def create_chunk(self, document_id: UUID, data: ChunkCreate):
@@ -53,12 +53,79 @@ class ChunkStoreService:
         # Update index with the new chunk
         library = self.library_repo.get(document.library_id)
         if library:
-            self._update_index_add(
-                library.id, library.index_type, chunk.id, data.embedding
-            )
+            self.index_manager.add(library, [UUID(chunk.id)], [chunk.embedding])
+            self.index_manager.index_metadata(library, [(UUID(chunk.id), chunk.meta)])
+        self.index_manager.invalidate(document.library_id)
 
         return chunk
 
+    def create_chunks(self, document_id: UUID, data: list[ChunkCreate]):
+        document = self.document_repo.get(document_id)
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
+        return self._create_chunks_in_library(
+            document.library_id, [(document_id, item) for item in data]
+        )
+
+    def create_library_chunks(self, library_id: UUID, data: list[LibraryChunkCreate]):
+        if not self.library_repo.get(library_id):
+            raise HTTPException(status_code=404, detail="Library not found")
+
+        document_ids = {
+            UUID(document.id)
+            for document in self.document_repo.list_by_library(library_id)
+        }
+        missing = {item.document_id for item in data} - document_ids
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Documents not found in this library: {sorted(map(str, missing))}",
+            )
+        return self._create_chunks_in_library(
+            library_id, [(item.document_id, item) for item in data]
+        )
+
+    def _create_chunks_in_library(
+        self, library_id: UUID, items: list[tuple[UUID, ChunkCreate]]
+    ):
+        """Embed, validate and insert a batch of chunks, then index them at once."""
+        if not items:
+            return []
+
+        bad = [
+            i
+            for i, (_, data) in enumerate(items)
+            if data.embedding is not None and len(data.embedding) != EMBEDDING_DIM
+        ]
+        if bad:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Embeddings must have dimension {EMBEDDING_DIM}, invalid chunks at positions {bad}",
+            )
+
+        to_embed = [data for _, data in items if data.embedding is None]
+        if to_embed:
+            embeddings = self._generate_embeddings([data.text for data in to_embed])
+            for data, embedding in zip(to_embed, embeddings, strict=True):
+                data.embedding = embedding
+
+        # Persist all chunks in a single transaction
+        chunks = self.chunk_repo.create_many(items)
+
+        library = self.library_repo.get(library_id)
+        if library:
+            self.index_manager.add(
+                library,
+                [UUID(chunk.id) for chunk in chunks],
+                [chunk.embedding for chunk in chunks],
+            )
+            self.index_manager.index_metadata(
+                library, [(UUID(chunk.id), chunk.meta) for chunk in chunks]
+            )
+        self.index_manager.invalidate(library_id)
+
+        return chunks
+
     def get_chunk(self, chunk_id: UUID):
         chunk = self.chunk_repo.get(chunk_id)
         if not chunk:
@@ -81,14 +148,18 @@ class ChunkStoreService:
 
         # Detect if the embedding will change
         new_embedding = data.embedding
-        embedding_changed = (
-            new_embedding is not None and new_embedding != existing_chunk.embedding
+        old_embedding = existing_chunk.embedding
+        embedding_changed = new_embedding is not None and (
+            old_embedding is None
+            or not np.array_equal(
+                np.asarray(new_embedding, dtype=old_embedding.dtype), old_embedding
+            )
         )
 
         # Perform DB update
         updated_chunk = self.chunk_repo.update(chunk_id, data)
 
-        if embedding_changed:
+        if embedding_changed or data.meta is not None:
             # Retrieve related document and library
             document = self.document_repo.get(updated_chunk.document_id)
             if not document:
@@ -99,9 +170,14 @@ class ChunkStoreService:
                 raise HTTPException(status_code=404, detail="Library not found")
 
             # Update the index
-            self._update_index_replace(
-                library.id, library.index_type, chunk_id, updated_chunk.embedding
-            )
+            if embedding_changed:
+                self.index_manager.replace(library, chunk_id, updated_chunk.embedding)
+            if data.meta is not None:
+                self.index_manager.index_metadata(
+                    library, [(chunk_id, updated_chunk.meta)]
+                )
+        # Cached results also hold the chunk's text and metadata
+        self.index_manager.invalidate(updated_chunk.library_id)
 
         return updated_chunk
 
@@ -118,53 +194,51 @@ class ChunkStoreService:
         if not library:
             raise HTTPException(status_code=404, detail="Library not found")
 
-        # Remove chunk from index
-        self._update_index_remove(library.id, library.index_type, chunk_id)
-
-        return self.chunk_repo.delete(chunk_id)
+        deleted = self.chunk_repo.delete(chunk_id)
 
-    # Index management helper methods
+        # Remove chunk from index
+        self.index_manager.remove(library, [chunk_id])
+        self.index_manager.invalidate(library.id)
 
-    def _update_index_add(
-        self, library_id: UUID, index_type: str, chunk_id: UUID, embedding: list[float]
-    ):
-        """Add a chunk to the index"""
-        if index_type == "lsh":
-            index = self.lsh_repo.get(library_id)
-            if index:
-                index.add(chunk_id, embedding)
-                self.lsh_repo.save(library_id, index)
-
-    def _update_index_remove(self, library_id: UUID, index_type: str, chunk_id: UUID):
-        """Remove a chunk from the index"""
-        if index_type == "lsh":
-            index = self.lsh_repo.get(library_id)
-            if index:
-                index.remove(chunk_id)
-                self.lsh_repo.save(library_id, index)
-
-    def _update_index_replace(
-        self, library_id: UUID, index_type: str, chunk_id: UUID, embedding: list[float]
-    ):
-        """Replace a chunk in the index"""
-        if index_type == "lsh":
-            index = self.lsh_repo.get(library_id)
-            if index:
-                index.remove(chunk_id)
-                index.add(chunk_id, embedding)
-                self.lsh_repo.save(library_id, index)
+        return deleted
 
     # Embedding helper methods
-    def _generate_embedding(self, text: str) -> list[float]:
+    # The pipeline batches these with the texts of concurrent requests
+    @staticmethod
+    async def embed_missing(items: list[ChunkCreate | LibraryChunkCreate]) -> None:
+        """
+        Fill in the embedding of the items sent without one, awaited by the
+        async routes before the chunks are written on the search executor.
+        """
+        to_embed = [data for data in items if data.embedding is None]
+        if not to_embed:
+            return
         try:
-            response = cohere_client.embed(
-                texts=[text],
-                input_type="search_document",
-                model="embed-english-v3.0",
+            embeddings = await get_embedding_pipeline().aembed(
+                [data.text for data in to_embed], "search_document"
             )
-            return response.embeddings[0]
         except Exception as err:
-            logger.exception("Error generating embedding with Cohere")
+            logger.exception("Error generating embeddings")
+            raise HTTPException(
+                status_code=500, detail="Failed to generate embeddings"
+            ) from err
+        for data, embedding in zip(to_embed, embeddings, strict=True):
+            data.embedding = embedding
+
+    def _generate_embedding(self, text: str) -> list[float]:
+        try:
+            return get_embedding_pipeline().embed([text], "search_document")[0]
+        except Exception as err:
+            logger.exception("Error generating embedding")
             raise HTTPException(
                 status_code=500, detail="Failed to generate embedding"
             ) from err
+
+    def _generate_embeddings(self, texts: list[str]) -> list[list[float]]:
+        try:
+            return get_embedding_pipeline().embed(texts, "search_document")
+        except Exception as err:
+            logger.exception("Error generating embeddings")
+            raise HTTPException(
+                status_code=500, detail="Failed to generate embeddings"
+            ) from err
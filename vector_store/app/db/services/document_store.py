@@ -1,23 +1,15 @@
 import logging
-import os
 from uuid import UUID
 
-import cohere
-from dotenv import load_dotenv
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
-from vector_store.app.constants import EMBEDDING_DIM
-from vector_store.app.db.index_factory import IndexFactory
+from vector_store.app.db.index_manager import IndexManager
 from vector_store.app.db.repositories.chunk_repo import ChunkRepository
 from vector_store.app.db.repositories.document_repo import DocumentRepository
 from vector_store.app.db.repositories.library_repo import LibraryRepository
-from vector_store.app.db.repositories.lsh_index_repo import LSHIndexRepository
 from vector_store.app.models.document import DocumentCreate, DocumentUpdate
 
-load_dotenv()
-cohere_client = cohere.Client(os.environ["COHERE_API_KEY"])
-
 logger = logging.getLogger(__name__)
 
 
@@ -27,7 +19,7 @@ class DocumentStoreService:
         self.library_repo = LibraryRepository(db)
         self.document_repo = DocumentRepository(db)
         self.chunk_repo = ChunkRepository(db)
-        self.lsh_repo = LSHIndexRepository(db)
+        self.index_manager = IndexManager(db)
 
     def create_document(self, library_id: UUID, data: DocumentCreate):
         if not self.library_repo.get(library_id):
@@ -57,17 +49,19 @@ class DocumentStoreService:
         return self.document_repo.update(document_id, data, document.library_id)
 
     def delete_document(self, document_id: UUID):
-        if not self.document_repo.get(document_id):
+        document = self.document_repo.get(document_id)
+        if not document:
             raise HTTPException(status_code=404, detail="Document not found")
-        return self.document_repo.delete(document_id)
-
-    # Index management helper methods
-    def _create_and_persist_index(self, library_id: UUID, index_type: str):
-        """Create a new index and persist it if needed"""
-        index = IndexFactory.create(index_type, dim=EMBEDDING_DIM)
 
-        # Persist LSH indices
-        if index_type == "lsh":
-            self.lsh_repo.save(library_id, index)
+        # Delete the document's chunks and drop them from the index in bulk
+        chunk_ids = [
+            UUID(chunk.id) for chunk in self.chunk_repo.list_by_document(document_id)
+        ]
+        if chunk_ids:
+            self.chunk_repo.delete_many(document.library_id, chunk_ids)
+            library = self.library_repo.get(document.library_id)
+            if library:
+                self.index_manager.remove(library, chunk_ids)
+            self.index_manager.invalidate(document.library_id)
 
-        return index
+        return self.document_repo.delete(document_id)
@@ -1,23 +1,18 @@
 import logging
-import os
 from uuid import UUID
 
-import cohere
-from dotenv import load_dotenv
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
 from vector_store.app.constants import EMBEDDING_DIM
 from vector_store.app.db.index_factory import IndexFactory
+from vector_store.app.db.index_manager import IndexManager
 from vector_store.app.db.repositories.chunk_repo import ChunkRepository
 from vector_store.app.db.repositories.document_repo import DocumentRepository
 from vector_store.app.db.repositories.library_repo import LibraryRepository
-from vector_store.app.db.repositories.lsh_index_repo import LSHIndexRepository
+from vector_store.app.db.vector_segment import get_segment
 from vector_store.app.models.library import LibraryCreate, LibraryUpdate
 
-load_dotenv()
-cohere_client = cohere.Client(os.environ["COHERE_API_KEY"])
-
 logger = logging.getLogger(__name__)
 
 
@@ -31,15 +26,38 @@ class LibraryStoreService:
         self.library_repo = LibraryRepository(db)
         self.document_repo = DocumentRepository(db)
         self.chunk_repo = ChunkRepository(db)
-        self.lsh_repo = LSHIndexRepository(db)
+        self.index_manager = IndexManager(db)
 
     # Library Methods
     def create_library(self, data: LibraryCreate):
+        # Validate the index configuration before creating anything
+        try:
+            IndexFactory.create(
+                data.index_type,
+                dim=EMBEDDING_DIM,
+                compression=data.compression,
+                vector_dtype=data.vector_dtype,
+                **(data.index_params or {}),
+            )
+        except (TypeError, ValueError) as err:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid index configuration: {err}"
+            ) from err
+
         # Create the library in the database
         library = self.library_repo.create(data)
 
+        # The segment stores vectors with the library's type from the start
+        get_segment(library.id, data.vector_dtype)
+
         # Create and persist the index according to library configuration
-        self._create_and_persist_index(library.id, data.index_type)
+        self.index_manager.create(
+            library.id,
+            data.index_type,
+            data.index_params,
+            data.compression,
+            data.vector_dtype,
+        )
 
         return library
 
@@ -54,8 +72,13 @@ class LibraryStoreService:
         if not library:
             raise HTTPException(status_code=404, detail="Library not found")
 
-        # Delete persistent index if exists
-        self._delete_index(library_id, library.index_type)
+        # Delete persistent index if exists, then the chunks in bulk
+        self.index_manager.drop(library_id, library.index_type, library.compression)
+        self.chunk_repo.delete_by_library(library_id)
+        # Other workers must see the change before the segment disappears
+        self.index_manager.invalidate(library_id)
+        self.chunk_repo.drop_embeddings(library_id)
+        self.document_repo.delete_by_library(library_id)
 
         return self.library_repo.delete(library_id)
 
@@ -64,25 +87,24 @@ class LibraryStoreService:
         if not library:
             raise HTTPException(status_code=404, detail="Library not found")
 
-        # If index type is changing, handle index migration
+        # If index type is changing, rebuild the index from the stored vectors
         if data.index_type and data.index_type != library.index_type:
-            self._delete_index(library_id, library.index_type)
-            self._create_and_persist_index(library_id, data.index_type)
+            try:
+                IndexFactory.create(
+                    data.index_type,
+                    dim=EMBEDDING_DIM,
+                    compression=library.compression,
+                    vector_dtype=library.vector_dtype,
+                    **(library.index_params or {}),
+                )
+            except (TypeError, ValueError) as err:
+                raise HTTPException(
+                    status_code=400, detail=f"Invalid index configuration: {err}"
+                ) from err
+            self.index_manager.drop(library_id, library.index_type, library.compression)
+            library = self.library_repo.update(library_id, data)
+            self.index_manager.get(library)
+            self.index_manager.invalidate(library_id)
+            return library
 
         return self.library_repo.update(library_id, data)
-
-    # Index management helper methods
-    def _create_and_persist_index(self, library_id: UUID, index_type: str):
-        """Create a new index and persist it if needed"""
-        index = IndexFactory.create(index_type, dim=EMBEDDING_DIM)
-
-        # Persist LSH indices
-        if index_type == "lsh":
-            self.lsh_repo.save(library_id, index)
-
-        return index
-
-    def _delete_index(self, library_id: UUID, index_type: str):
-        """Delete an index if it's persistent"""
-        if index_type == "lsh":
-            self.lsh_repo.delete(library_id)
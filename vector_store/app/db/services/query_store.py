@@ -1,49 +1,56 @@
 import logging
-import os
 from uuid import UUID
 
-import cohere
-from dotenv import load_dotenv
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from vector_store.app.constants import EMBEDDING_DIM
-from vector_store.app.db.index_factory import IndexFactory
+from vector_store.app.db import library_epoch
+from vector_store.app.db.cache import query_cache
+from vector_store.app.db.embedding_pipeline import get_embedding_pipeline
+from vector_store.app.db.executor import run_in_session
+from vector_store.app.db.index_manager import IndexManager
 from vector_store.app.db.lsh_index import LSHIndex
+from vector_store.app.db.models.chunk import Chunk
+from vector_store.app.db.models.library import Library
+from vector_store.app.db.query_stats import query_stats
 from vector_store.app.db.repositories.chunk_repo import ChunkRepository
-from vector_store.app.db.repositories.document_repo import DocumentRepository
 from vector_store.app.db.repositories.library_repo import LibraryRepository
-from vector_store.app.db.repositories.lsh_index_repo import LSHIndexRepository
-from vector_store.app.db.services.chunk_store import ChunkStoreService
 from vector_store.app.models.query import QueryRequest, QueryResult
 
-load_dotenv()
-cohere_client = cohere.Client(os.environ["COHERE_API_KEY"])
-
 logger = logging.getLogger(__name__)
 
 
 class QueryStoreService:
-    def __init__(self, db: Session):
+    """
+    Async query path. Library and chunk reads go through the request's
+    AsyncSession and text queries are embedded without holding a thread. Only
+    the index search runs on the bounded search executor, with its own session.
+    """
+
+    def __init__(self, db: AsyncSession):
         self.db = db
-        self.library_repo = LibraryRepository(db)
-        self.document_repo = DocumentRepository(db)
-        self.chunk_repo = ChunkRepository(db)
-        self.lsh_repo = LSHIndexRepository(db)
-        self.chunk_service = ChunkStoreService(self.db)
 
     # Query
-    def query_chunks(self, library_id: UUID, query: QueryRequest) -> list[QueryResult]:
+    async def query_chunks(
+        self, library_id: UUID, query: QueryRequest
+    ) -> list[QueryResult]:
         # 1. Get the library or raise a 404 if it does not exist
-        library = self.library_repo.get(library_id)
-        if not library:
-            raise HTTPException(status_code=404, detail="Library not found")
+        library = await self._get_library(library_id)
+        query_stats.record(library_id)
 
-        # 2. Get or build the index for the library
-        index = self._get_or_build_index(library_id, library.index_type)
+        # 2. Serve repeated queries from the library's result cache, unless
+        # another worker changed the library since. Checked without touching
+        # the disk, results are only cached once a search opened the segment.
+        library_epoch.check(library_id)
+        version = query_cache.version(library_id)
+        key = query_cache.key(query.text, query.embedding, query.k, query.filters)
+        cached = query_cache.get(library_id, version, key)
+        if cached is not None:
+            return cached
 
         # 3. Use the provided embedding or generate one from text
-        embedding = query.embedding or self._generate_query_embedding(query)
+        embedding = query.embedding or await self._generate_query_embedding(query)
 
         # 4. Validate that the embedding has the correct dimensionality
         if len(embedding) != EMBEDDING_DIM:
@@ -52,93 +59,216 @@ class QueryStoreService:
                 detail=f"Embedding must have dimension {EMBEDDING_DIM}, but got {len(embedding)}",
             )
 
-        # 5. Perform the similarity search
-        try:
-            results = index.search(embedding, query.k)
+        # 4a. In approximate mode, reuse the results of a near-duplicate query
+        cached = query_cache.get_similar(library_id, version, key, embedding)
+        if cached is not None:
+            return cached
 
-            # 5a. If no results and using LSH, fallback to brute force
-            if not results and isinstance(index, LSHIndex):
-                logger.info(
-                    "LSH search returned no results, falling back to brute force"
+        # 5. Perform the similarity search, restricted to the filtered chunks
+        results = (
+            await self._run_search(
+                lambda db: self._search(
+                    IndexManager(db), library, [embedding], query.k, query.filters
                 )
-                results = self._fallback_bruteforce(library_id, embedding, query.k)
+            )
+        )[0]
 
-        except ValueError as err:
+        # 6. Build, cache and return the final query result list
+        chunks = await self._get_chunks([chunk_id for chunk_id, _ in results])
+        output = self._build_query_results(results, chunks)
+        query_cache.put(library_id, version, key, embedding, output)
+        return output
+
+    async def query_chunks_batch(
+        self, library_id: UUID, queries: list[QueryRequest]
+    ) -> list[list[QueryResult]]:
+        library = await self._get_library(library_id)
+        if not queries:
+            return []
+        query_stats.record(library_id, len(queries))
+
+        # Only the queries missing from the result cache are searched
+        library_epoch.check(library_id)
+        version = query_cache.version(library_id)
+        keys = [
+            query_cache.key(query.text, query.embedding, query.k, query.filters)
+            for query in queries
+        ]
+        output = [query_cache.get(library_id, version, key) for key in keys]
+        pending = [i for i, cached in enumerate(output) if cached is None]
+        if pending:
+            embeddings, results = await self._search_batch(
+                library, [queries[i] for i in pending]
+            )
+            for i, embedding, result in zip(pending, embeddings, results, strict=True):
+                output[i] = result
+                query_cache.put(library_id, version, keys[i], embedding, result)
+        return output
+
+    async def _search_batch(
+        self, library: Library, queries: list[QueryRequest]
+    ) -> tuple[list[list[float]], list[list[QueryResult]]]:
+        """Embeddings and results of ``queries``, bypassing the result cache."""
+        # Embed all text-only queries with as few provider calls as possible
+        embeddings = [query.embedding for query in queries]
+        to_embed = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if to_embed:
+            generated = await self._generate_query_embeddings(
+                [queries[i].text for i in to_embed]
+            )
+            for i, embedding in zip(to_embed, generated, strict=True):
+                embeddings[i] = embedding
+
+        bad = [
+            i
+            for i, embedding in enumerate(embeddings)
+            if len(embedding) != EMBEDDING_DIM
+        ]
+        if bad:
             raise HTTPException(
-                status_code=400, detail=f"Error during similarity search: {str(err)}"
-            ) from err
+                status_code=400,
+                detail=f"Embeddings must have dimension {EMBEDDING_DIM}, invalid queries at positions {bad}",
+            )
 
-        # 6. Build and return the final query result list
-        return self._build_query_results(results)
+        # Score queries sharing the same filters together with the largest k,
+        # then trim per query
+        groups: dict[tuple, list[int]] = {}
+        for i, query in enumerate(queries):
+            groups.setdefault(tuple(sorted((query.filters or {}).items())), []).append(
+                i
+            )
 
-    # Index management helper methods
-    def _get_or_build_index(self, library_id: UUID, index_type: str):
-        """Get existing index or build a new one from chunks"""
-        # For LSH indices, try to get from repository first
-        if index_type == "lsh":
-            index = self.lsh_repo.get(library_id)
-            if index:
-                return index
+        def search(db) -> list[list[tuple[UUID, float]]]:
+            index_manager = IndexManager(db)
+            results: list[list[tuple[UUID, float]]] = [[] for _ in queries]
+            for filters, positions in groups.items():
+                group_results = self._search(
+                    index_manager,
+                    library,
+                    [embeddings[i] for i in positions],
+                    max(queries[i].k for i in positions),
+                    dict(filters),
+                )
+                for i, result in zip(positions, group_results, strict=True):
+                    results[i] = result
+            return results
 
-        # Create a new index
-        index = IndexFactory.create(index_type=index_type, dim=EMBEDDING_DIM)
+        results = await self._run_search(search)
 
-        # Populate with all chunks for this library
-        chunks = self.chunk_repo.list_by_library(library_id)
-        for chunk in chunks:
-            index.add(chunk.id, chunk.embedding)
+        # Fetch the chunks of every query at once
+        chunks = await self._get_chunks(
+            list({chunk_id for result in results for chunk_id, _ in result})
+        )
+        return embeddings, [
+            self._build_query_results(result[: query.k], chunks)
+            for query, result in zip(queries, results, strict=True)
+        ]
 
-        # Persist LSH indices
-        if index_type == "lsh":
-            self.lsh_repo.save(library_id, index)
+    def _search(
+        self,
+        index_manager: IndexManager,
+        library: Library,
+        embeddings: list[list[float]],
+        k: int,
+        filters: dict[str, str] | None,
+    ) -> list[list[tuple[UUID, float]]]:
+        """Top-k of each embedding, run on the search executor."""
+        index = index_manager.get(library)
+        if filters:
+            results = index_manager.search_filtered(library, embeddings, k, filters)
+        else:
+            results = index.search_batch(embeddings, k)
 
-        return index
+        # If no results and using LSH, fallback to brute force
+        if isinstance(index, LSHIndex):
+            missed = [i for i, result in enumerate(results) if not result]
+            if missed:
+                logger.info(
+                    "LSH search returned no results for %d queries, falling back to brute force",
+                    len(missed),
+                )
+                fallback = self._fallback_bruteforce_batch(
+                    index_manager,
+                    library,
+                    [embeddings[i] for i in missed],
+                    k,
+                    filters,
+                )
+                for i, result in zip(missed, fallback, strict=True):
+                    results[i] = result
+        return results
+
+    async def _run_search(self, fn):
+        try:
+            return await run_in_session(fn)
+        except ValueError as err:
+            raise HTTPException(
+                status_code=400, detail=f"Error during similarity search: {str(err)}"
+            ) from err
+
+    async def _get_library(self, library_id: UUID) -> Library:
+        library = await self.db.run_sync(
+            lambda db: LibraryRepository(db).get(library_id)
+        )
+        if not library:
+            raise HTTPException(status_code=404, detail="Library not found")
+        return library
+
+    async def _get_chunks(self, chunk_ids: list[UUID]) -> dict[str, Chunk]:
+        """Chunks by id string, the cache misses fetched with a few IN queries."""
+        return await self.db.run_sync(
+            lambda db: ChunkRepository(db).get_many(chunk_ids)
+        )
 
     def _build_query_results(
-        self, results: list[tuple[UUID, float]]
+        self, results: list[tuple[UUID, float]], chunks: dict[str, Chunk]
     ) -> list[QueryResult]:
+        """
+        Hydrate (chunk_id, score) pairs with their chunks, looked up in
+        ``chunks``. Chunks deleted meanwhile are skipped.
+        """
         output = []
         for chunk_id, score in results:
-            chunk = self.chunk_service.get_chunk(chunk_id)
-            if not chunk:
+            chunk = chunks.get(str(chunk_id))
+            if chunk is None:
                 continue
             output.append(
                 QueryResult(
                     chunk_id=chunk.id,
                     document_id=chunk.document_id,
-                    score=min(score, 1.0),
+                    score=min(max(score, 0.0), 1.0),
                     text=chunk.text,
                     meta=chunk.meta,
                 )
             )
         return output
 
-    def _fallback_bruteforce(
-        self, library_id: UUID, embedding: list[float], k: int
-    ) -> list[tuple[UUID, float]]:
-        """Create a brute force index from all chunks in the library and search"""
-        chunks = self.chunk_repo.list_by_library(library_id)
-        brute = IndexFactory.create("bruteforce", dim=EMBEDDING_DIM)
-        for chunk in chunks:
-            brute.add(chunk.id, chunk.embedding)
-        return brute.search(embedding, k)
+    def _fallback_bruteforce_batch(
+        self,
+        index_manager: IndexManager,
+        library: Library,
+        embeddings: list[list[float]],
+        k: int,
+        filters: dict[str, str] | None = None,
+    ) -> list[list[tuple[UUID, float]]]:
+        """Search the library's resident exact index, scored like its index"""
+        allowed = index_manager.metadata(library).match(filters) if filters else None
+        return index_manager.search_exact(library, embeddings, k, allowed)
 
     # Embedding helper methods
-    def _generate_query_embedding(self, query: QueryRequest) -> list[float]:
+    async def _generate_query_embedding(self, query: QueryRequest) -> list[float]:
         if not query.text:
             raise HTTPException(
                 status_code=400,
                 detail="Either 'embedding' or 'text' must be provided",
             )
+        return (await self._generate_query_embeddings([query.text]))[0]
+
+    async def _generate_query_embeddings(self, texts: list[str]) -> list[list[float]]:
         try:
-            response = cohere_client.embed(
-                texts=[query.text],
-                input_type="search_query",
-                model="embed-english-v3.0",
-            )
-            return response.embeddings[0]
+            return await get_embedding_pipeline().aembed(texts, "search_query")
         except Exception as err:
-            logger.exception("Error generating embedding with Cohere")
+            logger.exception("Error generating embeddings")
             raise HTTPException(
-                status_code=500, detail="Failed to generate embedding"
+                status_code=500, detail="Failed to generate embeddings"
             ) from err
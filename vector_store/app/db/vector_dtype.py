@@ -0,0 +1,36 @@
+import numpy as np
+
+# Storage types of a library's vectors, in memory and in its segment
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+INT8_MAX = 127
+
+
+def check_dtype(dtype: str) -> np.dtype:
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"Unsupported vector dtype: {dtype}")
+    return np.dtype(dtype)
+
+
+def encode(vectors, dtype: np.dtype) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    Rows of ``vectors`` stored as ``dtype``, plus their float32 scales for int8.
+
+    int8 is symmetric scalar quantization per row: ``code = round(x / scale)``
+    with ``scale = max|x| / 127``. Float types are a plain cast, which doesn't
+    copy when the input already has that type.
+    """
+    if dtype != np.int8:
+        return np.asarray(vectors, dtype=dtype), None
+    data = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(data).max(axis=-1, keepdims=True) / INT8_MAX
+    scales[scales == 0] = 1.0
+    codes = np.rint(data / scales).clip(-INT8_MAX, INT8_MAX).astype(np.int8)
+    return codes, scales[..., 0]
+
+
+def decode(data: np.ndarray, scales: np.ndarray | None = None) -> np.ndarray:
+    """float32 rows of stored vectors, so products accumulate in float32."""
+    if scales is None:
+        return np.asarray(data, dtype=np.float32)
+    return data.astype(np.float32) * np.asarray(scales, dtype=np.float32)[..., None]
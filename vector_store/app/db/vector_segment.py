@@ -0,0 +1,405 @@
+import fcntl
+import heapq
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from uuid import UUID
+
+import numpy as np
+
+from vector_store.app.constants import EMBEDDING_DIM, SEGMENTS_DIR, VECTOR_DTYPE
+from vector_store.app.db.vector_dtype import decode, encode
+
+SEGMENT_MAGIC = b"VSEG"
+SEGMENT_VERSION = 1
+SEGMENT_DTYPES = {"float32": 0, "float16": 1, "int8": 2}
+INITIAL_CAPACITY = 64
+
+# Fixed 64 byte header at the start of every ``.vec`` file
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "S4"),
+        ("version", "<u2"),
+        ("dtype", "<u2"),
+        ("dim", "<u4"),
+        ("count", "<u4"),
+        ("generation", "<u8"),  # Bumped by every write of rows or ids
+        ("epoch", "<u8"),  # Bumped by every change of the library, see bump_epoch
+        ("reserved", "V32"),
+    ]
+)
+ID_BYTES = 16
+
+
+class VectorSegment:
+    """
+    Fixed-width vector storage memory-mapped with NumPy.
+
+    A segment is two files:
+    - ``<name>.vec``: a 64 byte header followed by ``capacity`` rows of ``dim``
+      float32, float16 or int8 values.
+    - ``<name>.ids``: the 16 byte UUID of every row. Freed rows are all zeros
+      and are reused by later inserts.
+    - ``<name>.scl``: int8 segments only, the float32 scale of every row.
+    - ``<name>.lock``: held by the process writing the segment.
+
+    Float reads return views into the mapping, so they never copy or parse
+    floats. int8 rows are decoded to float32 on read.
+
+    The files are mapped shared, so the worker processes of a server all read
+    the same pages. Writers hold an ``flock`` on ``<name>.lock`` and bump the
+    header's ``generation``; a process seeing a new generation remaps the
+    files and reloads its row map before using them.
+    """
+
+    def __init__(self, path: Path, dim: int = EMBEDDING_DIM, dtype: str = VECTOR_DTYPE):
+        self.path = Path(path)
+        self.vec_path = self.path.with_suffix(".vec")
+        self.ids_path = self.path.with_suffix(".ids")
+        self.scl_path = self.path.with_suffix(".scl")
+        self.lock_path = self.path.with_suffix(".lock")
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+
+        if self.vec_path.exists():
+            header = np.fromfile(self.vec_path, dtype=HEADER_DTYPE, count=1)[0]
+            if header["magic"] != SEGMENT_MAGIC:
+                raise ValueError(f"Not a vector segment: {self.vec_path}")
+            codes = {code: name for name, code in SEGMENT_DTYPES.items()}
+            self.dim = int(header["dim"])
+            self.dtype = np.dtype(codes[int(header["dtype"])])
+        else:
+            if dtype not in SEGMENT_DTYPES:
+                raise ValueError(f"Unsupported segment dtype: {dtype}")
+            self.dim = dim
+            self.dtype = np.dtype(dtype)
+            self._create()
+
+        self.lock_path.touch()
+        self._lock_file = open(self.lock_path, "rb")
+        self._generation: int | None = None
+        with self.locked():
+            pass  # Maps the files and loads the rows
+
+    def _load_rows(self) -> None:
+        self.rows: dict[UUID, int] = {}
+        self._free: list[int] = []
+        count = int(self._header["count"])
+        for row in range(count):
+            raw = self._ids[row].tobytes()
+            if any(raw):
+                self.rows[UUID(bytes=raw)] = row
+            else:
+                self._free.append(row)
+        heapq.heapify(self._free)
+        self._generation = int(self._header["generation"])
+
+    # Multi-process access
+    @contextmanager
+    def locked(self):
+        """
+        Exclusive access to the segment, across threads and processes. The
+        row map is brought up to date with other processes' writes on entry.
+        """
+        with self._lock:
+            if self._lock_depth == 0:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                if self._lock_depth == 1:
+                    self._sync()
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _sync(self) -> None:
+        if (
+            self._generation is None
+            or int(self._header["generation"]) != self._generation
+        ):
+            # Another process wrote rows, possibly after growing the files
+            self._map()
+            self._load_rows()
+
+    def _refresh(self) -> None:
+        """Catch up with other processes' writes before a read."""
+        if int(self._header["generation"]) != self._generation:
+            with self.locked():
+                pass
+
+    def _written(self) -> None:
+        self._generation += 1
+        self._header["generation"] = self._generation
+
+    @property
+    def epoch(self) -> int:
+        return int(self._header["epoch"])
+
+    def bump_epoch(self) -> int:
+        """
+        Mark a change of the library stored in this segment, vectors or not,
+        for every process caching state derived from it (see ``library_epoch``).
+        """
+        with self.locked():
+            epoch = self.epoch + 1
+            self._header["epoch"] = epoch
+            self._header.flush()
+            return epoch
+
+    # File management
+    def _create(self) -> None:
+        self.vec_path.parent.mkdir(parents=True, exist_ok=True)
+        header = np.zeros((), dtype=HEADER_DTYPE)
+        header["magic"] = SEGMENT_MAGIC
+        header["version"] = SEGMENT_VERSION
+        header["dtype"] = SEGMENT_DTYPES[self.dtype.name]
+        header["dim"] = self.dim
+        with open(self.vec_path, "wb") as f:
+            f.write(header.tobytes())
+            f.truncate(HEADER_DTYPE.itemsize + INITIAL_CAPACITY * self._row_bytes)
+        with open(self.ids_path, "wb") as f:
+            f.truncate(INITIAL_CAPACITY * ID_BYTES)
+        if self._quantized:
+            with open(self.scl_path, "wb") as f:
+                f.truncate(INITIAL_CAPACITY * np.dtype(np.float32).itemsize)
+
+    @property
+    def _quantized(self) -> bool:
+        return self.dtype == np.int8
+
+    @property
+    def _row_bytes(self) -> int:
+        return self.dim * self.dtype.itemsize
+
+    def _map(self) -> None:
+        # Called with the segment locked, so the files are not growing meanwhile
+        capacity = (
+            os.path.getsize(self.vec_path) - HEADER_DTYPE.itemsize
+        ) // self._row_bytes
+        self._header = np.memmap(self.vec_path, dtype=HEADER_DTYPE, mode="r+", shape=())
+        self._data = np.memmap(
+            self.vec_path,
+            dtype=self.dtype,
+            mode="r+",
+            offset=HEADER_DTYPE.itemsize,
+            shape=(capacity, self.dim),
+        )
+        self._ids = np.memmap(
+            self.ids_path, dtype=np.uint8, mode="r+", shape=(capacity, ID_BYTES)
+        )
+        self._scales = None
+        if self._quantized:
+            self._scales = np.memmap(
+                self.scl_path, dtype=np.float32, mode="r+", shape=(capacity,)
+            )
+
+    @property
+    def capacity(self) -> int:
+        return self._data.shape[0]
+
+    def _grow(self, capacity: int) -> None:
+        new_capacity = max(self.capacity, INITIAL_CAPACITY)
+        while new_capacity < capacity:
+            new_capacity *= 2
+        self.flush()
+        # Views handed out earlier keep the old mapping alive, files only grow
+        os.truncate(
+            self.vec_path, HEADER_DTYPE.itemsize + new_capacity * self._row_bytes
+        )
+        os.truncate(self.ids_path, new_capacity * ID_BYTES)
+        if self._quantized:
+            os.truncate(self.scl_path, new_capacity * np.dtype(np.float32).itemsize)
+        self._map()
+
+    def flush(self) -> None:
+        self._header.flush()
+        self._data.flush()
+        self._ids.flush()
+        if self._scales is not None:
+            self._scales.flush()
+
+    def destroy(self) -> None:
+        """Delete the segment files."""
+        with self.locked():
+            self.rows.clear()
+            self._free.clear()
+            self.vec_path.unlink(missing_ok=True)
+            self.ids_path.unlink(missing_ok=True)
+            self.scl_path.unlink(missing_ok=True)
+            self.lock_path.unlink(missing_ok=True)
+
+    # Vector access
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self.rows)
+
+    def __contains__(self, vector_id: UUID) -> bool:
+        self._refresh()
+        return vector_id in self.rows
+
+    def get(self, vector_id: UUID) -> np.ndarray | None:
+        self._refresh()
+        row = self.rows.get(vector_id)
+        if row is None:
+            return None
+        return self._read(row)
+
+    def get_many(self, vector_ids: list[UUID]) -> tuple[list[UUID], np.ndarray]:
+        """
+        The ids of ``vector_ids`` found in the segment and their vectors, as one
+        float32 matrix gathered in a single read.
+        """
+        self._refresh()
+        found = [
+            (vector_id, row)
+            for vector_id in vector_ids
+            if (row := self.rows.get(vector_id)) is not None
+        ]
+        if not found:
+            return [], np.empty((0, self.dim), dtype=np.float32)
+        ids = [vector_id for vector_id, _ in found]
+        rows = np.fromiter((row for _, row in found), dtype=np.intp, count=len(found))
+        return ids, np.asarray(self._read(rows), dtype=np.float32)
+
+    def _read(self, rows) -> np.ndarray:
+        if self._quantized:
+            return decode(self._data[rows], self._scales[rows])
+        return self._data[rows]
+
+    def items(self) -> tuple[list[UUID], np.ndarray]:
+        """
+        Ids and vectors of every live row. The matrix is a view of the mapping
+        when the segment has no freed rows, otherwise a single gathered copy
+        (always a decoded copy for int8).
+        """
+        with self.locked():
+            ids, rows = self._live_rows()
+            return ids, self._read(rows)
+
+    def codes(self) -> tuple[list[UUID], np.ndarray, np.ndarray | None]:
+        """
+        Ids, stored values and int8 scales of every live row, not decoded.
+        Views of the mapping when the segment has no freed rows, so indexes can
+        serve them in place (see ``BruteForceIndex.attach``).
+        """
+        with self.locked():
+            ids, rows = self._live_rows()
+            scales = None if self._scales is None else self._scales[rows]
+            return ids, self._data[rows], scales
+
+    def _live_rows(self) -> tuple[list[UUID], slice | np.ndarray]:
+        ordered = sorted(self.rows.items(), key=lambda item: item[1])
+        ids = [vector_id for vector_id, _ in ordered]
+        if not self._free:
+            return ids, slice(0, len(ids))
+        return ids, np.fromiter((row for _, row in ordered), dtype=np.intp)
+
+    def put(self, vector_id: UUID, vector: list[float]) -> None:
+        self.put_many([vector_id], [vector])
+
+    def put_many(self, vector_ids: list[UUID], vectors: list[list[float]]) -> None:
+        """Insert new vectors or overwrite existing ones in place."""
+        vectors, scales = encode(
+            np.asarray(vectors).reshape(len(vector_ids), -1), self.dtype
+        )
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}")
+
+        with self.locked():
+            rows = np.empty(len(vector_ids), dtype=np.intp)
+            count = int(self._header["count"])
+            for i, vector_id in enumerate(vector_ids):
+                row = self.rows.get(vector_id)
+                if row is None:
+                    if self._free:
+                        row = heapq.heappop(self._free)
+                    else:
+                        row = count
+                        count += 1
+                    if row >= self.capacity:
+                        self._grow(row + 1)
+                    self._ids[row] = np.frombuffer(vector_id.bytes, dtype=np.uint8)
+                    self.rows[vector_id] = row
+                rows[i] = row
+
+            self._data[rows] = vectors
+            if scales is not None:
+                self._scales[rows] = scales
+            self._header["count"] = count
+            self._written()
+            self.flush()
+
+    def delete(self, vector_id: UUID) -> bool:
+        return self.delete_many([vector_id]) > 0
+
+    def delete_many(self, vector_ids: list[UUID]) -> int:
+        with self.locked():
+            deleted = 0
+            for vector_id in vector_ids:
+                row = self.rows.pop(vector_id, None)
+                if row is None:
+                    continue
+                self._ids[row] = 0
+                heapq.heappush(self._free, row)
+                deleted += 1
+            if deleted:
+                self._written()
+                self._ids.flush()
+                self._header.flush()
+            return deleted
+
+
+_segments: dict[str, VectorSegment] = {}
+_segments_lock = threading.Lock()
+
+
+def get_segment(library_id: UUID, dtype: str | None = None) -> VectorSegment:
+    """
+    Open (or create) the vector segment of a library, shared per process.
+    ``dtype`` only applies when the segment is created, an existing segment
+    keeps the type in its header.
+    """
+    key = str(library_id)
+    with _segments_lock:
+        segment = _segments.get(key)
+        if segment is None:
+            segment = VectorSegment(SEGMENTS_DIR / key, dtype=dtype or VECTOR_DTYPE)
+            _segments[key] = segment
+        return segment
+
+
+def find_segment(library_id: UUID) -> VectorSegment | None:
+    """The vector segment of a library if it exists, without creating it."""
+    key = str(library_id)
+    with _segments_lock:
+        segment = _segments.get(key)
+        if segment is None and (SEGMENTS_DIR / f"{key}.vec").exists():
+            segment = VectorSegment(SEGMENTS_DIR / key)
+            _segments[key] = segment
+        return segment
+
+
+def open_segment(library_id: UUID) -> VectorSegment | None:
+    """The vector segment of a library if this process has it open, no disk access."""
+    with _segments_lock:
+        return _segments.get(str(library_id))
+
+
+def release_segment(library_id: UUID) -> None:
+    """Forget the open segment of a library, e.g. deleted by another process."""
+    with _segments_lock:
+        _segments.pop(str(library_id), None)
+
+
+def drop_segment(library_id: UUID) -> None:
+    """Delete the vector segment of a library."""
+    key = str(library_id)
+    with _segments_lock:
+        segment = _segments.pop(key, None)
+    if segment is None and (SEGMENTS_DIR / f"{key}.vec").exists():
+        segment = VectorSegment(SEGMENTS_DIR / key)
+    if segment is not None:
+        segment.destroy()
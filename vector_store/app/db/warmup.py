@@ -0,0 +1,95 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from uuid import UUID
+
+from vector_store.app.constants import WARMUP_LIBRARIES, WARMUP_WORKERS
+from vector_store.app.db.database import SessionLocal
+from vector_store.app.db.index_manager import IndexManager
+from vector_store.app.db.query_stats import query_stats
+from vector_store.app.db.repositories.library_repo import LibraryRepository
+
+logger = logging.getLogger(__name__)
+
+
+class IndexWarmup:
+    """
+    Loads the indexes of the most queried libraries (see ``QueryStats``) in the
+    background at startup, ``workers`` at a time, so their first queries don't
+    pay for it. Other libraries are still loaded on first use.
+
+    ``state`` maps every library picked to "pending", "loading", "ready" or
+    "failed". The process is ready once each of them is done, failed ones
+    included: they are loaded again by the first query that needs them. The
+    warm-up threads update it under a lock, read it through ``snapshot``.
+    """
+
+    def __init__(self, libraries: int | None = None, workers: int = WARMUP_WORKERS):
+        if libraries is None:
+            libraries = int(os.environ.get("WARMUP_LIBRARIES", WARMUP_LIBRARIES))
+        self.libraries = libraries
+        self.workers = workers
+        self.state: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def snapshot(self) -> dict[str, str]:
+        """Copy of ``state``, consistent while the warm-up threads update it."""
+        with self._lock:
+            return dict(self.state)
+
+    def _set(self, library_id: str, status: str | None) -> None:
+        with self._lock:
+            if status is None:
+                self.state.pop(library_id, None)
+            else:
+                self.state[library_id] = status
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self.run, name="index-warmup", daemon=True
+        )
+        self._thread.start()
+
+    def run(self) -> None:
+        """Warm the hottest libraries and return once they are all done."""
+        try:
+            library_ids = query_stats.hottest(self.libraries) if self.libraries else []
+            with self._lock:
+                self.state.update(dict.fromkeys(library_ids, "pending"))
+            if library_ids:
+                logger.info("Warming up %d library indexes", len(library_ids))
+                with ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="warmup"
+                ) as pool:
+                    list(pool.map(self._warm, library_ids))
+        finally:
+            self._done.set()
+
+    def _warm(self, library_id: str) -> None:
+        self._set(library_id, "loading")
+        try:
+            with SessionLocal() as db:
+                library = LibraryRepository(db).get(UUID(library_id))
+                if library is None:
+                    # Deleted since it was last queried
+                    self._set(library_id, None)
+                    return
+                index_manager = IndexManager(db)
+                index_manager.get(library)
+                index_manager.metadata(library)
+            self._set(library_id, "ready")
+        except Exception:
+            logger.exception("Failed to warm up the index of library %s", library_id)
+            self._set(library_id, "failed")
+
+
+index_warmup = IndexWarmup()
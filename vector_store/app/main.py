@@ -1,9 +1,20 @@
 import logging
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 
 from vector_store.app.api import chunks, documents, libraries, query
+from vector_store.app.db.cache import (
+    exact_index_cache,
+    index_cache,
+    metadata_index_cache,
+    query_cache,
+)
 from vector_store.app.db.database import init_db
+from vector_store.app.db.embedding_pipeline import get_embedding_pipeline
+from vector_store.app.db.index_compactor import index_compactor
+from vector_store.app.db.query_stats import query_stats
+from vector_store.app.db.warmup import index_warmup
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +25,18 @@ app = FastAPI(title="Vector Store API")
 @app.on_event("startup")
 def startup_event():
     init_db()
+    # Fold what the last run logged before serving, then keep folding
+    index_compactor.run_once()
+    index_compactor.start()
+    # Load the most queried indexes in the background, /readyz waits for them
+    index_warmup.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    index_compactor.stop()
+    index_compactor.run_once()
+    query_stats.flush()
 
 
 # Rutas
@@ -21,9 +44,48 @@ app.include_router(libraries.router)
 app.include_router(documents.router)
 app.include_router(chunks.router)
 app.include_router(chunks.router2)
+app.include_router(chunks.router3)
 app.include_router(query.router)
 
 
 @app.get("/")
-def root():
+async def root():
     return {"message": "Welcome to the Vector Store API"}
+
+
+@app.get("/embeddings/cache")
+async def embedding_cache_stats():
+    """Hit/miss counters of the embedding cache."""
+    return get_embedding_pipeline().cache.stats()
+
+
+@app.get("/queries/cache")
+async def query_cache_stats():
+    """Hit/miss counters of the query result cache."""
+    return query_cache.stats()
+
+
+@app.get("/indexes/cache")
+async def index_cache_stats():
+    """Memory, hits, loads, evictions and spills of the resident indexes."""
+    return {
+        **index_cache.stats(),
+        "exact": exact_index_cache.stats(),
+        "metadata": metadata_index_cache.stats(),
+    }
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process serves requests, warmed up or not."""
+    return {"status": "ok", "libraries": index_warmup.snapshot()}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness of the worker answering: 503 until its warm-up is done."""
+    status = "ready" if index_warmup.ready else "warming_up"
+    return JSONResponse(
+        {"status": status, "libraries": index_warmup.snapshot()},
+        status_code=200 if index_warmup.ready else 503,
+    )
@@ -16,6 +16,10 @@ class ChunkCreate(ChunkBase):
     pass
 
 
+class LibraryChunkCreate(ChunkCreate):
+    document_id: UUID
+
+
 class ChunkUpdate(BaseModel):
     text: str | None = None
     embedding: list[float] | None = None
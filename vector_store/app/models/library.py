@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Any
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -10,6 +11,13 @@ class LibraryBase(BaseModel):
         None, example="Frequently asked questions from the support chatbot"
     )
     index_type: str = "lsh"
+    index_params: dict[str, Any] | None = Field(
+        None, example={"M": 16, "ef_construction": 200, "ef_search": 64}
+    )
+    # Product quantization ("pq" or "opq") for the bruteforce and ivf indexes
+    compression: str | None = Field(None, example="pq")
+    # Storage type of the vectors: "float32", "float16" or "int8"
+    vector_dtype: str = Field("float32", example="float16")
 
 
 class LibraryCreate(LibraryBase):
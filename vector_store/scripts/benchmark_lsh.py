@@ -0,0 +1,90 @@
+"""
+Recall/latency benchmark of the LSH index over a parameter grid.
+
+Runs on the vector segment of a library, or on synthetic clustered vectors:
+
+    python -m vector_store.scripts.benchmark_lsh --library <LIBRARY_ID>
+    python -m vector_store.scripts.benchmark_lsh --synthetic 20000 --dim 256
+"""
+
+import argparse
+from uuid import UUID
+
+import numpy as np
+
+from vector_store.app.constants import (
+    LSH_PROJECTION,
+    LSH_TUNING_HASHES,
+    LSH_TUNING_K,
+    LSH_TUNING_PROBES,
+    LSH_TUNING_SAMPLE_SIZE,
+    LSH_TUNING_TABLES,
+    LSH_TUNING_TARGET_RECALL,
+)
+from vector_store.app.db.lsh_tuner import benchmark, select
+from vector_store.app.db.vector_segment import find_segment
+
+
+def _ints(value: str) -> tuple[int, ...]:
+    return tuple(int(item) for item in value.split(","))
+
+
+def synthetic(size: int, dim: int, seed: int | None) -> np.ndarray:
+    """Gaussian clusters, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, size // 100), dim))
+    labels = rng.integers(0, len(centers), size)
+    return (centers[labels] + 0.8 * rng.normal(size=(size, dim))).astype(np.float32)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--library", type=UUID, help="Benchmark a library's vectors")
+    source.add_argument("--synthetic", type=int, metavar="N", help="N random vectors")
+    parser.add_argument("--dim", type=int, default=1024, help="Synthetic dimension")
+    parser.add_argument("--k", type=int, default=LSH_TUNING_K)
+    parser.add_argument("--queries", type=int, default=LSH_TUNING_SAMPLE_SIZE)
+    parser.add_argument("--target-recall", type=float, default=LSH_TUNING_TARGET_RECALL)
+    parser.add_argument("--tables", type=_ints, default=LSH_TUNING_TABLES)
+    parser.add_argument("--hashes", type=_ints, default=LSH_TUNING_HASHES)
+    parser.add_argument("--probes", type=_ints, default=LSH_TUNING_PROBES)
+    parser.add_argument(
+        "--projection", choices=("gaussian", "sign", "sparse"), default=LSH_PROJECTION
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.library:
+        segment = find_segment(args.library)
+        if segment is None:
+            parser.error(f"no vector segment for library {args.library}")
+        _, vectors = segment.items()
+    else:
+        vectors = synthetic(args.synthetic, args.dim, args.seed)
+
+    results = benchmark(
+        vectors,
+        k=args.k,
+        sample_size=args.queries,
+        tables=args.tables,
+        hashes=args.hashes,
+        probes=args.probes,
+        projection=args.projection,
+        seed=args.seed,
+    )
+    best = select(results, args.target_recall)
+
+    print(f"{len(vectors)} vectors, recall@{args.k} over {args.queries} queries\n")
+    print("tables  hashes  probes  recall  latency_ms")
+    for result in results:
+        marker = "  <-" if result is best else ""
+        print(
+            f"{result['num_tables']:>6}  {result['num_hashes']:>6}  "
+            f"{result['probes']:>6}  {result['recall']:>6.3f}  "
+            f"{result['latency_ms']:>10.3f}{marker}"
+        )
+
+
+if __name__ == "__main__":
+    main()
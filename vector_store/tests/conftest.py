@@ -0,0 +1,244 @@
+import sys
+import threading
+from uuid import UUID, uuid4
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from vector_store.app.db import (
+    embedding_pipeline,
+    executor,
+    library_epoch,
+    vector_segment,
+)
+from vector_store.app.db.base import Base
+from vector_store.app.db.cache import (
+    chunk_cache,
+    exact_index_cache,
+    index_cache,
+    metadata_index_cache,
+)
+from vector_store.app.db.database import get_async_db
+from vector_store.app.db.embedding_pipeline import EmbeddingPipeline
+from vector_store.app.db.embedding_provider import HashingProvider
+
+# Its repositories register every index table with ``Base``
+from vector_store.app.db.index_manager import IndexManager
+from vector_store.app.db.models import Document, Library
+from vector_store.app.db.vector_segment import get_segment
+from vector_store.app.main import app
+
+
+@pytest.fixture
+def rng() -> np.random.Generator:
+    return np.random.default_rng(0)
+
+
+@pytest.fixture
+def dataset(rng):
+    """
+    ``dataset(n, dim)``: ids and a float32 matrix of ``n`` vectors drawn around
+    a few cluster centers, which approximate indexes are tuned for.
+    """
+
+    def make(n: int, dim: int = 32, clusters: int = 8):
+        centers = rng.normal(size=(clusters, dim)) * 4
+        labels = rng.integers(clusters, size=n)
+        vectors = centers[labels] + rng.normal(size=(n, dim))
+        return [uuid4() for _ in range(n)], vectors.astype(np.float32)
+
+    return make
+
+
+@pytest.fixture
+def exact_top_k():
+    """``exact_top_k(ids, vectors, queries, k, metric)``: brute force id lists."""
+
+    def top_k(ids, vectors, queries, k, metric="euclidean"):
+        vectors = np.asarray(vectors, dtype=np.float64)
+        queries = np.asarray(queries, dtype=np.float64)
+        if metric == "cosine":
+            vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+            distances = -queries @ vectors.T
+        else:
+            distances = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(-1)
+        return [
+            [ids[i] for i in np.argsort(row, kind="stable")[:k]] for row in distances
+        ]
+
+    return top_k
+
+
+@pytest.fixture
+def recall():
+    """``recall(results, truth)``: fraction of the true neighbors found."""
+
+    def measure(
+        results: list[list[tuple[UUID, float]]], truth: list[list[UUID]]
+    ) -> float:
+        found = sum(
+            len({vector_id for vector_id, _ in hits} & set(expected))
+            for hits, expected in zip(results, truth, strict=True)
+        )
+        return found / sum(len(expected) for expected in truth)
+
+    return measure
+
+
+@pytest.fixture
+def search_during_writes():
+    """
+    ``search_during_writes(index, ids, vectors)``: errors raised by searches
+    running on three threads while the first vectors are removed and re-added.
+    """
+
+    def run(index, ids, vectors, rounds: int = 50) -> list[Exception]:
+        errors: list[Exception] = []
+        done = threading.Event()
+
+        def search():
+            while not done.is_set():
+                try:
+                    index.search_batch(vectors[:20] + 0.1, 10)
+                except Exception as err:
+                    errors.append(err)
+
+        threads = [threading.Thread(target=search) for _ in range(3)]
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # Switch threads as often as possible
+        for thread in threads:
+            thread.start()
+        try:
+            for _ in range(rounds):
+                index.remove_batch(ids[:100])
+                index.add_batch(ids[:100], vectors[:100])
+        finally:
+            done.set()
+            for thread in threads:
+                thread.join()
+            sys.setswitchinterval(interval)
+        return errors
+
+    return run
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """
+    Run the test from an empty directory, so the segments, WAL and spills under
+    the relative ``data`` folder are its own. The per-process caches and open
+    segments are reset around it.
+    """
+    monkeypatch.chdir(tmp_path)
+    _reset_process_state()
+    yield tmp_path / "data"
+    _reset_process_state()
+
+
+@pytest.fixture
+def db(data_dir):
+    """Session on a database of its own, next to ``data_dir``."""
+    engine = create_engine(f"sqlite:///{data_dir.parent / 'database.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """
+    API client on the database of ``db``, embedding texts locally with the
+    ``HashingProvider``. The startup hooks are not run.
+    """
+    engine = db.get_bind()
+    monkeypatch.setattr(
+        executor, "SessionLocal", sessionmaker(bind=engine, expire_on_commit=False)
+    )
+    async_engine = create_async_engine(engine.url.set(drivername="sqlite+aiosqlite"))
+    async_session = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def get_db():
+        async with async_session() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = get_db
+    monkeypatch.setattr(
+        embedding_pipeline,
+        "_pipeline",
+        EmbeddingPipeline(HashingProvider(), batch_window=0.01),
+    )
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def restart(data_dir):
+    """``restart()``: lose what this process holds, as a crashed worker would."""
+    return _reset_process_state
+
+
+@pytest.fixture
+def library(db):
+    """``library(index_type, compression, **params)``: a new library row."""
+
+    def make(index_type: str, compression: str | None = None, **params) -> Library:
+        library = Library(
+            id=str(uuid4()),
+            name="test",
+            index_type=index_type,
+            index_params=params,
+            compression=compression,
+        )
+        db.add(library)
+        db.commit()
+        IndexManager(db).create(library.id, index_type, params, compression)
+        return library
+
+    return make
+
+
+@pytest.fixture
+def document(db):
+    """``document(library)``: a new document row of the library."""
+
+    def make(library: Library) -> Document:
+        document = Document(id=str(uuid4()), library_id=library.id, title="test")
+        db.add(document)
+        db.commit()
+        return document
+
+    return make
+
+
+@pytest.fixture
+def write(db):
+    """``write(library, op, ids, vectors)``: a chunk mutation, segment first."""
+
+    def apply(library: Library, op: str, ids, vectors=None) -> None:
+        segment = get_segment(library.id)
+        manager = IndexManager(db)
+        if op == "remove":
+            segment.delete_many(ids)
+            manager.remove(library, ids)
+        else:
+            segment.put_many(ids, vectors)
+            if op == "add":
+                manager.add(library, ids, vectors)
+            else:
+                for chunk_id, vector in zip(ids, vectors, strict=True):
+                    manager.replace(library, chunk_id, vector)
+
+    return apply
+
+
+def _reset_process_state() -> None:
+    for cache in (index_cache, exact_index_cache, metadata_index_cache, chunk_cache):
+        cache.clear()
+    vector_segment._segments.clear()
+    library_epoch._seen.clear()
@@ -0,0 +1,144 @@
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from vector_store.app.db.bruteforce_index import BruteForceIndex
+from vector_store.app.db.index import ID_BYTES
+from vector_store.app.db.vector_segment import VectorSegment
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+def test_search_matches_exact_top_k(dataset, exact_top_k, metric):
+    ids, vectors = dataset(300)
+    index = BruteForceIndex(metric)
+    index.add_batch(ids, vectors)
+
+    queries = vectors[:20] + 0.1
+    results = index.search_batch(queries, 10)
+
+    assert [[i for i, _ in hits] for hits in results] == exact_top_k(
+        ids, vectors, queries, 10, metric
+    )
+    for hits in results:
+        distances = [d for _, d in hits]
+        assert distances == sorted(distances)
+
+
+def test_search_batch_matches_single_searches(dataset):
+    ids, vectors = dataset(100)
+    index = BruteForceIndex()
+    index.add_batch(ids, vectors)
+
+    queries = vectors[:5] + 0.5
+    batch = index.search_batch(queries, 3)
+
+    for hits, query in zip(batch, queries, strict=True):
+        single = index.search(query, 3)
+        assert [i for i, _ in hits] == [i for i, _ in single]
+        np.testing.assert_allclose(
+            [d for _, d in hits], [d for _, d in single], rtol=1e-4
+        )
+
+
+def test_remove_keeps_rows_packed(dataset, exact_top_k):
+    ids, vectors = dataset(100)
+    index = BruteForceIndex()
+    index.add_batch(ids, vectors)
+
+    removed = set(ids[::3])
+    for vector_id in removed:
+        index.remove(vector_id)
+    index.remove(uuid4())  # Unknown ids are ignored
+
+    kept = [i for i, vector_id in enumerate(ids) if vector_id not in removed]
+    assert index.size == len(kept)
+    assert sorted(index.rows.values()) == list(range(index.size))
+    assert all(index.ids[row] == vector_id for vector_id, row in index.rows.items())
+    np.testing.assert_allclose(
+        index.vectors[[index.rows[ids[i]] for i in kept]], vectors[kept]
+    )
+    results = index.search_batch(vectors[:10], 5)
+    assert [[i for i, _ in hits] for hits in results] == exact_top_k(
+        [ids[i] for i in kept], vectors[kept], vectors[:10], 5
+    )
+
+
+def test_add_existing_id_replaces_its_vector(dataset):
+    ids, vectors = dataset(50)
+    index = BruteForceIndex()
+    index.add_batch(ids, vectors)
+
+    replacement = vectors[0] + 100
+    index.add_batch([ids[3]], [replacement])
+
+    assert index.size == 50
+    np.testing.assert_allclose(index.vectors[index.rows[ids[3]]], replacement)
+    assert index.search(replacement, 1)[0] == (ids[3], pytest.approx(0.0, abs=1e-3))
+
+
+def test_search_filtered_only_scores_allowed(dataset, exact_top_k):
+    ids, vectors = dataset(200)
+    index = BruteForceIndex()
+    index.add_batch(ids, vectors)
+
+    allowed = set(ids[::4])
+    results = index.search_filtered(vectors[:5], 5, allowed | {uuid4()})
+
+    positions = [i for i, vector_id in enumerate(ids) if vector_id in allowed]
+    assert [[i for i, _ in hits] for hits in results] == exact_top_k(
+        [ids[i] for i in positions], vectors[positions], vectors[:5], 5
+    )
+
+
+def test_attached_matrix_is_copied_on_first_mutation(dataset, tmp_path):
+    ids, vectors = dataset(20)
+    segment = VectorSegment(tmp_path / "segment", dim=32)
+    segment.put_many(ids, vectors)
+    index = BruteForceIndex()
+    index.attach(*segment.codes())
+    mapped = index.matrix
+    # Rows of the segment mapping are shared, not counted
+    assert index.nbytes == 2 * ID_BYTES * 20 + index.norms.nbytes
+
+    # Removing the first row moves the last one into its slot
+    index.remove(ids[0])
+
+    assert index.size == 19
+    assert not np.shares_memory(index.matrix, mapped)
+    assert index.nbytes == 2 * ID_BYTES * 19 + index.norms.nbytes + mapped.nbytes
+    np.testing.assert_array_equal(segment.items()[1], vectors)
+
+
+def test_attached_copy_of_a_segment_with_holes_is_counted(dataset, tmp_path):
+    ids, vectors = dataset(20)
+    segment = VectorSegment(tmp_path / "segment", dim=32)
+    segment.put_many(ids, vectors)
+    segment.delete(ids[3])
+    index = BruteForceIndex()
+
+    # The live rows are gathered into a private copy
+    index.attach(*segment.codes())
+
+    assert index.size == 19
+    assert index.nbytes == 2 * ID_BYTES * 19 + index.norms.nbytes + 19 * 32 * 4
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_compact_dtypes_keep_the_ranking_close(dataset, dtype):
+    ids, vectors = dataset(200)
+    index = BruteForceIndex("cosine", dtype)
+    index.add_batch(ids, vectors)
+
+    results = index.search_batch(vectors[:20], 1)
+
+    assert [hits[0][0] for hits in results] == ids[:20]
+
+
+def test_search_during_writes(dataset, search_during_writes):
+    ids, vectors = dataset(500)
+    index = BruteForceIndex()
+    index.attach(ids, vectors)
+
+    assert search_during_writes(index, ids, vectors) == []
+    assert index.size == 500
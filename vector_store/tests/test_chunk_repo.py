@@ -0,0 +1,53 @@
+from uuid import UUID, uuid4
+
+from sqlalchemy import event
+
+from vector_store.app.constants import EMBEDDING_DIM
+from vector_store.app.db.cache import chunk_cache
+from vector_store.app.db.repositories.chunk_repo import ChunkRepository
+from vector_store.app.models.chunk import ChunkCreate
+
+
+def test_get_many_fetches_misses_with_one_query(db, rng, library, document):
+    document = document(library("bruteforce"))
+    repo = ChunkRepository(db)
+    chunks = repo.create_many(
+        [
+            (
+                UUID(document.id),
+                ChunkCreate(
+                    text=f"chunk {i}", embedding=rng.normal(size=EMBEDDING_DIM).tolist()
+                ),
+            )
+            for i in range(10)
+        ]
+    )
+    ids = [UUID(chunk.id) for chunk in chunks]
+    chunk_cache.clear()
+    repo.get(ids[4])  # Cached
+
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", _record(statements))
+    wanted = [ids[7], uuid4(), ids[4], ids[0], ids[7], ids[2]]
+    found = repo.get_many(wanted)
+
+    assert list(found) == [str(ids[i]) for i in (7, 4, 0, 2)]
+    assert [chunk.text for chunk in found.values()] == [
+        "chunk 7",
+        "chunk 4",
+        "chunk 0",
+        "chunk 2",
+    ]
+    assert len(statements) == 1 and " IN " in statements[0]
+
+    # The misses were cached, so a repeat doesn't touch the database
+    again = [ids[2], ids[7], ids[0]]
+    assert list(repo.get_many(again)) == [str(chunk_id) for chunk_id in again]
+    assert len(statements) == 1
+
+
+def _record(statements: list[str]):
+    def listener(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    return listener
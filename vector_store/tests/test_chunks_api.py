@@ -0,0 +1,111 @@
+from uuid import UUID, uuid4
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+from vector_store.app.constants import EMBEDDING_DIM
+from vector_store.app.db.index_manager import IndexManager
+from vector_store.app.db.models import Chunk
+from vector_store.app.db.vector_segment import get_segment
+
+
+@pytest.fixture
+def commits(db):
+    """Connections of the transactions committed since the list was cleared."""
+    connections = []
+    listener = connections.append
+    event.listen(db.get_bind(), "commit", listener)
+    yield connections
+    event.remove(db.get_bind(), "commit", listener)
+
+
+@pytest.fixture
+def index_adds(monkeypatch):
+    """Chunk ids of every ``IndexManager.add`` call."""
+    calls = []
+    add = IndexManager.add
+
+    def spy(self, library, chunk_ids, embeddings):
+        calls.append(list(chunk_ids))
+        return add(self, library, chunk_ids, embeddings)
+
+    monkeypatch.setattr(IndexManager, "add", spy)
+    return calls
+
+
+def _items(rng, n: int) -> list[dict]:
+    """Chunks to create, every other one with its embedding."""
+    return [
+        {
+            "text": f"refund policy {i}",
+            "meta": {"part": str(i)},
+            **({"embedding": rng.normal(size=EMBEDDING_DIM).tolist()} if i % 2 else {}),
+        }
+        for i in range(n)
+    ]
+
+
+def test_document_batch_is_one_transaction(
+    client, db, rng, library, document, commits, index_adds
+):
+    library = library("bruteforce")
+    document = document(library)
+    items = _items(rng, 6)
+    commits.clear()
+
+    response = client.post(f"/documents/{document.id}/chunks:batch", json=items)
+
+    assert response.status_code == 200, response.text
+    created = response.json()
+    assert [chunk["text"] for chunk in created] == [item["text"] for item in items]
+    assert len(commits) == 1
+    assert index_adds == [[UUID(chunk["id"]) for chunk in created]]
+    assert db.query(Chunk).filter_by(document_id=document.id).count() == 6
+    np.testing.assert_allclose(
+        created[1]["embedding"], items[1]["embedding"], rtol=1e-6
+    )
+    assert len(created[0]["embedding"]) == EMBEDDING_DIM  # Generated
+
+    hits = IndexManager(db).get(library).search_batch([items[3]["embedding"]], 1)
+    assert hits[0][0][0] == UUID(created[3]["id"])
+
+
+def test_library_batch_spans_documents(
+    client, db, rng, library, document, commits, index_adds
+):
+    library = library("bruteforce")
+    documents = [document(library), document(library)]
+    items = [
+        {**item, "document_id": documents[i % 2].id}
+        for i, item in enumerate(_items(rng, 4))
+    ]
+    commits.clear()
+
+    response = client.post(f"/libraries/{library.id}/chunks:batch", json=items)
+
+    assert response.status_code == 200, response.text
+    assert [chunk["document_id"] for chunk in response.json()] == [
+        item["document_id"] for item in items
+    ]
+    assert len(commits) == 1 and len(index_adds) == 1
+    assert len(get_segment(library.id)) == 4
+
+
+def test_invalid_batches_write_nothing(client, db, rng, library, document, commits):
+    library = library("bruteforce")
+    document = document(library)
+    items = _items(rng, 3)
+    items[2]["embedding"] = [0.0] * 3
+    commits.clear()
+
+    response = client.post(f"/documents/{document.id}/chunks:batch", json=items)
+    assert response.status_code == 400
+    assert "positions [2]" in response.json()["detail"]
+
+    items = [{**item, "document_id": str(uuid4())} for item in _items(rng, 2)]
+    response = client.post(f"/libraries/{library.id}/chunks:batch", json=items)
+    assert response.status_code == 404
+
+    assert not commits and db.query(Chunk).count() == 0
+    assert len(get_segment(library.id)) == 0
@@ -0,0 +1,85 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from vector_store.app.db import embedding_cache
+from vector_store.app.db.embedding_cache import EmbeddingCache
+from vector_store.app.db.embedding_pipeline import EmbeddingPipeline
+from vector_store.app.db.embedding_provider import HashingProvider
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Wall clock of the SQLite tier, ``clock.now`` seconds, moved by hand."""
+
+    class Clock:
+        now = 1_000_000.0
+
+    monkeypatch.setattr(
+        embedding_cache, "time", SimpleNamespace(time=lambda: Clock.now)
+    )
+    return Clock
+
+
+def test_hits_and_misses():
+    cache = EmbeddingCache()
+    key = EmbeddingCache.key("model", "search_query", "refunds")
+    assert key != EmbeddingCache.key("model", "search_document", "refunds")
+    assert key != EmbeddingCache.key("other", "search_query", "refunds")
+
+    assert cache.get_many([key]) == [None]
+    cache.put_many([key], [[0.5, 0.25]])
+    assert cache.get_many([key, "missing", key]) == [[0.5, 0.25], None, [0.5, 0.25]]
+    assert cache.stats() == {"hits": 2, "misses": 2, "hit_rate": 0.5, "size": 1}
+
+
+def test_memory_entries_expire():
+    cache = EmbeddingCache(ttl=0.05)
+    cache.put_many(["key"], [[1.0]])
+    assert cache.get_many(["key"]) == [[1.0]]
+    time.sleep(0.1)
+    assert cache.get_many(["key"]) == [None]
+
+
+def test_sqlite_tier_survives_restarts(tmp_path, clock):
+    path = tmp_path / "cache" / "embeddings.db"
+    EmbeddingCache(path=path).put_many(["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+
+    cache = EmbeddingCache(path=path)
+    assert cache.get_many(["a", "c"]) == [[1.0, 2.0], None]
+    assert cache.stats()["size"] == 1  # Refilled the memory tier
+
+    clock.now += cache.ttl + 1
+    assert cache.get_many(["a"]) == [[1.0, 2.0]]  # Still in memory
+    assert EmbeddingCache(path=path).get_many(["a", "b"]) == [None, None]
+
+
+def test_pipeline_only_embeds_misses(tmp_path):
+    class CountingProvider(HashingProvider):
+        def __init__(self):
+            super().__init__(dim=16)
+            self.texts: list[str] = []
+
+        async def embed(self, texts, input_type):
+            self.texts.extend(texts)
+            return await super().embed(texts, input_type)
+
+    provider = CountingProvider()
+    path = tmp_path / "embeddings.db"
+    pipeline = EmbeddingPipeline(
+        provider, batch_window=0.01, cache=EmbeddingCache(path=path)
+    )
+    first = pipeline.embed(["a", "b", "a"], "search_document")
+    assert provider.texts == ["a", "b"]
+    assert pipeline.embed(["b", "c"], "search_document") == [first[1]] + [
+        provider.embed_text("c")
+    ]
+    pipeline.embed(["a"], "search_query")  # Another input type
+    assert provider.texts == ["a", "b", "c", "a"]
+
+    restarted = EmbeddingPipeline(
+        provider, batch_window=0.01, cache=EmbeddingCache(path=path)
+    )
+    restarted.embed(["a", "b", "c"], "search_document")
+    assert len(provider.texts) == 4
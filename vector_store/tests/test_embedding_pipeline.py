@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import pytest
+
+from vector_store.app.db.embedding_pipeline import EmbeddingPipeline
+from vector_store.app.db.embedding_provider import HashingProvider
+
+
+class RecordingProvider(HashingProvider):
+    """Hashing embeddings, recording every call and failing the first ones."""
+
+    def __init__(self, failures: int = 0, delay: float = 0.0):
+        super().__init__(dim=16)
+        self.calls: list[list[str]] = []
+        self.failures = failures
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def embed(self, texts: list[str], input_type: str) -> list[list[float]]:
+        self.calls.append(list(texts))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if len(self.calls) <= self.failures:
+                raise ConnectionError("boom")
+            return await super().embed(texts, input_type)
+        finally:
+            self.in_flight -= 1
+
+
+def _embed_concurrently(pipeline: EmbeddingPipeline, texts: list[str]) -> list:
+    async def run():
+        return await asyncio.gather(
+            *(pipeline.aembed([text], "search_query") for text in texts)
+        )
+
+    return [embeddings[0] for embeddings in asyncio.run(run())]
+
+
+def test_concurrent_callers_share_a_batch():
+    provider = RecordingProvider()
+    pipeline = EmbeddingPipeline(provider, batch_size=100, batch_window=0.1)
+    texts = [f"text {i}" for i in range(10)]
+
+    embeddings = _embed_concurrently(pipeline, texts)
+
+    assert len(provider.calls) == 1 and sorted(provider.calls[0]) == sorted(texts)
+    assert embeddings == [provider.embed_text(text) for text in texts]
+
+
+def test_full_batches_are_sent_without_waiting_for_the_window():
+    provider = RecordingProvider()
+    pipeline = EmbeddingPipeline(provider, batch_size=10, batch_window=60)
+    texts = [f"text {i}" for i in range(20)]
+
+    start = time.perf_counter()
+    embeddings = pipeline.embed(texts + texts[:5], "search_document")
+
+    assert time.perf_counter() - start < 5
+    assert [len(batch) for batch in provider.calls] == [10, 10]  # Distinct texts
+    assert embeddings == [provider.embed_text(text) for text in texts + texts[:5]]
+
+
+def test_the_window_flushes_a_partial_batch():
+    provider = RecordingProvider()
+    pipeline = EmbeddingPipeline(provider, batch_size=10, batch_window=0.05)
+
+    pipeline.embed([f"text {i}" for i in range(13)], "search_document")
+
+    assert [len(batch) for batch in provider.calls] == [10, 3]
+
+
+def test_failed_batches_are_retried():
+    provider = RecordingProvider(failures=2)
+    pipeline = EmbeddingPipeline(
+        provider, batch_window=0.01, max_retries=2, retry_backoff=0.001
+    )
+
+    assert pipeline.embed(["a"], "search_query") == [provider.embed_text("a")]
+    assert provider.calls == [["a"]] * 3
+
+
+def test_callers_get_the_error_once_retries_are_exhausted():
+    provider = RecordingProvider(failures=2)
+    pipeline = EmbeddingPipeline(
+        provider, batch_window=0.01, max_retries=1, retry_backoff=0.001
+    )
+
+    with pytest.raises(ConnectionError):
+        pipeline.embed(["a", "b"], "search_query")
+    assert len(provider.calls) == 2
+    # The pipeline keeps serving later requests
+    assert pipeline.embed(["c"], "search_query") == [provider.embed_text("c")]
+
+
+def test_concurrency_is_limited():
+    provider = RecordingProvider(delay=0.05)
+    pipeline = EmbeddingPipeline(
+        provider, batch_size=1, batch_window=0.01, max_concurrency=2
+    )
+
+    _embed_concurrently(pipeline, [f"text {i}" for i in range(6)])
+
+    assert len(provider.calls) == 6
+    assert provider.max_in_flight == 2
@@ -0,0 +1,148 @@
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event
+
+from vector_store.app.constants import EMBEDDING_DIM
+from vector_store.app.db.cache import index_cache
+from vector_store.app.db.hnsw_index import HNSWIndex
+from vector_store.app.db.repositories.hnsw_index_repo import HNSWIndexRepository
+from vector_store.app.db.vector_segment import get_segment
+
+
+@pytest.fixture
+def built(dataset):
+    ids, vectors = dataset(300)
+    index = HNSWIndex(32, M=8, ef_construction=40, ef_search=64, seed=0)
+    for vector_id, vector in zip(ids, vectors, strict=True):
+        index.add(vector_id, vector)
+    return index, ids, vectors
+
+
+def test_recall_against_exact_search(built, exact_top_k, recall):
+    index, ids, vectors = built
+    queries = vectors[:50] + 0.2
+
+    results = index.search_batch(queries, 10)
+
+    assert recall(results, exact_top_k(ids, vectors, queries, 10, "cosine")) >= 0.9
+    for hits in results:
+        scores = [score for _, score in hits]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_removed_nodes_are_never_returned(built, exact_top_k, recall):
+    index, ids, vectors = built
+    removed = set(ids[:100])
+
+    for vector_id in removed:
+        index.remove(vector_id)
+    index.remove(uuid4())  # Unknown ids are ignored
+
+    assert set(index.nodes) == set(ids[100:])
+    results = index.search_batch(vectors[:20], 10)
+    assert all(vector_id not in removed for hits in results for vector_id, _ in hits)
+    truth = exact_top_k(ids[100:], vectors[100:], vectors[:20], 10, "cosine")
+    assert recall(results, truth) >= 0.9
+
+
+def test_live_neighbors_are_relinked_on_removal(built):
+    index, ids, _ = built
+    node = index.nodes[ids[0]]
+    neighbors = [index.ids[n] for n in index.links[node][0]]
+
+    index.remove(ids[0])
+
+    for vector_id in neighbors:
+        links = index.links[index.nodes[vector_id]][0]
+        assert links, "a neighbor of the removed node lost all its links"
+        assert all(index.ids[n] != ids[0] for n in links)
+
+
+def test_tombstones_trigger_a_rebuild(built):
+    index, ids, _ = built
+
+    for vector_id in ids[:200]:
+        index.remove(vector_id)
+
+    # Rebuilt once tombstones outnumbered live nodes
+    assert len(index.deleted) <= len(index.nodes)
+    assert len(index.ids) < 300
+
+
+def test_add_existing_id_replaces_its_vector(built):
+    index, ids, vectors = built
+    replacement = -vectors[0]
+
+    index.add(ids[5], replacement)
+
+    assert len(index.nodes) == 300
+    assert index.search(replacement, 1)[0][0] == ids[5]
+    assert ids[5] not in {vector_id for vector_id, _ in index.search(vectors[5], 5)}
+
+
+def test_pop_changes_tracks_dirty_and_removed_nodes(built):
+    index, ids, vectors = built
+    index.pop_changes()
+
+    index.remove(ids[0])
+    index.add(uuid4(), vectors[1] + 0.01)
+    dirty, removed = index.pop_changes()
+
+    assert removed == {ids[0]}
+    assert ids[0] not in dirty and dirty <= set(index.nodes)
+    assert index.pop_changes() == (set(), set())
+
+
+def test_restore_from_persisted_links(built):
+    index, ids, vectors = built
+    entries = [
+        (vector_id, vectors[i], index.node_links(vector_id))
+        for i, vector_id in enumerate(ids)
+    ]
+
+    restored = HNSWIndex.from_dict(index.to_dict())
+    restored.restore(entries)
+
+    queries = vectors[:20] + 0.2
+    assert [[i for i, _ in hits] for hits in restored.search_batch(queries, 5)] == [
+        [i for i, _ in hits] for hits in index.search_batch(queries, 5)
+    ]
+
+
+@pytest.mark.parametrize(
+    "params", [{"M": 1}, {"M": 0}, {"ef_construction": 0}, {"ef_search": 0}]
+)
+def test_invalid_parameters_are_rejected(params):
+    with pytest.raises(ValueError):
+        HNSWIndex(32, **params)
+
+
+def test_changes_are_saved_in_two_statements(db, dataset):
+    library_id = str(uuid4())
+    ids, vectors = dataset(100, dim=EMBEDDING_DIM)
+    get_segment(library_id, dtype="float32").put_many(ids, vectors)
+    repo = HNSWIndexRepository(db)
+    index = HNSWIndex(EMBEDDING_DIM, M=4, ef_construction=20, seed=0)
+    index.add_batch(ids[:80], vectors[:80])
+    repo.save(library_id, index)
+    index_cache.clear()
+    index = repo.get(library_id)  # Its node rows are now in the session
+    index.add_batch(ids[80:], vectors[80:])
+    index.remove_batch(ids[:10])
+
+    statements = []
+    engine = db.get_bind()
+
+    def listener(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", listener)
+    repo.save_changes(library_id, index)
+    event.remove(engine, "before_cursor_execute", listener)
+
+    assert [statement.split()[0] for statement in statements] == ["DELETE", "INSERT"]
+    index_cache.clear()
+    restored = repo.get(library_id)
+    assert set(restored.nodes) == set(ids[10:])
+    assert all(restored.node_links(i) == index.node_links(i) for i in ids[10:])
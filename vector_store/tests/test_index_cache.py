@@ -0,0 +1,204 @@
+from uuid import uuid4
+
+import pytest
+
+from vector_store.app.constants import EMBEDDING_DIM
+from vector_store.app.db import library_epoch
+from vector_store.app.db.bruteforce_index import BruteForceIndex
+from vector_store.app.db.cache import exact_index_cache
+from vector_store.app.db.hnsw_index import HNSWIndex
+from vector_store.app.db.index_cache import IndexCache
+from vector_store.app.db.index_manager import IndexManager
+from vector_store.app.db.index_spill import IndexSpill
+from vector_store.app.db.ivf_index import IVFIndex
+from vector_store.app.db.lsh_index import LSHIndex
+from vector_store.app.db.metadata_index import MetadataIndex
+from vector_store.app.db.pq_index import PQIndex
+from vector_store.app.db.vector_segment import get_segment
+
+
+def _ids(results):
+    return [[vector_id for vector_id, _ in hits] for hits in results]
+
+
+@pytest.fixture
+def sized(dataset):
+    """``sized(n)``: a brute force index of ``n`` vectors."""
+
+    def make(n: int) -> BruteForceIndex:
+        index = BruteForceIndex()
+        index.add_batch(*dataset(n))
+        return index
+
+    return make
+
+
+@pytest.fixture
+def spill(data_dir):
+    spill = IndexSpill(data_dir / "spill")
+    yield spill
+    spill._writer.shutdown(wait=True)
+
+
+@pytest.fixture
+def stored(data_dir, dataset):
+    """A library id, with its vectors in its segment and its epoch seen."""
+    library_id = str(uuid4())
+    ids, vectors = dataset(300, dim=EMBEDDING_DIM)
+    get_segment(library_id, dtype="float32").put_many(ids, vectors)
+    library_epoch.sync(library_id)
+    return library_id, ids, vectors
+
+
+def test_eviction_keeps_the_total_under_budget(sized):
+    indexes = [sized(100) for _ in range(3)]
+    cache = IndexCache(max_bytes=int(2.5 * indexes[0].nbytes))
+    cache.put("a", indexes[0], load_seconds=1.0)
+    cache.put("b", indexes[1], load_seconds=0.01)
+
+    # The index worth the least (quickest to reload) goes first
+    cache.put("c", indexes[2], load_seconds=1.0)
+
+    assert cache.keys() == ["a", "c"] and cache.evictions == 1
+    assert cache.nbytes == indexes[0].nbytes + indexes[2].nbytes <= cache.max_bytes
+
+
+def test_index_over_budget_alone_is_kept(sized):
+    small, large = sized(10), sized(500)
+    cache = IndexCache(max_bytes=large.nbytes // 2)
+    cache.put("small", small)
+
+    cache.put("large", large)
+
+    assert cache.keys() == ["large"]
+    assert cache.get("large") is large
+    assert cache.nbytes == large.nbytes
+
+
+def test_resize_remeasures_and_evicts(sized, dataset):
+    first, second = sized(100), sized(100)
+    cache = IndexCache(max_bytes=int(2.5 * first.nbytes))
+    cache.put("first", first)
+    cache.put("second", second)
+
+    second.add_batch(*dataset(100))
+    cache.resize("second")
+
+    assert cache.keys() == ["second"]
+    assert cache.nbytes == second.nbytes
+    assert cache.pop("second") is second and cache.nbytes == 0
+
+
+@pytest.mark.parametrize(
+    "make",
+    [
+        lambda: LSHIndex(EMBEDDING_DIM, num_tables=4, num_hashes=6, seed=0),
+        lambda: HNSWIndex(EMBEDDING_DIM, M=8, ef_construction=40, seed=0),
+        lambda: IVFIndex(EMBEDDING_DIM, nlist=2, nprobe=2, seed=0),
+        lambda: PQIndex(EMBEDDING_DIM, pq_m=8, rerank=4, seed=0),
+    ],
+    ids=["lsh", "hnsw", "ivf", "pq"],
+)
+def test_spill_restores_the_index(spill, stored, make):
+    library_id, ids, vectors = stored
+    segment = get_segment(library_id)
+    index = make()
+    index.add_batch(ids, vectors)
+    if isinstance(index, (IVFIndex, PQIndex)):
+        index.train(ids, vectors)
+    index.bind(segment)
+    queries = vectors[:10] + 0.1
+    expected = _ids(index.search_batch(queries, 5))
+
+    spill._write(library_id, index, segment.epoch)
+    restored = spill.load(library_id, segment.epoch)
+
+    assert restored is not index
+    assert _ids(restored.search_batch(queries, 5)) == expected
+    assert spill.load(library_id, segment.epoch + 1) is None
+    assert spill.stats() == {"written": 1, "skipped": 0, "loaded": 1}
+
+
+def test_restored_lsh_vectors_are_views_of_the_segment(spill, stored):
+    library_id, ids, vectors = stored
+    segment = get_segment(library_id)
+    index = LSHIndex(EMBEDDING_DIM, seed=0)
+    index.add_batch(ids, vectors)
+    assert index.owned_bytes == vectors.nbytes
+
+    spill._write(library_id, index, segment.epoch)
+    restored = spill.load(library_id, segment.epoch)
+
+    assert restored.owned_bytes == 0
+    assert restored.nbytes == index.nbytes - vectors.nbytes
+    assert set(restored.vectors) == set(ids)
+
+
+def test_change_after_eviction_skips_the_spill(spill, stored):
+    library_id, ids, vectors = stored
+    epoch = get_segment(library_id).epoch
+    index = LSHIndex(EMBEDDING_DIM, seed=0)
+    index.add_batch(ids, vectors)
+
+    library_epoch.publish(library_id)
+    spill._write(library_id, index, epoch)
+
+    assert spill.stats()["skipped"] == 1
+    assert not list(spill.directory.glob("*.idx"))
+
+
+def test_evicted_index_is_spilled_at_its_epoch(spill, stored, sized):
+    library_id, ids, vectors = stored
+    epoch = get_segment(library_id).epoch
+    index = LSHIndex(EMBEDDING_DIM, seed=0)
+    index.add_batch(ids, vectors)
+    cache = IndexCache(max_bytes=index.nbytes, spill=spill)
+    cache.put(library_id, index)
+
+    cache.put("other", sized(10))
+    spill._writer.submit(lambda: None).result()  # Wait for the spill
+
+    assert library_id not in cache
+    assert [path.name for path in spill.directory.iterdir()] == [
+        f"{library_id}.{epoch}.idx"
+    ]
+    assert set(spill.load(library_id, epoch).keys) == set(ids)
+    # A newer spill replaces it
+    library_epoch.publish(library_id)
+    spill._write(library_id, index, epoch + 1)
+    assert spill.load(library_id, epoch) is None
+
+
+def test_exact_indexes_are_bounded_by_bytes(db, dataset, library, write, monkeypatch):
+    monkeypatch.setattr(exact_index_cache, "max_bytes", 1)
+    manager = IndexManager(db)
+    libraries = [library("lsh", seed=0) for _ in range(2)]
+    for each in libraries:
+        write(each, "add", *dataset(20, dim=EMBEDDING_DIM))
+        manager.exact(each)
+
+    # Only the last one is kept, alone over the budget
+    key = str(libraries[1].id)
+    assert exact_index_cache.keys() == [key]
+    assert exact_index_cache.nbytes == exact_index_cache.get(key).nbytes > 0
+
+
+def test_metadata_indexes_are_bounded_by_bytes():
+    def indexed(n: int) -> MetadataIndex:
+        metadata = MetadataIndex()
+        metadata.add_many(
+            [(uuid4(), {"lang": "en", "part": str(i % 4)}) for i in range(n)]
+        )
+        return metadata
+
+    small, large = indexed(10), indexed(100)
+    cache = IndexCache(max_bytes=large.nbytes)
+    cache.put("small", small)
+    cache.put("large", large)
+
+    assert cache.keys() == ["large"]
+    for chunk_id in list(large.slots)[50:]:
+        large.remove(chunk_id)
+    assert large.pairs == 100
+    cache.resize("large")
+    assert cache.nbytes == large.nbytes < cache.max_bytes
@@ -0,0 +1,50 @@
+import numpy as np
+
+from vector_store.app.constants import EMBEDDING_DIM
+from vector_store.app.db.bruteforce_index import BruteForceIndex
+from vector_store.app.db.cache import exact_index_cache, index_cache
+from vector_store.app.db.index_manager import IndexManager
+
+
+def _vectors(dataset, n):
+    return dataset(n, dim=EMBEDDING_DIM)
+
+
+def _shares_segment(index: BruteForceIndex) -> bool:
+    return index._attached and not index.matrix.flags.owndata
+
+
+def test_writes_reattach_brute_force_to_the_segment(db, dataset, library, write):
+    library = library("bruteforce")
+    ids, vectors = _vectors(dataset, 300)
+    write(library, "add", ids[:200], vectors[:200])
+    index = IndexManager(db).get(library)
+    assert _shares_segment(index)
+
+    write(library, "add", ids[200:], vectors[200:])
+    write(library, "replace", ids[:1], vectors[299:])
+    assert str(library.id) not in index_cache  # Not copied to private memory
+
+    index = IndexManager(db).get(library)
+    assert _shares_segment(index) and index.size == 300
+    assert index.nbytes < index.matrix.nbytes
+    hits = index.search_batch(vectors[299:] + 0.01, 2)[0]
+    assert {chunk_id for chunk_id, _ in hits} == {ids[0], ids[299]}
+
+
+def test_writes_drop_the_exact_fallback_index(db, dataset, library, write):
+    library = library("lsh", num_tables=4, num_hashes=6, seed=0)
+    ids, vectors = _vectors(dataset, 100)
+    write(library, "add", ids[:80], vectors[:80])
+    exact = IndexManager(db).exact(library)
+    assert _shares_segment(exact) and exact.size == 80
+
+    write(library, "add", ids[80:], vectors[80:])
+    write(library, "remove", ids[:10])
+
+    assert str(library.id) not in exact_index_cache
+    assert exact.size == 80  # Left untouched
+    results = IndexManager(db).search_exact(library, vectors[90:], 1)
+    assert [hits[0][0] for hits in results] == ids[90:]
+    assert IndexManager(db).exact(library).size == 90
+    np.testing.assert_allclose([hits[0][1] for hits in results], 1.0, rtol=1e-5)
@@ -0,0 +1,163 @@
+import logging
+from uuid import uuid4
+
+import pytest
+
+from vector_store.app.constants import EMBEDDING_DIM
+from vector_store.app.db.cache import index_cache
+from vector_store.app.db.index_manager import IndexManager
+from vector_store.app.db.index_wal import IndexWAL, index_wal
+from vector_store.app.db.lsh_index import LSHIndex
+from vector_store.app.db.vector_segment import get_segment
+
+
+@pytest.fixture
+def wal(tmp_path):
+    return IndexWAL(tmp_path / "wal")
+
+
+def _vectors(dataset, n):
+    return dataset(n, dim=EMBEDDING_DIM)
+
+
+def _stored(index):
+    """Ids held by an LSH or HNSW index."""
+    return set(index.keys if isinstance(index, LSHIndex) else index.nodes)
+
+
+def test_records_are_read_back_in_order(wal):
+    library_id = uuid4()
+    ids = [uuid4() for _ in range(3)]
+    wal.append(library_id, "add", ids)
+    wal.append(library_id, "replace", ids[1:2])
+    wal.append(library_id, "remove", ids[:1])
+
+    assert wal.read(library_id) == [
+        ("add", ids),
+        ("replace", ids[1:2]),
+        ("remove", ids[:1]),
+    ]
+    assert wal.pending() == [str(library_id)]
+    wal.clear(library_id)
+    assert wal.read(library_id) == [] and wal.pending() == []
+
+
+def test_torn_record_is_skipped_and_appends_resume(wal, caplog):
+    library_id = uuid4()
+    first, second = uuid4(), uuid4()
+    wal.append(library_id, "add", [first])
+    # A crash in the middle of an append
+    with open(wal._path(library_id), "a") as file:
+        file.write('{"op": "add", "ids": ["')
+
+    with caplog.at_level(logging.WARNING):
+        assert wal.read(library_id) == [("add", [first])]
+    assert "truncated" in caplog.text
+    wal.append(library_id, "remove", [second])
+    assert wal.read(library_id) == [("add", [first]), ("remove", [second])]
+
+
+def test_read_since_returns_the_records_after_a_mark(wal):
+    library_id = uuid4()
+    before, after = uuid4(), uuid4()
+    wal.append(library_id, "add", [before])
+    token = wal.mark(library_id)
+    wal.append(library_id, "remove", [after])
+
+    assert wal.read(library_id) == [("add", [before]), ("remove", [after])]
+    assert wal.read_since(library_id, token) == [("remove", [after])]
+    assert wal.read_since(library_id, str(uuid4())) is None
+    wal.clear(library_id)
+    assert wal.read_since(library_id, token) is None
+
+
+@pytest.mark.parametrize(
+    "index_type, params",
+    [
+        ("lsh", {"num_tables": 4, "num_hashes": 6, "seed": 0}),
+        ("hnsw", {"M": 8, "ef_construction": 40}),
+    ],
+)
+def test_restart_replays_the_pending_log(
+    db, dataset, library, write, restart, caplog, index_type, params
+):
+    library = library(index_type, **params)
+    ids, vectors = _vectors(dataset, 200)
+    _, replacements = _vectors(dataset, 10)
+    write(library, "add", ids[:150], vectors[:150])
+    assert IndexManager(db).compact(library)  # Persisted snapshot
+    write(library, "remove", ids[:40])
+    write(library, "replace", ids[40:50], replacements)
+    write(library, "add", ids[150:], vectors[150:])
+    assert len(index_wal.read(library.id)) == 12
+
+    # The process dies before compacting, its caches and mappings with it
+    restart()
+    with caplog.at_level(logging.INFO):
+        index = IndexManager(db).get(library)
+
+    assert "Replaying 100 logged chunks" in caplog.text
+    assert "missing from segment" not in caplog.text
+    assert _stored(index) == set(ids[40:])
+    assert _stored(index) == set(get_segment(library.id).items()[0])
+    hits = index.search_batch(replacements, 1)
+    assert [hit[0][0] for hit in hits] == ids[40:50]
+
+
+@pytest.mark.parametrize(
+    "index_type, params",
+    [
+        ("lsh", {"num_tables": 4, "num_hashes": 6, "seed": 0}),
+        ("hnsw", {"M": 8, "ef_construction": 40}),
+    ],
+)
+def test_compaction_folds_the_log_into_the_snapshot(
+    db, dataset, library, write, restart, index_type, params
+):
+    library = library(index_type, **params)
+    ids, vectors = _vectors(dataset, 100)
+    write(library, "add", ids, vectors)
+    write(library, "remove", ids[:30])
+
+    assert IndexManager(db).compact(library)
+    assert index_wal.read(library.id) == []
+    assert not IndexManager(db).compact(library)  # Nothing left to fold
+
+    restart()
+    assert _stored(IndexManager(db).get(library)) == set(ids[30:])
+
+
+def test_retraining_applies_the_writes_made_meanwhile(
+    db, dataset, library, write, monkeypatch
+):
+    library = library("ivf", nlist=2, nprobe=2)
+    ids, vectors = _vectors(dataset, 120)
+    write(library, "add", ids[:100], vectors[:100])
+    assert IndexManager(db).get(library).needs_training()
+
+    new = IndexManager._new
+    trained = []
+
+    def new_index(library):
+        index = new(library)
+        train = index.train
+
+        def slow_train(chunk_ids, embeddings):
+            # Writers are not blocked by the training, which misses them
+            write(library, "remove", ids[:10])
+            write(library, "add", ids[100:], vectors[100:])
+            train(chunk_ids, embeddings)
+            trained.append(index)
+
+        index.train = slow_train
+        return index
+
+    monkeypatch.setattr(IndexManager, "_new", staticmethod(new_index))
+    assert IndexManager(db).compact(library)
+
+    index = index_cache.get(str(library.id))
+    assert trained == [index] and not index.needs_training()
+    assert set(index.assignments) == set(ids[10:])
+    assert index_wal.read(library.id) == []
+    hits = index.search_batch(vectors[100:], 1)
+    assert [hit[0][0] for hit in hits] == ids[100:]
@@ -0,0 +1,100 @@
+from uuid import uuid4
+
+import pytest
+
+from vector_store.app.db.ivf_index import IVFIndex
+
+
+def _ids(results):
+    return [[vector_id for vector_id, _ in hits] for hits in results]
+
+
+@pytest.fixture
+def trained(dataset):
+    ids, vectors = dataset(400)
+    index = IVFIndex(32, nlist=4, nprobe=2, seed=0)
+    index.add_batch(ids, vectors)
+    assert index.needs_training()
+    index.train(ids, vectors)
+    return index, ids, vectors
+
+
+def test_untrained_index_is_exact(dataset, exact_top_k):
+    ids, vectors = dataset(100)
+    index = IVFIndex(32, nlist=4, seed=0)
+    index.add_batch(ids, vectors)
+
+    assert not index.needs_training()
+    assert _ids(index.search_batch(vectors[:10], 5)) == exact_top_k(
+        ids, vectors, vectors[:10], 5
+    )
+
+
+def test_training_partitions_every_vector(trained):
+    index, ids, _ = trained
+
+    assert index.centroids.shape == (4, 32)
+    assert index.trained_size == 400
+    assert set(index.assignments) == set(ids)
+    assert sum(inverted.size for inverted in index.lists) == 400
+    assert not index.needs_training()
+
+
+def test_probing_every_list_is_exact(trained, exact_top_k):
+    index, ids, vectors = trained
+    index.nprobe = index.nlist
+    queries = vectors[:20] + 0.1
+
+    assert _ids(index.search_batch(queries, 10)) == exact_top_k(
+        ids, vectors, queries, 10
+    )
+
+
+def test_recall_against_exact_search(trained, exact_top_k, recall):
+    index, ids, vectors = trained
+    queries = vectors[:50] + 0.1
+
+    results = index.search_batch(queries, 10)
+
+    assert recall(results, exact_top_k(ids, vectors, queries, 10)) >= 0.9
+
+
+def test_remove_and_replace_keep_lists_consistent(trained, exact_top_k):
+    index, ids, vectors = trained
+    removed = set(ids[:100])
+
+    for vector_id in removed:
+        index.remove(vector_id)
+    index.remove(uuid4())  # Unknown ids are ignored
+    replacement = vectors[200] + 50
+    index.add(ids[150], replacement)
+
+    assert set(index.assignments) == set(ids[100:])
+    assert sum(inverted.size for inverted in index.lists) == 300
+    for vector_id, list_no in index.assignments.items():
+        assert vector_id in index.lists[list_no].rows
+    index.nprobe = index.nlist
+    results = index.search_batch(vectors[:20], 10)
+    assert all(vector_id not in removed for hits in results for vector_id, _ in hits)
+    assert index.search(replacement, 1)[0][0] == ids[150]
+
+
+def test_add_batch_keeps_the_last_vector_of_a_repeated_id(dataset):
+    ids, vectors = dataset(10)
+    index = IVFIndex(32, nlist=4, seed=0)
+
+    index.add_batch([ids[0], ids[0]], [vectors[0], vectors[1]])
+
+    assert index.search(vectors[1], 1) == [(ids[0], pytest.approx(0.0, abs=1e-3))]
+    assert len(index.assignments) == 1
+
+
+def test_growth_past_the_retrain_factor_asks_for_training(trained, dataset):
+    index, _, _ = trained
+    more_ids, more_vectors = dataset(500)
+
+    index.add_batch(more_ids, more_vectors)
+
+    # New vectors go to their nearest lists meanwhile
+    assert sum(inverted.size for inverted in index.lists) == 900
+    assert index.needs_training()
@@ -0,0 +1,121 @@
+import multiprocessing
+from types import SimpleNamespace
+from uuid import uuid4
+
+import numpy as np
+
+from vector_store.app.constants import EMBEDDING_DIM
+from vector_store.app.db import library_epoch
+from vector_store.app.db.bruteforce_index import BruteForceIndex
+from vector_store.app.db.cache import (
+    chunk_cache,
+    exact_index_cache,
+    index_cache,
+    metadata_index_cache,
+    query_cache,
+)
+from vector_store.app.db.metadata_index import MetadataIndex
+from vector_store.app.db.vector_segment import (
+    drop_segment,
+    get_segment,
+    open_segment,
+    release_segment,
+)
+
+
+def _change(library_id: str) -> None:
+    """Another worker adds a vector to the library."""
+    get_segment(library_id).put(uuid4(), np.ones(EMBEDDING_DIM, dtype=np.float32))
+    library_epoch.publish(library_id)
+
+
+def _delete(library_id: str) -> None:
+    """Another worker deletes the library."""
+    library_epoch.publish(library_id)
+    drop_segment(library_id)
+
+
+def _in_worker(target, library_id: str) -> None:
+    # Spawned, so the worker shares nothing with this process but the files
+    worker = multiprocessing.get_context("spawn").Process(
+        target=target, args=(library_id,)
+    )
+    worker.start()
+    worker.join(timeout=60)
+    assert worker.exitcode == 0
+
+
+def _cache(library_id: str) -> None:
+    """Cache state derived from the library, as a search would."""
+    index_cache.put(library_id, BruteForceIndex())
+    exact_index_cache[library_id] = BruteForceIndex()
+    metadata_index_cache[library_id] = MetadataIndex()
+    chunk_cache["chunk"] = SimpleNamespace(library_id=library_id)
+    chunk_cache["other"] = SimpleNamespace(library_id=str(uuid4()))
+
+
+def test_change_in_another_process_drops_the_caches(data_dir):
+    library_id = str(uuid4())
+    segment = get_segment(library_id, dtype="float32")
+    segment.put(uuid4(), np.zeros(EMBEDDING_DIM, dtype=np.float32))
+    assert not library_epoch.sync(library_id)  # First sight of the library
+    _cache(library_id)
+    version = query_cache.version(library_id)
+
+    _in_worker(_change, library_id)
+
+    assert library_epoch.check(library_id)
+    assert library_id not in index_cache
+    assert library_id not in exact_index_cache
+    assert library_id not in metadata_index_cache
+    assert set(chunk_cache) == {"other"}
+    assert query_cache.version(library_id) > version
+    assert library_epoch.seen(library_id) == segment.epoch
+    assert len(segment) == 2
+    # Until the next change, the caches are valid again
+    _cache(library_id)
+    assert not library_epoch.check(library_id)
+    assert not library_epoch.sync(library_id)
+    assert library_id in index_cache
+
+
+def test_own_changes_keep_the_caches(data_dir):
+    library_id = str(uuid4())
+    get_segment(library_id, dtype="float32")
+    library_epoch.sync(library_id)
+    _cache(library_id)
+
+    library_epoch.publish(library_id)
+
+    assert not library_epoch.sync(library_id)
+    assert library_id in index_cache
+
+
+def test_check_skips_libraries_without_an_open_segment(data_dir):
+    library_id = str(uuid4())
+    get_segment(library_id, dtype="float32")
+    library_epoch.sync(library_id)
+    _in_worker(_change, library_id)
+    release_segment(library_id)
+
+    # Left to the next ``sync``, which may read the segment from disk
+    assert not library_epoch.check(library_id)
+    assert not library_epoch.check(uuid4())
+    assert library_epoch.sync(library_id)
+
+
+def test_deletion_in_another_process_releases_the_segment(data_dir):
+    library_id = str(uuid4())
+    get_segment(library_id, dtype="float32")
+    library_epoch.sync(library_id)
+    _cache(library_id)
+
+    _in_worker(_delete, library_id)
+
+    assert library_epoch.sync(library_id)
+    assert open_segment(library_id) is None
+    assert library_id not in index_cache
+    # Without a segment the library is forgotten
+    library_epoch.sync(library_id)
+    assert library_epoch.seen(library_id) is None
+    assert not library_epoch.sync(library_id)
@@ -0,0 +1,168 @@
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from vector_store.app.db import lsh_index
+from vector_store.app.db.lsh_index import LSHIndex
+from vector_store.app.db.vector_segment import VectorSegment
+
+
+def _ids(results):
+    return [[vector_id for vector_id, _ in hits] for hits in results]
+
+
+def _check_buckets(index):
+    """Every stored vector is in exactly its own bucket of each table."""
+    assert set(index.keys) == set(index.vectors) == set(index.norms)
+    for t, table in enumerate(index.tables):
+        assert all(table.values())  # Empty buckets are dropped
+        assert sum(len(bucket) for bucket in table.values()) == len(index.keys)
+        for vector_id, keys in index.keys.items():
+            assert vector_id in table[keys[t]]
+
+
+@pytest.mark.parametrize("projection", ["gaussian", "sign", "sparse"])
+def test_same_seed_gives_the_same_buckets(dataset, projection):
+    ids, vectors = dataset(200)
+    first = LSHIndex(32, seed=7, projection=projection)
+    second = LSHIndex(32, seed=7, projection=projection)
+    first.add_batch(ids, vectors)
+    second.add_batch(ids, vectors)
+
+    np.testing.assert_array_equal(first.planes, second.planes)
+    assert first.bucket_keys_many(ids) == second.bucket_keys_many(ids)
+    assert not np.array_equal(
+        first.planes, LSHIndex(32, seed=8, projection=projection).planes
+    )
+
+
+def test_serialized_index_regenerates_its_planes(dataset):
+    ids, vectors = dataset(100)
+    index = LSHIndex(32, num_tables=3, num_hashes=6)
+    index.add_batch(ids, vectors)
+
+    loaded = LSHIndex.from_dict(index.to_dict())
+    for vector_id, vector in zip(ids, vectors, strict=True):
+        loaded.restore(vector_id, vector, index.bucket_keys(vector_id))
+
+    np.testing.assert_array_equal(loaded.planes, index.planes)
+    assert loaded.tables == index.tables
+    assert _ids(loaded.search_batch(vectors[:10], 5)) == _ids(
+        index.search_batch(vectors[:10], 5)
+    )
+
+
+def test_multi_probe_recall_against_exact_search(dataset, exact_top_k, recall):
+    ids, vectors = dataset(2000)
+    queries = vectors[:100] + 0.1
+    truth = exact_top_k(ids, vectors, queries, 10, "cosine")
+    recalls = {}
+    for probes in (0, 8, 32):
+        index = LSHIndex(
+            32, num_tables=4, num_hashes=12, probes=probes, min_candidates=200, seed=0
+        )
+        index.add_batch(ids, vectors)
+        recalls[probes] = recall(index.search_batch(queries, 10), truth)
+
+    assert recalls[0] <= recalls[8] <= recalls[32]
+    assert recalls[32] > recalls[0]
+    assert recalls[32] >= 0.9
+
+
+def test_scores_are_cosine_similarities(dataset):
+    ids, vectors = dataset(100)
+    index = LSHIndex(32, num_tables=8, num_hashes=4, seed=0)
+    index.add_batch(ids, vectors)
+
+    query = vectors[5] + 0.1
+    for vector_id, score in index.search(query, 5):
+        vector = vectors[ids.index(vector_id)]
+        expected = vector @ query / np.linalg.norm(vector) / np.linalg.norm(query)
+        assert score == pytest.approx(expected, abs=1e-5)
+
+
+def test_remove_and_replace_keep_buckets_consistent(dataset):
+    ids, vectors = dataset(300)
+    index = LSHIndex(32, num_tables=4, num_hashes=8, seed=0)
+    index.add_batch(ids, vectors)
+
+    removed = set(ids[::3])
+    index.remove_batch(list(removed))
+    index.remove(uuid4())  # Unknown ids are ignored
+    replacement = -vectors[1]
+    index.add(ids[1], replacement)
+    _check_buckets(index)
+
+    assert len(index.keys) == 200
+    assert index.bucket_keys(ids[1]) == index._hash(replacement).tolist()[0]
+    results = index.search_batch(vectors[:20], 10)
+    assert all(vector_id not in removed for hits in results for vector_id, _ in hits)
+    assert index.search(replacement, 1)[0][0] == ids[1]
+
+
+def test_search_filtered_only_returns_allowed(dataset):
+    ids, vectors = dataset(300)
+    index = LSHIndex(32, num_tables=4, num_hashes=6, seed=0)
+    index.add_batch(ids, vectors)
+
+    allowed = set(ids[::2])
+    results = index.search_filtered(vectors[:20], 5, allowed)
+
+    assert all(hits for hits in results)
+    assert all(vector_id in allowed for hits in results for vector_id, _ in hits)
+
+
+def test_batches_are_scored_in_bounded_blocks(dataset, monkeypatch):
+    ids, vectors = dataset(1000)
+    index = LSHIndex(32, num_tables=4, num_hashes=6, seed=0)
+    index.add_batch(ids, vectors)
+    queries = vectors[:50] + 0.1
+    expected = index.search_batch(queries, 10)
+
+    blocks = []
+    score_block = LSHIndex._score
+
+    def spy(self, queries, candidate_sets, candidate_ids, k):
+        blocks.append((len(queries), len(candidate_ids)))
+        return score_block(self, queries, candidate_sets, candidate_ids, k)
+
+    monkeypatch.setattr(lsh_index, "LSH_SCORE_BLOCK_SIZE", 2000)
+    monkeypatch.setattr(LSHIndex, "_score", spy)
+    results = index.search_batch(queries, 10)
+
+    assert len(blocks) > 1 and sum(n for n, _ in blocks) == 50
+    # Only a single query may have more candidates than the block allows
+    assert all(n * candidates <= 2000 or n == 1 for n, candidates in blocks)
+    assert _ids(results) == _ids(expected)
+    for hits, expected_hits in zip(results, expected, strict=True):
+        np.testing.assert_allclose(
+            [score for _, score in hits],
+            [score for _, score in expected_hits],
+            rtol=1e-6,
+        )
+
+
+def test_owned_bytes_follow_private_copies(dataset, tmp_path):
+    ids, vectors = dataset(50)
+    index = LSHIndex(32, seed=0)
+    index.add_batch(ids, vectors)
+    assert index.owned_bytes == vectors.nbytes
+
+    index.remove(ids[0])
+    assert index.owned_bytes == vectors[1:].nbytes
+
+    # Vectors bound from a segment are views of its mapping
+    segment = VectorSegment(tmp_path / "segment", dim=32)
+    segment.put_many(ids, vectors)
+    index.bind(segment)
+    assert index.owned_bytes == 0
+
+
+def test_search_during_writes(dataset, search_during_writes):
+    ids, vectors = dataset(500)
+    index = LSHIndex(32, num_tables=4, num_hashes=6, seed=0)
+    index.add_batch(ids, vectors)
+
+    assert search_during_writes(index, ids, vectors) == []
+    _check_buckets(index)
@@ -0,0 +1,145 @@
+from uuid import uuid4
+
+import pytest
+
+from vector_store.app.constants import EMBEDDING_DIM
+from vector_store.app.db.bruteforce_index import BruteForceIndex
+from vector_store.app.db.index_manager import IndexManager
+from vector_store.app.db.metadata_index import MetadataIndex
+from vector_store.app.db.models import Chunk
+from vector_store.app.db.repositories.chunk_repo import ChunkRepository
+
+
+def _check_postings(metadata: MetadataIndex) -> None:
+    """Every posting bitmap has exactly the slots of the chunks with its pair."""
+    expected: dict[tuple[str, str], int] = {}
+    for chunk_id, meta in metadata.meta.items():
+        for pair in meta.items():
+            expected[pair] = expected.get(pair, 0) | 1 << metadata.slots[chunk_id]
+    assert metadata.postings == expected
+    assert metadata.pairs == sum(len(meta) for meta in metadata.meta.values())
+
+
+def test_add_update_remove_keep_postings_in_sync():
+    metadata = MetadataIndex()
+    ids = [uuid4() for _ in range(6)]
+    for i, chunk_id in enumerate(ids):
+        metadata.add(chunk_id, {"lang": "en" if i % 2 else "fr", "part": str(i % 3)})
+    _check_postings(metadata)
+    assert metadata.match({"lang": "en"}) == set(ids[1::2])
+    assert metadata.match({"lang": "en", "part": "1"}) == {ids[1]}
+
+    metadata.add(ids[1], {"lang": "fr"})  # Update
+    _check_postings(metadata)
+    assert metadata.match({"lang": "en", "part": "1"}) == set()
+    assert ids[1] in metadata.match({"lang": "fr"})
+
+    metadata.remove(ids[3])
+    metadata.remove(ids[3])  # Already gone
+    _check_postings(metadata)
+    assert metadata.size == 5 and ids[3] not in metadata.match({})
+
+    chunk_id = uuid4()
+    metadata.add(chunk_id, {"lang": "de"})
+    assert metadata.slots[chunk_id] == 3  # Freed slot reused
+    _check_postings(metadata)
+    assert metadata.match({"lang": "de"}) == {chunk_id}
+    assert metadata.match({"lang": "es"}) == set()
+
+
+def test_add_many_matches_adding_one_by_one():
+    entries = [(uuid4(), {"tag": str(i % 4)} if i % 5 else None) for i in range(50)]
+    one_by_one = MetadataIndex()
+    for chunk_id, meta in entries:
+        one_by_one.add(chunk_id, meta)
+    batched = MetadataIndex()
+    batched.add_many(entries)
+
+    _check_postings(batched)
+    assert batched.slots == one_by_one.slots
+    assert batched.postings == one_by_one.postings
+    assert batched.nbytes == one_by_one.nbytes > 0
+
+
+@pytest.fixture
+def tagged(db, dataset, library, write):
+    """
+    A brute force library of 400 chunks: 10 tagged ``rare``, the others
+    ``common``. Returns the library, ids and vectors.
+    """
+    library = library("bruteforce")
+    ids, vectors = dataset(400, dim=EMBEDDING_DIM)
+    document_id = str(uuid4())
+    for i, chunk_id in enumerate(ids):
+        tag = "rare" if i < 10 else "common"
+        db.add(
+            Chunk(
+                id=str(chunk_id),
+                document_id=document_id,
+                library_id=library.id,
+                text=f"chunk {i}",
+                meta={"tag": tag},
+            )
+        )
+    db.commit()
+    write(library, "add", ids, vectors)
+    return library, ids, vectors
+
+
+def _spy(monkeypatch, cls, name: str) -> list:
+    calls = []
+    method = getattr(cls, name)
+
+    def spy(self, *args):
+        calls.append(args)
+        return method(self, *args)
+
+    monkeypatch.setattr(cls, name, spy)
+    return calls
+
+
+def test_selective_filters_are_prefiltered(db, monkeypatch, exact_top_k, tagged):
+    library, ids, vectors = tagged
+    fetched = _spy(monkeypatch, ChunkRepository, "embeddings_by_ids")
+    filtered = _spy(monkeypatch, BruteForceIndex, "search_filtered")
+
+    queries = vectors[200:205]
+    results = IndexManager(db).search_filtered(library, queries, 3, {"tag": "rare"})
+
+    assert len(fetched) == 1 and not filtered
+    assert set(fetched[0][1]) == set(ids[:10])
+    truth = exact_top_k(ids[:10], vectors[:10], queries, 3)
+    assert [[chunk_id for chunk_id, _ in hits] for hits in results] == truth
+
+
+def test_broad_filters_go_to_the_index(db, monkeypatch, tagged):
+    library, ids, vectors = tagged
+    fetched = _spy(monkeypatch, ChunkRepository, "embeddings_by_ids")
+    filtered = _spy(monkeypatch, BruteForceIndex, "search_filtered")
+
+    manager = IndexManager(db)
+    results = manager.search_filtered(library, vectors[:5], 3, {"tag": "common"})
+
+    assert not fetched and len(filtered) == 1
+    assert all(len(hits) == 3 for hits in results)
+    assert all(chunk_id in set(ids[10:]) for hits in results for chunk_id, _ in hits)
+    assert manager.search_filtered(library, vectors[:5], 3, {"tag": "none"}) == [
+        [] for _ in range(5)
+    ]
+
+
+def test_chunk_writes_update_the_resident_metadata(db, tagged, write):
+    library, ids, vectors = tagged
+    manager = IndexManager(db)
+    metadata = manager.metadata(library)
+    assert metadata.match({"tag": "rare"}) == set(ids[:10])
+
+    manager.index_metadata(library, [(ids[10], {"tag": "rare"}), (ids[0], None)])
+    write(library, "remove", ids[1:3])
+
+    assert manager.metadata(library) is metadata
+    assert metadata.match({"tag": "rare"}) == set(ids[3:11])
+    assert metadata.size == 398
+    _check_postings(metadata)
+    results = manager.search_filtered(library, vectors[1:3], 1, {"tag": "rare"})
+    assert all(hits[0][0] in set(ids[3:11]) for hits in results)
@@ -0,0 +1,99 @@
+import json
+from uuid import UUID, uuid4
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from vector_store.app.constants import EMBEDDING_DIM
+from vector_store.app.db.base import Base
+from vector_store.app.db.migrations import migrate
+from vector_store.app.db.vector_segment import get_segment
+
+
+@pytest.fixture
+def engine(data_dir):
+    """Engine on an empty database next to ``data_dir``."""
+    engine = create_engine(f"sqlite:///{data_dir.parent / 'legacy.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_embeddings_move_to_segments(engine, rng):
+    Base.metadata.tables["documents"].create(engine)
+    libraries = [str(uuid4()), str(uuid4())]
+    documents = {str(uuid4()): library_id for library_id in libraries}
+    vectors = rng.normal(size=(5, EMBEDDING_DIM)).astype(np.float32)
+    chunk_ids = [str(uuid4()) for _ in range(5)]
+    owners = [*documents, *documents, str(uuid4())]  # The last one is orphaned
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE chunks (id VARCHAR PRIMARY KEY, document_id VARCHAR, "
+                "text VARCHAR, embedding JSON, meta JSON, created_at DATETIME)"
+            )
+        )
+        conn.execute(text("CREATE INDEX ix_chunks_document_id ON chunks (document_id)"))
+        for document_id, library_id in documents.items():
+            conn.execute(
+                text(
+                    "INSERT INTO documents (id, library_id, title) "
+                    "VALUES (:id, :library_id, 'old')"
+                ),
+                {"id": document_id, "library_id": library_id},
+            )
+        for chunk_id, document_id, vector in zip(
+            chunk_ids, owners, vectors, strict=True
+        ):
+            conn.execute(
+                text(
+                    "INSERT INTO chunks (id, document_id, text, embedding, meta) "
+                    "VALUES (:id, :document_id, 'text', :embedding, '{}')"
+                ),
+                {
+                    "id": chunk_id,
+                    "document_id": document_id,
+                    "embedding": json.dumps(vector.tolist()),
+                },
+            )
+
+    migrate(engine)
+    migrate(engine)  # A no-op once done
+
+    columns = {column["name"] for column in inspect(engine).get_columns("chunks")}
+    assert "embedding" not in columns and "library_id" in columns
+    assert "chunks_old" not in inspect(engine).get_table_names()
+    with engine.connect() as conn:
+        rows = dict(conn.execute(text("SELECT id, library_id FROM chunks")).all())
+    # The orphaned chunk is dropped
+    assert rows == {chunk_ids[i]: documents[owners[i]] for i in range(4)}
+    for i in range(4):
+        found, matrix = get_segment(rows[chunk_ids[i]]).get_many([UUID(chunk_ids[i])])
+        assert found == [UUID(chunk_ids[i])]
+        np.testing.assert_allclose(matrix[0], vectors[i], rtol=1e-6)
+
+
+def test_missing_columns_are_added_with_their_defaults(engine):
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE libraries (id VARCHAR PRIMARY KEY, name VARCHAR NOT NULL, "
+                "description VARCHAR, created_at DATETIME, index_type VARCHAR)"
+            )
+        )
+        conn.execute(text("INSERT INTO libraries (id, name) VALUES ('old', 'old')"))
+    Base.metadata.create_all(engine)  # As init_db does, it skips the old table
+
+    migrate(engine)
+    migrate(engine)  # A no-op once done
+
+    columns = {
+        column["name"]: column for column in inspect(engine).get_columns("libraries")
+    }
+    assert {"index_params", "compression", "vector_dtype"} <= set(columns)
+    assert not columns["vector_dtype"]["nullable"]
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT vector_dtype, compression FROM libraries WHERE id = 'old'")
+        ).one()
+    assert tuple(row) == ("float32", None)
@@ -0,0 +1,114 @@
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from vector_store.app.db.index import ID_BYTES
+from vector_store.app.db.pq_index import PQIndex, rerank
+from vector_store.app.db.vector_segment import VectorSegment
+
+
+def _ids(results):
+    return [[vector_id for vector_id, _ in hits] for hits in results]
+
+
+@pytest.fixture
+def segment(tmp_path):
+    return VectorSegment(tmp_path / "segment", dim=32)
+
+
+@pytest.fixture
+def trained(dataset, segment):
+    ids, vectors = dataset(1000)
+    segment.put_many(ids, vectors)
+    index = PQIndex(32, pq_m=8, rerank=10, seed=0)
+    index.add_batch(ids, vectors)
+    index.train(ids, vectors)
+    return index, ids, vectors
+
+
+def test_untrained_index_buffers_full_vectors(dataset, exact_top_k):
+    ids, vectors = dataset(100)
+    index = PQIndex(32, pq_m=8, seed=0)
+    index.add_batch(ids, vectors)
+
+    assert not index.quantizer.is_trained and index.size == 0
+    assert _ids(index.search_batch(vectors[:10], 5)) == exact_top_k(
+        ids, vectors, vectors[:10], 5
+    )
+
+
+def test_training_encodes_every_vector(trained):
+    index, ids, vectors = trained
+
+    assert index.size == 1000 and index.buffer.size == 0
+    assert index.codes.shape[1] == 8 and index.codes.dtype == np.uint8
+    assert index.codes.shape[0] >= index.size
+    assert set(index.rows) == set(ids)
+    # One byte per subspace instead of 32 float32 values
+    assert index.codes_nbytes == index.codes.nbytes + 2 * ID_BYTES * 1000
+    assert index.codes.nbytes < vectors.nbytes / 4
+
+
+def test_reranking_recall_against_exact_search(trained, segment, exact_top_k, recall):
+    index, ids, vectors = trained
+    queries = vectors[:50] + 0.1
+    truth = exact_top_k(ids, vectors, queries, 10)
+
+    approximate = recall(index.search_batch(queries, 10), truth)
+    index.bind(segment)
+    reranked = index.search_batch(queries, 10)
+
+    assert recall(reranked, truth) >= 0.9
+    assert recall(reranked, truth) >= approximate
+    # Re-ranked distances are exact
+    for hits, query in zip(reranked, queries, strict=True):
+        for vector_id, distance in hits:
+            expected = np.linalg.norm(vectors[ids.index(vector_id)] - query)
+            assert distance == pytest.approx(expected, abs=1e-3)
+
+
+def test_remove_and_replace_keep_codes_packed(trained, segment):
+    index, ids, vectors = trained
+    index.bind(segment)
+    removed = set(ids[:300])
+
+    for vector_id in removed:
+        index.remove(vector_id)
+    index.remove(uuid4())  # Unknown ids are ignored
+    replacement = vectors[500] + 30
+    segment.put(ids[400], replacement)
+    index.add(ids[400], replacement)
+
+    assert index.size == 700
+    assert sorted(index.rows.values()) == list(range(700))
+    assert all(index.ids[row] == vector_id for vector_id, row in index.rows.items())
+    results = index.search_batch(vectors[:20], 10)
+    assert all(vector_id not in removed for hits in results for vector_id, _ in hits)
+    assert index.search(replacement, 1)[0][0] == ids[400]
+
+
+def test_rerank_scores_each_query_among_its_candidates(dataset, segment):
+    ids, vectors = dataset(200)
+    segment.put_many(ids, vectors)
+    queries = vectors[:70] + 0.1  # More than one block of queries
+    candidates = [[(ids[(i + j) % 200], 0.0) for j in range(8)] for i in range(70)]
+
+    results = rerank(segment, queries, candidates, 3, "euclidean")
+
+    for query, hits, pool in zip(queries, results, candidates, strict=True):
+        pool_ids = [vector_id for vector_id, _ in pool]
+        distances = [np.linalg.norm(vectors[ids.index(i)] - query) for i in pool_ids]
+        expected = [pool_ids[i] for i in np.argsort(distances)[:3]]
+        assert [vector_id for vector_id, _ in hits] == expected
+
+
+def test_opq_learns_an_orthonormal_rotation(dataset):
+    ids, vectors = dataset(1000)
+    index = PQIndex(32, pq_m=8, pq_nbits=6, opq=True, seed=0)
+
+    index.train(ids, vectors)
+
+    rotation = index.quantizer.rotation
+    np.testing.assert_allclose(rotation @ rotation.T, np.eye(32), atol=1e-4)
+    assert index.search(vectors[3], 5)[0][0] in ids
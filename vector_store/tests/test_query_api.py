@@ -0,0 +1,93 @@
+import pytest
+
+from vector_store.app.constants import EMBEDDING_DIM
+from vector_store.app.db.cache import query_cache
+from vector_store.app.db.services.query_store import QueryStoreService
+
+
+@pytest.fixture
+def indexed(client, dataset, library, document):
+    """
+    An LSH library of 300 chunks, a third of them in French. Returns the
+    library, the created chunks and their embeddings.
+    """
+    library = library("lsh", num_tables=4, num_hashes=6, seed=0)
+    document = document(library)
+    _, vectors = dataset(300, dim=EMBEDDING_DIM)
+    items = [
+        {
+            "text": f"chunk {i}",
+            "embedding": vector.tolist(),
+            "meta": {"lang": "fr" if i % 3 == 0 else "en"},
+        }
+        for i, vector in enumerate(vectors)
+    ]
+    response = client.post(f"/documents/{document.id}/chunks:batch", json=items)
+    assert response.status_code == 200, response.text
+    return library, response.json(), vectors
+
+
+def _ids(results: list[dict]) -> list[str]:
+    return [result["chunk_id"] for result in results]
+
+
+def test_batch_matches_single_queries(client, indexed):
+    library, chunks, vectors = indexed
+    queries = [
+        {"embedding": (vectors[10] + 0.01).tolist(), "k": 3},
+        {"embedding": (vectors[20] + 0.01).tolist(), "k": 1},
+        {"embedding": (vectors[30] + 0.01).tolist(), "k": 5, "filters": {"lang": "fr"}},
+        {"text": "chunk 7", "k": 2},
+    ]
+    single = [
+        client.post(f"/libraries/{library.id}/query/", json=query).json()
+        for query in queries
+    ]
+    query_cache.bump(library.id)  # Don't serve the batch from the cache
+
+    response = client.post(f"/libraries/{library.id}/query:batch", json=queries)
+
+    assert response.status_code == 200, response.text
+    results = response.json()
+    assert [len(result) for result in results] == [3, 1, 5, 2]
+    assert [_ids(result) for result in results] == [_ids(result) for result in single]
+    assert [result[0]["chunk_id"] for result in results[:3]] == [
+        chunks[10]["id"],
+        chunks[20]["id"],
+        chunks[30]["id"],
+    ]
+    assert all(result["meta"] == {"lang": "fr"} for result in results[2])
+    assert results[0][0]["text"] == "chunk 10"
+
+
+def test_batch_only_searches_cache_misses(client, indexed, monkeypatch):
+    library, _, vectors = indexed
+    searched = []
+    search_batch = QueryStoreService._search_batch
+
+    async def spy(self, library, queries):
+        searched.append(len(queries))
+        return await search_batch(self, library, queries)
+
+    monkeypatch.setattr(QueryStoreService, "_search_batch", spy)
+    queries = [{"embedding": vectors[i].tolist(), "k": 2} for i in range(3)]
+    url = f"/libraries/{library.id}/query:batch"
+
+    first = client.post(url, json=queries).json()
+    second = client.post(
+        url, json=queries + [{"embedding": vectors[3].tolist(), "k": 2}]
+    ).json()
+
+    assert searched == [3, 1]
+    assert second[:3] == first
+    assert client.post(url, json=[]).json() == []
+
+
+def test_batch_rejects_wrong_dimensions(client, indexed):
+    library, _, vectors = indexed
+    queries = [{"embedding": vectors[0].tolist()}, {"embedding": [0.5, 0.5]}]
+
+    response = client.post(f"/libraries/{library.id}/query:batch", json=queries)
+
+    assert response.status_code == 400
+    assert "positions [1]" in response.json()["detail"]
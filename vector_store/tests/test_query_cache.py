@@ -0,0 +1,83 @@
+from uuid import UUID, uuid4
+
+import numpy as np
+
+from vector_store.app.constants import EMBEDDING_DIM
+from vector_store.app.db.cache import query_cache
+from vector_store.app.db.query_cache import QueryCache
+from vector_store.app.db.services.chunk_store import ChunkStoreService
+from vector_store.app.models.chunk import ChunkCreate, ChunkUpdate
+
+
+def test_keys_hash_the_embedding_and_sort_the_filters():
+    key = QueryCache.key("refunds", [0.5, 1.0], 5, {"b": "2", "a": "1"})
+    assert key == QueryCache.key("other", [0.5, 1.0], 5, {"a": "1", "b": "2"})
+    assert key != QueryCache.key("refunds", [0.5, 1.0], 3, {"a": "1", "b": "2"})
+    assert QueryCache.key("refunds", None, 5, None)[0] == "text:refunds"
+
+
+def test_bump_makes_the_library_results_unreachable():
+    cache = QueryCache(similarity=None)
+    library_id, other = uuid4(), uuid4()
+    key = QueryCache.key(None, [1.0, 0.0], 5, None)
+    cache.put(library_id, 0, key, [1.0, 0.0], ["a"])
+    cache.put(other, 0, key, [1.0, 0.0], ["b"])
+    assert cache.get(library_id, 0, key) == ["a"]
+
+    cache.bump(library_id)
+    assert cache.version(library_id) == 1
+    assert cache.get(library_id, 1, key) is None
+    assert cache.get(other, cache.version(other), key) == ["b"]
+
+    # A search that started before the bump doesn't cache its stale results
+    cache.put(library_id, 0, key, [1.0, 0.0], ["stale"])
+    assert cache.get(library_id, 0, key) == ["a"]  # Only aging out of the LRU
+    assert cache.stats() == {"hits": 3, "misses": 3, "hit_rate": 0.5, "size": 2}
+
+
+def test_approximate_mode_reuses_near_duplicate_queries(rng):
+    cache = QueryCache(similarity=0.99)
+    library_id = uuid4()
+    embedding = rng.normal(size=64)
+    key = QueryCache.key(None, embedding, 5, {"lang": "en"})
+    cache.put(library_id, 0, key, embedding, ["a"])
+
+    near = embedding + rng.normal(size=64) * 0.01
+    near_key = QueryCache.key(None, near, 5, {"lang": "en"})
+    assert cache.get(library_id, 0, near_key) is None  # Not an exact match
+    assert cache.get_similar(library_id, 0, near_key, near) == ["a"]
+
+    far = rng.normal(size=64)
+    assert cache.get_similar(library_id, 0, near_key, far) is None
+    for other_key in (
+        QueryCache.key(None, near, 3, {"lang": "en"}),
+        QueryCache.key(None, near, 5, {"lang": "fr"}),
+    ):
+        assert cache.get_similar(library_id, 0, other_key, near) is None
+
+    cache.bump(library_id)
+    assert cache.get_similar(library_id, 1, near_key, near) is None
+    assert QueryCache(similarity=None).get_similar(library_id, 0, key, near) is None
+
+
+def test_chunk_writes_bump_the_library_version(db, rng, library, document):
+    library = library("bruteforce")
+    document = document(library)
+    service = ChunkStoreService(db)
+    versions = [query_cache.version(library.id)]
+
+    embedding = rng.normal(size=EMBEDDING_DIM).tolist()
+    chunk = service.create_chunk(
+        UUID(document.id), ChunkCreate(text="a", embedding=embedding)
+    )
+    versions.append(query_cache.version(library.id))
+    service.update_chunk(UUID(chunk.id), ChunkUpdate(text="b"))
+    versions.append(query_cache.version(library.id))
+    service.update_chunk(
+        UUID(chunk.id), ChunkUpdate(embedding=(np.array(embedding) + 1).tolist())
+    )
+    versions.append(query_cache.version(library.id))
+    service.delete_chunk(UUID(chunk.id))
+    versions.append(query_cache.version(library.id))
+
+    assert versions == sorted(set(versions))  # Every write bumped it
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from vector_store.app.db.index_factory import IndexFactory
+from vector_store.app.db.vector_dtype import check_dtype, decode, encode
+
+PARAMS = {
+    "bruteforce": {},
+    "lsh": {"num_tables": 4, "num_hashes": 6, "seed": 0},
+    "hnsw": {"M": 8, "ef_construction": 40, "ef_search": 64, "seed": 0},
+    "ivf": {"nlist": 4, "nprobe": 2, "seed": 0},
+}
+# Absolute score error allowed, int8 rows are off by up to half a step per value
+TOLERANCE = {"float16": 0.01, "int8": 0.1}
+
+
+def test_int8_round_trip_error_is_half_a_step(rng):
+    vectors = rng.normal(size=(100, 32)).astype(np.float32)
+    vectors[0] = 0.0
+
+    codes, scales = encode(vectors, np.dtype(np.int8))
+
+    assert codes.dtype == np.int8 and scales.shape == (100,)
+    assert np.abs(codes).max(axis=1)[1:].min() == 127
+    error = np.abs(decode(codes, scales) - vectors)
+    assert np.all(error <= scales[:, None] / 2 + 1e-6)
+    np.testing.assert_array_equal(decode(codes[:1], scales[:1]), 0.0)
+    assert encode(vectors, np.dtype(np.float32))[0] is vectors  # No copy
+    with pytest.raises(ValueError):
+        check_dtype("float64")
+
+
+def _search(index_type: str, dtype: str, ids, vectors, queries):
+    index = IndexFactory.create(
+        index_type, dim=vectors.shape[1], vector_dtype=dtype, **PARAMS[index_type]
+    )
+    index.add_batch(ids, vectors)
+    if index_type == "ivf":
+        index.train(ids, vectors)
+    return index.search_batch(queries, 10)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+@pytest.mark.parametrize("index_type", list(PARAMS))
+def test_compact_dtypes_match_float32_results(dataset, index_type, dtype):
+    ids, vectors = dataset(500)
+    queries = vectors[:20] + 0.1
+    expected = _search(index_type, "float32", ids, vectors, queries)
+    results = _search(index_type, dtype, ids, vectors, queries)
+
+    overlap = sum(
+        len({i for i, _ in hits} & {i for i, _ in expected_hits})
+        for hits, expected_hits in zip(results, expected, strict=True)
+    ) / sum(len(hits) for hits in expected)
+    assert overlap >= 0.9
+    for hits, expected_hits in zip(results, expected, strict=True):
+        assert hits[0][0] == expected_hits[0][0]
+        assert hits[0][1] == pytest.approx(expected_hits[0][1], abs=TOLERANCE[dtype])
@@ -0,0 +1,73 @@
+from uuid import uuid4
+
+import numpy as np
+
+from vector_store.app.db.vector_segment import INITIAL_CAPACITY, VectorSegment
+
+
+def _vectors(rng, n: int) -> np.ndarray:
+    return rng.normal(size=(n, 8)).astype(np.float32)
+
+
+def test_freed_rows_are_reused(tmp_path, rng):
+    segment = VectorSegment(tmp_path / "segment", dim=8)
+    ids, vectors = [uuid4() for _ in range(5)], _vectors(rng, 5)
+    segment.put_many(ids, vectors)
+    _, matrix = segment.items()
+    assert not matrix.flags.owndata  # A view of the mapping without holes
+
+    assert segment.delete_many([ids[3], ids[1], uuid4()]) == 2
+    ids_after, matrix = segment.items()
+    assert ids_after == [ids[0], ids[2], ids[4]]
+    np.testing.assert_array_equal(matrix, vectors[[0, 2, 4]])
+
+    new_ids, new_vectors = [uuid4(), uuid4()], _vectors(rng, 2)
+    segment.put_many(new_ids, new_vectors)
+    assert [segment.rows[i] for i in new_ids] == [1, 3]  # Lowest free rows first
+    assert int(segment._header["count"]) == 5 and len(segment) == 5
+    np.testing.assert_array_equal(segment.get(new_ids[1]), new_vectors[1])
+
+    # Overwrites stay in place
+    segment.put(ids[0], new_vectors[0])
+    assert segment.rows[ids[0]] == 0
+    np.testing.assert_array_equal(segment.get(ids[0]), new_vectors[0])
+
+
+def test_growth_is_seen_by_other_handles(tmp_path, rng):
+    writer = VectorSegment(tmp_path / "segment", dim=8)
+    reader = VectorSegment(tmp_path / "segment")  # As another process would
+    ids, vectors = [uuid4() for _ in range(200)], _vectors(rng, 200)
+    writer.put_many(ids[:10], vectors[:10])
+    view = writer.get(ids[0])
+    generation = int(writer._header["generation"])
+
+    writer.put_many(ids[10:], vectors[10:])
+
+    assert writer.capacity == 4 * INITIAL_CAPACITY
+    assert int(writer._header["generation"]) > generation
+    np.testing.assert_array_equal(view, vectors[0])  # Old mapping kept alive
+    assert reader.capacity == INITIAL_CAPACITY
+    assert len(reader) == 200 and reader.capacity == writer.capacity  # Remapped
+    found, matrix = reader.get_many([ids[150], uuid4(), ids[5]])
+    assert found == [ids[150], ids[5]]
+    np.testing.assert_array_equal(matrix, vectors[[150, 5]])
+
+    reader.delete(ids[7])
+    assert ids[7] not in writer
+
+
+def test_reopened_segment_keeps_rows_and_holes(tmp_path, rng):
+    segment = VectorSegment(tmp_path / "segment", dim=8, dtype="float16")
+    ids, vectors = [uuid4() for _ in range(6)], _vectors(rng, 6)
+    segment.put_many(ids, vectors)
+    segment.delete_many(ids[2:4])
+    segment.bump_epoch()
+
+    reopened = VectorSegment(tmp_path / "segment", dim=4, dtype="int8")
+
+    assert reopened.dim == 8 and reopened.dtype == np.float16  # From the header
+    assert reopened.rows == segment.rows and reopened.epoch == 1
+    assert sorted(reopened._free) == [2, 3]
+    np.testing.assert_array_equal(reopened.items()[1], segment.items()[1])
+    reopened.put(uuid4(), vectors[0])
+    assert len(segment) == 5 and sorted(segment._free) == [3]
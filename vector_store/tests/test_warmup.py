@@ -0,0 +1,119 @@
+import threading
+import time
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from vector_store.app import main
+from vector_store.app.db import warmup
+from vector_store.app.db.index_manager import IndexManager
+from vector_store.app.db.query_stats import QueryStats
+from vector_store.app.db.warmup import IndexWarmup
+
+
+@pytest.fixture
+def hottest(db, data_dir, monkeypatch):
+    """
+    ``hottest(library_ids)``: make those the most queried libraries, the first
+    one the hottest. Warm-ups read the database of ``db``.
+    """
+    stats = QueryStats(path=data_dir / "query_stats.json")
+    monkeypatch.setattr(warmup, "query_stats", stats)
+    monkeypatch.setattr(warmup, "SessionLocal", sessionmaker(bind=db.get_bind()))
+
+    def record(library_ids: list[str]) -> None:
+        for rank, library_id in enumerate(library_ids):
+            stats.record(library_id, 10 * (len(library_ids) - rank))
+        stats.flush()
+
+    return record
+
+
+class Gate:
+    """Holds the index loads until ``open``, failing those of ``failing``."""
+
+    def __init__(self):
+        self.failing: set[str] = set()
+        self._open = threading.Event()
+
+    def open(self) -> None:
+        self._open.set()
+
+    def wait(self, library_id: str) -> None:
+        assert self._open.wait(timeout=10)
+        if library_id in self.failing:
+            raise RuntimeError("boom")
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    """A ``Gate`` that the loads of the libraries' indexes go through."""
+    gate = Gate()
+    load = IndexManager.get
+
+    def get(self, library):
+        gate.wait(library.id)
+        return load(self, library)
+
+    monkeypatch.setattr(IndexManager, "get", get)
+    return gate
+
+
+def _wait_for(predicate) -> None:
+    for _ in range(200):
+        if predicate():
+            return
+        time.sleep(0.01)
+    raise AssertionError("Timed out")
+
+
+def test_warmup_loads_the_hottest_libraries(library, hottest, gate):
+    loaded, failing, cold = library("lsh"), library("bruteforce"), library("lsh")
+    deleted = str(uuid4())
+    hottest([loaded.id, deleted, failing.id, cold.id])
+    gate.failing.add(failing.id)
+    index_warmup = IndexWarmup(libraries=3, workers=1)
+
+    index_warmup.start()
+    _wait_for(lambda: "loading" in index_warmup.snapshot().values())
+    assert not index_warmup.ready
+    assert index_warmup.snapshot() == {
+        loaded.id: "loading",
+        deleted: "pending",
+        failing.id: "pending",
+    }
+
+    gate.open()
+    _wait_for(lambda: index_warmup.ready)
+    # Deleted libraries are dropped, failed ones count as done
+    assert index_warmup.snapshot() == {loaded.id: "ready", failing.id: "failed"}
+
+
+def test_readyz_waits_for_the_warmup(client, library, hottest, gate, monkeypatch):
+    hot = library("bruteforce")
+    hottest([hot.id])
+    index_warmup = IndexWarmup(libraries=5)
+    monkeypatch.setattr(main, "index_warmup", index_warmup)
+
+    index_warmup.start()
+    _wait_for(lambda: index_warmup.snapshot() == {hot.id: "loading"})
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json() == {"status": "warming_up", "libraries": {hot.id: "loading"}}
+    assert client.get("/healthz").status_code == 200
+
+    gate.open()
+    _wait_for(lambda: index_warmup.ready)
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready", "libraries": {hot.id: "ready"}}
+
+
+def test_nothing_to_warm_is_ready_at_once(hottest):
+    index_warmup = IndexWarmup(libraries=0)
+    hottest([str(uuid4())])
+
+    index_warmup.run()
+
+    assert index_warmup.ready and index_warmup.snapshot() == {}
@@ -59,6 +59,14 @@ def test_full_sdk_flow():
     )
     chunk_id = UUID(chunk["id"])
 
+    # Create chunks in batch
+    batch = client.create_chunks(
+        doc_id,
+        [ChunkCreate(text="Primer fragmento"), ChunkCreate(text="Segundo fragmento")],
+    )
+    assert len(batch) == 2
+    assert all(c["document_id"] == str(doc_id) for c in batch)
+
     # Get chunk
     fetched_chunk = client.get_chunk(chunk_id)
     assert fetched_chunk["id"] == str(chunk_id)
@@ -76,6 +84,13 @@ def test_full_sdk_flow():
     assert isinstance(results, list)
     assert any(str(res.chunk_id) == str(chunk_id) for res in results)
 
+    # Batch query
+    batch_results = client.query_batch(
+        lib_id, ["Texto actualizado", "Primer fragmento"]
+    )
+    assert len(batch_results) == 2
+    assert any(str(res.chunk_id) == str(chunk_id) for res in batch_results[0])
+
     # Clean up
     client.delete_chunk(chunk_id)
     client.delete_document(lib_id, doc_id)
@@ -2,7 +2,11 @@ from uuid import UUID
 
 import requests
 from vector_store_sdk.vectorstore_client.constants import EMBEDDING_DIM
-from vector_store_sdk.vectorstore_client.models.chunk import ChunkCreate, ChunkUpdate
+from vector_store_sdk.vectorstore_client.models.chunk import (
+    ChunkCreate,
+    ChunkUpdate,
+    LibraryChunkCreate,
+)
 from vector_store_sdk.vectorstore_client.models.document import (
     DocumentCreate,
     DocumentUpdate,
@@ -108,6 +112,34 @@ class VectorStoreClient:
         response.raise_for_status()
         return response.json()
 
+    def create_chunks(self, document_id: UUID, data: list[ChunkCreate]) -> list[dict]:
+        self._check_embedding_dims(data)
+        response = requests.post(
+            f"{self.base_url}/documents/{document_id}/chunks:batch",
+            json=[chunk.model_dump(mode="json") for chunk in data],
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def create_library_chunks(
+        self, library_id: UUID, data: list[LibraryChunkCreate]
+    ) -> list[dict]:
+        self._check_embedding_dims(data)
+        response = requests.post(
+            f"{self.base_url}/libraries/{library_id}/chunks:batch",
+            json=[chunk.model_dump(mode="json") for chunk in data],
+        )
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _check_embedding_dims(data: list[ChunkCreate]) -> None:
+        for i, chunk in enumerate(data):
+            if chunk.embedding is not None and len(chunk.embedding) != EMBEDDING_DIM:
+                raise ValueError(
+                    f"Embedding of chunk {i} must have {EMBEDDING_DIM} dimensions, got {len(chunk.embedding)}"
+                )
+
     def get_chunk(self, chunk_id: UUID) -> dict:
         response = requests.get(f"{self.base_url}/chunks/{chunk_id}")
         response.raise_for_status()
@@ -140,3 +172,17 @@ class VectorStoreClient:
         )
         response.raise_for_status()
         return [QueryResult(**r) for r in response.json()]
+
+    def query_batch(
+        self, library_id: UUID, queries: list[str | QueryRequest], k: int = 3
+    ) -> list[list[QueryResult]]:
+        queries = [
+            QueryRequest(text=query, k=k) if isinstance(query, str) else query
+            for query in queries
+        ]
+        response = requests.post(
+            f"{self.base_url}/libraries/{library_id}/query:batch",
+            json=[query.model_dump() for query in queries],
+        )
+        response.raise_for_status()
+        return [[QueryResult(**r) for r in results] for results in response.json()]